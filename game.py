@@ -1,7 +1,23 @@
+import os
+# Headless replays need the dummy video driver before pygame starts
+if os.environ.get('GAME_HEADLESS'):
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
 import pgzrun
 import pygame
-import os
 import random
+import heapq
+import struct
+import sys
+import atexit
+import json
+import time
+import zlib
+import math
+import threading
+import numpy as np
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 os.environ['SDL_VIDEO_CENTERED'] = '1'
 # Game Configuration
@@ -12,6 +28,10 @@ TITLE = "Open World City Map - Residential & Industrial"
 # Camera zoom
 CAMERA_ZOOM = 2.0
 
+# Zoom levels the camera moves through - scaled sprites are cached per level
+ZOOM_LEVELS = tuple(1.0 + 0.125 * i for i in range(25))  # 1.0x - 4.0x
+ZOOM_STEP = 4                                             # Levels per zoom key press
+
 # Tile size
 TILE_SIZE = 18
 
@@ -23,15 +43,852 @@ MAP_TILES_HEIGHT = 150
 MAP_WIDTH = MAP_TILES_WIDTH * TILE_SIZE
 MAP_HEIGHT = MAP_TILES_HEIGHT * TILE_SIZE
 
+# Streamed world in tiles - the authored map is its top-left corner
+WORLD_TILES_WIDTH = 5000
+WORLD_TILES_HEIGHT = 5000
+WORLD_WIDTH = WORLD_TILES_WIDTH * TILE_SIZE
+WORLD_HEIGHT = WORLD_TILES_HEIGHT * TILE_SIZE
+
+# City zones as (name, first tile column), sorted by column
+MAP_ZONES = [
+    ('residential', 0),
+    ('industrial', 110),
+]
+
 # Camera offset
 camera_x = 0
 camera_y = 0
 
+# Camera zoom - eases one level per frame toward the target level
+camera_zoom = CAMERA_ZOOM
+camera_zoom_level = ZOOM_LEVELS.index(CAMERA_ZOOM)
+camera_zoom_target = camera_zoom_level
+
 # Game state
 game_state = {
     'alive': True,
-    'death_timer': 0,
-    'death_delay': 80
+    'restart_at': None,   # Tick the game restarts on after the player died
+    'death_delay': 80,
+    'death_cause': 'player_car',  # EVENT_COLLISION kind that killed the player
+    'tick': 0             # Simulation ticks since start (never reset)
+}
+
+# ============================================
+# INPUT RECORD / REPLAY
+# ============================================
+# Every random decision goes through `rng` and update() reads input through
+# read_input(), so a seed plus the per-tick input replays a session exactly.
+# The population governor's level is recorded with the input - it depends on
+# how fast the recording machine was.
+#   GAME_RECORD=session.rec python game.py                  record a session
+#   GAME_REPLAY=session.rec python game.py                  replay it in a window
+#   GAME_REPLAY=session.rec GAME_HEADLESS=1 python game.py  replay without a window, print timings
+#   GAME_SEED=1234 python game.py                           fixed seed without recording
+
+REPLAY_MAGIC = b'PGZR'
+REPLAY_VERSION = 2
+REPLAY_HEADER = struct.Struct('<4sHQ')  # magic, version, seed
+REPLAY_TICK = struct.Struct('<HBB')     # key bitmask, mouse click count, governor level
+REPLAY_CLICK = struct.Struct('<hhB')    # x, y, button
+
+# Keys sampled each tick - bit i of the mask is INPUT_KEYS[i]
+INPUT_KEYS = ('up', 'down', 'left', 'right', 'lshift', 'rshift', 'k_1', 'k_2', 'k_3')
+
+# Gameplay randomness - seeded per session so replays are exact
+rng = random.Random()
+
+class InputFrame:
+    """Key state for one tick"""
+    __slots__ = INPUT_KEYS
+
+    def __init__(self):
+        for name in INPUT_KEYS:
+            setattr(self, name, False)
+
+input_frame = InputFrame()
+pending_clicks = []  # (x, y, button) clicked since the last tick
+
+replay = {
+    'mode': None,       # None (live), 'record' or 'replay'
+    'seed': 0,
+    'file': None,       # Recording being written
+    'data': b'',        # Replay being read
+    'offset': 0,
+    'headless': bool(os.environ.get('GAME_HEADLESS')),
+}
+
+def start_input_session():
+    """Seed the RNG and open the recording or replay named in the environment"""
+    replay_path = os.environ.get('GAME_REPLAY')
+    record_path = os.environ.get('GAME_RECORD')
+    
+    if replay_path:
+        with open(replay_path, 'rb') as f:
+            data = f.read()
+        magic, version, seed = REPLAY_HEADER.unpack_from(data, 0)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{replay_path} is not a version {REPLAY_VERSION} replay")
+        replay['mode'] = 'replay'
+        replay['data'] = data
+        replay['offset'] = REPLAY_HEADER.size
+        print(f"Replaying {replay_path} (seed {seed})")
+    else:
+        seed = int(os.environ.get('GAME_SEED', random.randrange(1 << 63)))
+        if record_path:
+            replay['file'] = open(record_path, 'wb')
+            replay['file'].write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, seed))
+            replay['mode'] = 'record'
+            atexit.register(finish_recording)
+            print(f"Recording input to {record_path} (seed {seed})")
+    
+    replay['seed'] = seed
+    rng.seed(seed)
+
+def read_input():
+    """Key state and clicks for this tick - live (maybe recorded) or replayed"""
+    if replay['mode'] == 'replay':
+        data = replay['data']
+        offset = replay['offset']
+        if offset + REPLAY_TICK.size <= len(data):
+            mask, count, level = REPLAY_TICK.unpack_from(data, offset)
+            offset += REPLAY_TICK.size
+            if level != governor['level']:
+                set_governor_level(level)
+            clicks = []
+            for _ in range(count):
+                x, y, button = REPLAY_CLICK.unpack_from(data, offset)
+                offset += REPLAY_CLICK.size
+                clicks.append(((x, y), button))
+            replay['offset'] = offset
+            for bit, name in enumerate(INPUT_KEYS):
+                setattr(input_frame, name, bool(mask & (1 << bit)))
+            return input_frame, clicks
+        
+        # Out of input - hand control back to the player
+        replay['mode'] = None
+        print(f"Replay finished at tick {game_state['tick']}, state checksum {state_checksum():08x}")
+    
+    mask = 0
+    for bit, name in enumerate(INPUT_KEYS):
+        pressed = bool(getattr(keyboard, name))
+        setattr(input_frame, name, pressed)
+        if pressed:
+            mask |= 1 << bit
+    clicks = [((x, y), button) for x, y, button in pending_clicks]
+    
+    if replay['mode'] == 'record':
+        out = replay['file']
+        out.write(REPLAY_TICK.pack(mask, len(pending_clicks), governor['level']))
+        for click in pending_clicks:
+            out.write(REPLAY_CLICK.pack(*click))
+    pending_clicks.clear()
+    return input_frame, clicks
+
+def finish_recording():
+    """Close the recording and print the checksum a replay should reproduce"""
+    replay['file'].close()
+    print(f"Recorded {game_state['tick']} ticks, state checksum {state_checksum():08x}")
+
+def state_checksum():
+    """CRC of the simulation state - equal checksums mean identical replays"""
+    crc = zlib.crc32(struct.pack('<ddQ', player.x, player.y, game_state['tick']))
+    for pool in (npcs, enemies, traffic_vehicles, bullets):
+        crc = zlib.crc32(struct.pack('<I', len(pool)), crc)
+        for entity in pool:
+            crc = zlib.crc32(struct.pack('<dd', entity.x, entity.y), crc)
+    return crc
+
+def run_headless_replay():
+    """Drive update() from the replay as fast as possible and report tick times"""
+    timings = []
+    while replay['offset'] < len(replay['data']):
+        start = time.perf_counter()
+        update()
+        timings.append(time.perf_counter() - start)
+    
+    timings.sort()
+    count = len(timings)
+    if count:
+        print(f"Headless replay: {count} ticks, total {sum(timings) * 1000:.1f} ms, "
+              f"mean {sum(timings) / count * 1000:.3f} ms, "
+              f"p95 {timings[int(count * 0.95)] * 1000:.3f} ms, max {timings[-1] * 1000:.3f} ms")
+        for line in event_report():
+            print(f"  {line}")
+
+start_input_session()
+
+# ============================================
+# TELEMETRY
+# ============================================
+# A ring buffer of the last TELEMETRY_CONFIG['frames'] frames. A frame is one
+# update() and the draw() after it: a span for each subsystem and draw pass,
+# plus counters - entity counts, and running totals such as cache hits and
+# blits recorded as the change over the frame. A span costs a clock read and
+# an append, so recording is always on.
+#   F10                                       write telemetry.trace.json and telemetry.jsonl
+#   GAME_TELEMETRY=session python game.py     also write session.trace.json and session.jsonl on exit
+# .trace.json is Chrome trace event JSON for chrome://tracing, Perfetto or
+# speedscope. .jsonl has one frame per line for scripts.
+
+TELEMETRY_CONFIG = {
+    'frames': 1200,                                 # Frames kept (20 seconds at 60 fps)
+    'dump_path': 'telemetry',                       # F10 writes here
+    'exit_path': os.environ.get('GAME_TELEMETRY'),  # Written on exit when set
+}
+
+# Trace lanes - thread ids in the Chrome trace
+LANE_UPDATE = 1
+LANE_DRAW = 2
+LANE_NAMES = {LANE_UPDATE: 'update', LANE_DRAW: 'draw'}
+
+telemetry_ring = [None] * TELEMETRY_CONFIG['frames']  # (tick, start ns, spans, counters), oldest overwritten
+telemetry_gauges = {}   # Counter name -> function returning its value
+telemetry_totals = {}   # Counter name -> (stats dict, key) of a running total
+
+telemetry = {
+    'epoch': time.perf_counter_ns(),  # Trace timestamps count from here
+    'frames': 0,        # Frames started so far
+    'spans': [],        # (name, lane, start ns, end ns) of the open frame
+    'counters': {},     # Counters of the open frame
+    'last_totals': {},  # Running totals when the last frame closed
+    'writer': None,     # Background thread writing the last dump
+}
+
+def track_gauge(name, read):
+    """Record read() as counter name at the end of every frame"""
+    telemetry_gauges[name] = read
+
+def track_total(name, stats, key):
+    """Record how much stats[key] grew during every frame as counter name"""
+    telemetry_totals[name] = (stats, key)
+
+def span(name, start, lane=LANE_UPDATE):
+    """Record name as running from start (perf_counter_ns) until now - returns now for the next span"""
+    now = time.perf_counter_ns()
+    telemetry['spans'].append((name, lane, start, now))
+    return now
+
+def count(name, value):
+    """Set a counter of the open frame"""
+    telemetry['counters'][name] = value
+
+def close_frame():
+    """Fill in the gauges and totals of the open frame"""
+    counters = telemetry['counters']
+    for name, read in telemetry_gauges.items():
+        counters[name] = read()
+    last = telemetry['last_totals']
+    for name, (stats, key) in telemetry_totals.items():
+        value = stats[key]
+        counters[name] = value - last.get(name, value)
+        last[name] = value
+
+def begin_frame(start):
+    """Close the open frame and open the next one at start (perf_counter_ns) - returns the closed frame"""
+    size = len(telemetry_ring)
+    closed = None
+    if telemetry['frames']:
+        close_frame()
+        closed = telemetry_ring[(telemetry['frames'] - 1) % size]
+    spans = telemetry['spans'] = []
+    counters = telemetry['counters'] = {}
+    telemetry_ring[telemetry['frames'] % size] = (game_state['tick'], start, spans, counters)
+    telemetry['frames'] += 1
+    return closed
+
+def recorded_frames():
+    """Closed frames in the ring, oldest first"""
+    size = len(telemetry_ring)
+    last = telemetry['frames'] - 1  # The open frame has no counters yet
+    return [telemetry_ring[i % size] for i in range(max(0, last - size + 1), last)]
+
+def chrome_trace(frames):
+    """Chrome trace event JSON - spans as complete events, counters as counter events"""
+    epoch = telemetry['epoch']
+    events = [{'name': 'process_name', 'ph': 'M', 'pid': 1, 'args': {'name': TITLE}}]
+    for lane, name in LANE_NAMES.items():
+        events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': lane, 'args': {'name': name}})
+    for tick, start, spans, counters in frames:
+        # Parents before the children they share a start with
+        for name, lane, begin, end in sorted(spans, key=lambda span: (span[2], -span[3])):
+            events.append({'name': name, 'cat': LANE_NAMES[lane], 'ph': 'X', 'pid': 1, 'tid': lane,
+                           'ts': (begin - epoch) / 1000, 'dur': (end - begin) / 1000, 'args': {'tick': tick}})
+        ts = (start - epoch) / 1000
+        for name, value in counters.items():
+            events.append({'name': name, 'ph': 'C', 'pid': 1, 'ts': ts, 'args': {name: value}})
+    return json.dumps({'traceEvents': events, 'displayTimeUnit': 'ms'})
+
+def jsonl_frames(frames):
+    """One JSON object per frame - span times in ms summed by name, and the counters"""
+    epoch = telemetry['epoch']
+    lines = []
+    for tick, start, spans, counters in frames:
+        times = {}
+        for name, _, begin, end in spans:
+            times[name] = times.get(name, 0) + end - begin
+        lines.append(json.dumps({
+            'tick': tick,
+            'start_ms': round((start - epoch) / 1e6, 3),
+            'spans_ms': {name: round(ns / 1e6, 4) for name, ns in times.items()},
+            'counters': counters,
+        }))
+    return '\n'.join(lines) + '\n'
+
+def write_telemetry(path, frames):
+    """Write path.trace.json and path.jsonl - runs on the writer thread for F10"""
+    try:
+        for file_path, text in ((path + '.trace.json', chrome_trace(frames)),
+                                (path + '.jsonl', jsonl_frames(frames))):
+            temp_path = file_path + '.tmp'
+            with open(temp_path, 'w') as f:
+                f.write(text)
+            os.replace(temp_path, file_path)
+    except OSError as e:
+        print(f"Could not write telemetry {path}: {e}")
+        return
+    print(f"Telemetry: {len(frames)} frames written to {path}.trace.json and {path}.jsonl")
+
+def dump_telemetry(path):
+    """Copy the ring now and write it in the background"""
+    writer = telemetry['writer']
+    if writer is not None and writer.is_alive():
+        writer.join()
+    writer = threading.Thread(target=write_telemetry, args=(path, recorded_frames()), daemon=True)
+    writer.start()
+    telemetry['writer'] = writer
+
+def finish_telemetry():
+    """Wait for a pending dump, and write the exit dump if one was asked for"""
+    writer = telemetry['writer']
+    if writer is not None:
+        writer.join()
+    if TELEMETRY_CONFIG['exit_path']:
+        write_telemetry(TELEMETRY_CONFIG['exit_path'], recorded_frames())
+
+atexit.register(finish_telemetry)
+
+# ============================================
+# HITCH DETECTOR
+# ============================================
+# A watchdog thread is woken as each frame starts. If the frame is still
+# running 'arm_ms' later it samples the main thread's stack every 'sample_ms'
+# into a short ring until the frame is drawn, so normal frames cost one wakeup
+# and are never sampled. When a frame's update() plus draw() runs over the
+# threshold, its telemetry (per-system spans, entity counts, per-frame cache
+# counters), the running cache statistics and the stack samples taken during
+# it are written to hitches/hitch_<tick>.json, so rare stutters can be read
+# afterwards without running the profiler all the time.
+#   GAME_HITCH_MS=30 python game.py    report frames over 30 ms (0 disables)
+# 'profile' holds the samples as collapsed stacks ("root;...;leaf count"),
+# the input of flamegraph.pl and speedscope.
+
+HITCH_CONFIG = {
+    'threshold_ms': float(os.environ.get('GAME_HITCH_MS', 50)),  # update() + draw() time that is a hitch
+    'arm_ms': 8.0,          # Frame time before the watchdog starts sampling
+    'sample_ms': 2.0,       # Watchdog sampling interval - the GIL may stretch it
+    'samples': 2000,        # Stack samples kept
+    'dir': 'hitches',
+    'max_reports': 20,      # Reports written per session
+    'cooldown': 60,         # Frames after a report before the next one
+}
+
+hitch_samples = deque(maxlen=HITCH_CONFIG['samples'])  # (perf_counter_ns, ((code, line), ...) leaf first)
+
+hitch_wakeup = threading.Event()  # Set by the main thread as each frame starts
+
+hitch = {
+    'sampler': None,        # Watchdog thread
+    'sampling': False,      # Cleared to stop the watchdog
+    'drawn': 0,             # Last telemetry frame draw() finished
+    'reports': 0,
+    'quiet_until': 0,       # Frame count before which no report is written
+    'writer': None,         # Background thread writing the last report
+}
+
+def watch_main_thread(arm, interval):
+    """Watchdog thread - sample the main thread's stack while a frame runs longer than arm seconds"""
+    main_id = threading.main_thread().ident
+    while hitch['sampling']:
+        if not hitch_wakeup.wait(0.5):
+            continue
+        hitch_wakeup.clear()
+        watched = telemetry['frames']
+        time.sleep(arm)
+        while hitch['sampling'] and telemetry['frames'] == watched and hitch['drawn'] != watched:
+            frame = sys._current_frames().get(main_id)
+            stack = []
+            while frame is not None:
+                stack.append((frame.f_code, frame.f_lineno))
+                frame = frame.f_back
+            hitch_samples.append((time.perf_counter_ns(), tuple(stack)))
+            time.sleep(interval)
+
+def start_hitch_sampler():
+    """Start the watchdog thread unless the detector is off"""
+    if HITCH_CONFIG['threshold_ms'] <= 0 or hitch['sampler'] is not None:
+        return
+    hitch['sampling'] = True
+    sampler = threading.Thread(target=watch_main_thread, daemon=True,
+                               args=(HITCH_CONFIG['arm_ms'] / 1000, HITCH_CONFIG['sample_ms'] / 1000))
+    sampler.start()
+    hitch['sampler'] = sampler
+
+def stop_hitch_sampler():
+    """Stop the watchdog thread"""
+    sampler = hitch['sampler']
+    if sampler is not None:
+        hitch['sampling'] = False
+        hitch_wakeup.set()
+        sampler.join()
+        hitch['sampler'] = None
+
+def frame_work_ns(spans):
+    """(update, draw) time of a frame's spans"""
+    update_ns = draw_ns = 0
+    for name, lane, begin, end in spans:
+        if name == 'update' and lane == LANE_UPDATE:
+            update_ns += end - begin
+        elif name == 'draw' and lane == LANE_DRAW:
+            draw_ns += end - begin
+    return update_ns, draw_ns
+
+def collapse_samples(samples):
+    """Collapsed stacks and the hottest lines of a list of stack samples"""
+    stacks = {}
+    lines = {}
+    for _, stack in samples:
+        names = ';'.join(f"{code.co_name} ({os.path.basename(code.co_filename)})" for code, _ in reversed(stack))
+        stacks[names] = stacks.get(names, 0) + 1
+        if stack:
+            code, line = stack[0]
+            leaf = f"{os.path.basename(code.co_filename)}:{line or '?'} {code.co_name}"
+            lines[leaf] = lines.get(leaf, 0) + 1
+    profile = [f"{names} {total}" for names, total in sorted(stacks.items(), key=lambda item: -item[1])]
+    hot = [{'line': leaf, 'samples': total} for leaf, total in sorted(lines.items(), key=lambda item: -item[1])]
+    return profile, hot
+
+def capture_hitch(frame, update_ns, draw_ns):
+    """Hitch report of a closed telemetry frame"""
+    tick, start, spans, counters = frame
+    end = max(span[3] for span in spans)
+    samples = [sample for sample in list(hitch_samples) if start <= sample[0] <= end]
+    profile, hot = collapse_samples(samples)
+    times = {}
+    for name, _, begin, finish in spans:
+        times[name] = times.get(name, 0) + finish - begin
+    return {
+        'tick': tick,
+        'frame_ms': round((update_ns + draw_ns) / 1e6, 3),
+        'update_ms': round(update_ns / 1e6, 3),
+        'draw_ms': round(draw_ns / 1e6, 3),
+        'threshold_ms': HITCH_CONFIG['threshold_ms'],
+        'spans_ms': {name: round(ns / 1e6, 4) for name, ns in sorted(times.items(), key=lambda item: -item[1])},
+        'counters': dict(counters),
+        'caches': {
+            'surface': dict(surface_cache_stats),
+            'chunks': dict(chunk_stats),
+            'bake': dict(bake_stats),
+            'routes': dict(route_stats),
+            'timers': dict(timer_stats),
+        },
+        'governor_scale': GOVERNOR_LEVELS[governor['level']],
+        'samples': len(samples),
+        'sample_ms': HITCH_CONFIG['sample_ms'],
+        'hot_lines': hot[:20],
+        'profile': profile,
+    }
+
+def write_hitch(path, report):
+    """Write a hitch report - runs on the writer thread"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+    except OSError as e:
+        print(f"Could not write hitch report {path}: {e}")
+
+def check_hitch(frame):
+    """Write a report if a closed telemetry frame ran over the hitch threshold"""
+    threshold = HITCH_CONFIG['threshold_ms']
+    if frame is None or threshold <= 0 or not frame[2]:
+        return None
+    update_ns, draw_ns = frame_work_ns(frame[2])
+    if update_ns + draw_ns < threshold * 1e6:
+        return None
+    if hitch['reports'] >= HITCH_CONFIG['max_reports'] or telemetry['frames'] < hitch['quiet_until']:
+        return None
+    hitch['reports'] += 1
+    hitch['quiet_until'] = telemetry['frames'] + HITCH_CONFIG['cooldown']
+    
+    report = capture_hitch(frame, update_ns, draw_ns)
+    path = os.path.join(HITCH_CONFIG['dir'], f"hitch_{report['tick']:07d}.json")
+    worst = next((name for name in report['spans_ms'] if name not in ('update', 'draw', 'update_world', 'draw_world')), '-')
+    print(f"Hitch: {report['frame_ms']:.1f} ms at tick {report['tick']} (slowest {worst}, "
+          f"{report['samples']} samples) -> {path}")
+    
+    writer = hitch['writer']
+    if writer is not None and writer.is_alive():
+        writer.join()
+    writer = threading.Thread(target=write_hitch, args=(path, report), daemon=True)
+    writer.start()
+    hitch['writer'] = writer
+    return report
+
+def finish_hitches():
+    """Wait for a pending hitch report before the process exits"""
+    writer = hitch['writer']
+    if writer is not None:
+        writer.join()
+
+atexit.register(finish_hitches)
+
+# ============================================
+# EVENT BUS
+# ============================================
+# Systems post typed events while they run, and dispatch_events() hands each
+# type's queued events to that type's subscribers as one batch at the end of
+# the tick. Loops over entities never call into other systems half-way.
+# Event fields by type:
+#   EVENT_COLLISION   (kind, subject, other) kind: 'player_car', 'npc_car' or 'player_enemy'
+#   EVENT_DEATH       (kind, subject)        kind: 'player', 'npc' or 'enemy'
+#   EVENT_SPAWN       (kind, entity)         kind: 'npc', 'enemy', 'car' or 'bullet'
+#   EVENT_DESPAWN     (kind, x, y)           the entity may already be reused
+#   EVENT_SHOT_FIRED  (x, y, direction)
+#   EVENT_ANIMATION_DONE (kind, subject, animation)  a one-shot animation ended
+
+EVENT_COLLISION = 0
+EVENT_DEATH = 1
+EVENT_SPAWN = 2
+EVENT_DESPAWN = 3
+EVENT_SHOT_FIRED = 4
+EVENT_ANIMATION_DONE = 5
+EVENT_NAMES = ('collision', 'death', 'spawn', 'despawn', 'shot_fired', 'animation_done')
+
+EVENT_CONFIG = {
+    'max_rounds': 4,   # Dispatch passes per tick for events posted by subscribers
+}
+
+event_queues = [[] for _ in EVENT_NAMES]        # Events waiting per type
+event_subscribers = [[] for _ in EVENT_NAMES]   # Handlers per type, called with a batch
+event_stats = [{'posted': 0, 'batches': 0, 'seconds': 0.0} for _ in EVENT_NAMES]
+track_total('shots', event_stats[EVENT_SHOT_FIRED], 'posted')
+
+def subscribe(event_type, handler):
+    """Call handler(batch) with every batch of event_type"""
+    event_subscribers[event_type].append(handler)
+
+def post_event(event_type, *fields):
+    """Queue an event for the end of the tick"""
+    event_queues[event_type].append(fields)
+    event_stats[event_type]['posted'] += 1
+
+def dispatch_events():
+    """Deliver queued events in per-type batches until nothing new is posted"""
+    for _ in range(EVENT_CONFIG['max_rounds']):
+        delivered = False
+        for event_type in range(len(EVENT_NAMES)):
+            batch = event_queues[event_type]
+            if not batch:
+                continue
+            event_queues[event_type] = []
+            delivered = True
+            start = time.perf_counter()
+            for handler in event_subscribers[event_type]:
+                handler(batch)
+            stats = event_stats[event_type]
+            stats['batches'] += 1
+            stats['seconds'] += time.perf_counter() - start
+        if not delivered:
+            break
+
+def event_report():
+    """One line per event type with its counts and dispatch time"""
+    return [f"{name:<14} {stats['posted']:8d} posted, {stats['batches']:6d} batches, "
+            f"{stats['seconds'] * 1000:8.2f} ms" for name, stats in zip(EVENT_NAMES, event_stats)]
+
+# ============================================
+# TIMER WHEEL
+# ============================================
+# Entity countdowns - NPC decisions, sitting and fleeing, gridlocked cars and
+# bullet range - are deadlines in a hashed timing wheel instead of counters
+# stepped on every entity every tick. An entity keeps the tick its timer is
+# due in a field, and schedule_timer() files (deadline, kind, entity,
+# generation) in the slot for that tick. advance_timers() steps the world
+# clock and fires the due entries of one slot, so a tick costs the timers
+# that expire, not the population. Moving or cancelling a deadline only
+# changes the entity's field - the old entry is dropped when its slot comes
+# round. The world clock stops while the player is dead, like the world.
+
+TIMER_CONFIG = {
+    'slots': 512,   # Deadlines further out than this wait in their slot for more laps
+}
+
+# Timer kinds - each keeps its deadline in the named entity field
+TIMER_DECIDE = 0   # npc.decide_at: pick a new behavior
+TIMER_SIT = 1      # npc.sit_until: stand up
+TIMER_FLEE = 2     # npc.flee_until: stop running away
+TIMER_STUCK = 3    # car.stuck_at: gridlocked too long
+TIMER_EXPIRE = 4   # bullet.expires_at: out of range
+TIMER_ANIMATION = 5  # anim_ends_at: an NPC's or enemy's one-shot animation played out
+TIMER_THINK = 6    # enemy.think_at: run the behavior tree
+TIMER_FIELDS = ('decide_at', 'sit_until', 'flee_until', 'stuck_at', 'expires_at', 'anim_ends_at', 'think_at')
+
+timers = {'now': 0}    # World clock - ticks the world has been advanced
+timer_slots = [[] for _ in range(TIMER_CONFIG['slots'])]
+timer_handlers = [None] * len(TIMER_FIELDS)
+timer_stats = {'scheduled': 0, 'fired': 0, 'stale': 0}
+track_total('timers_fired', timer_stats, 'fired')
+
+def on_timer(kind, handler):
+    """Call handler(entity) when a timer of this kind comes due"""
+    timer_handlers[kind] = handler
+
+def schedule_timer(entity, kind, delay):
+    """Set the entity's deadline of this kind `delay` ticks from now, replacing the old one"""
+    deadline = timers['now'] + max(1, delay)
+    setattr(entity, TIMER_FIELDS[kind], deadline)
+    timer_slots[deadline % len(timer_slots)].append((deadline, kind, entity, entity.generation))
+    timer_stats['scheduled'] += 1
+
+def cancel_timer(entity, kind):
+    setattr(entity, TIMER_FIELDS[kind], None)
+
+def timer_remaining(deadline):
+    """Ticks until a deadline, -1 if it is not set"""
+    return -1 if deadline is None else deadline - timers['now']
+
+def restore_timer(entity, kind, remaining):
+    """Inverse of timer_remaining() for a freshly spawned entity"""
+    if remaining < 0:
+        cancel_timer(entity, kind)
+    else:
+        schedule_timer(entity, kind, remaining)
+
+def reset_timers(now=0):
+    """Drop every scheduled timer and set the world clock"""
+    timers['now'] = now
+    for slot in timer_slots:
+        slot.clear()
+
+def advance_timers():
+    """Step the world clock and fire the timers due on the new tick"""
+    now = timers['now'] = timers['now'] + 1
+    index = now % len(timer_slots)
+    slot = timer_slots[index]
+    if not slot:
+        return
+    due = []
+    later = []
+    for entry in slot:
+        if entry[0] > now:
+            later.append(entry)
+        elif entry[2].generation == entry[3] and entry[2].pool_index >= 0:
+            due.append(entry)
+        else:
+            timer_stats['stale'] += 1
+    timer_slots[index] = later
+    # Pool order, not scheduling order - a loaded save fires them the same way
+    due.sort(key=lambda entry: (entry[1], entry[2].pool_index))
+    for deadline, kind, entity, _ in due:
+        field = TIMER_FIELDS[kind]
+        if getattr(entity, field) != deadline or entity.pool_index < 0:
+            timer_stats['stale'] += 1
+            continue
+        setattr(entity, field, None)
+        timer_stats['fired'] += 1
+        timer_handlers[kind](entity)
+
+# ============================================
+# ANIMATION
+# ============================================
+# Sprite frames are worked out from a clock when they are drawn. An animated
+# entity keeps its animation and the tick it started, and the frame is
+# (tick - start) // speed - wrapped for loops, held on the last frame for
+# one-shots. Nothing is stepped per entity per tick, so entities off screen
+# cost nothing. One-shots post EVENT_ANIMATION_DONE when they end: NPCs
+# through TIMER_ANIMATION, the player by checking its one deadline per tick.
+# NPCs animate on the world clock and the player on game_state['tick'], so
+# the player's hurt animation still plays while the world is stopped.
+
+ONE_SHOT_ANIMATIONS = ('hurt', 'slash_katana', 'shoot')
+
+def animation_frame(start, now, speed, count, loop=True):
+    """Frame of an animation that started on tick `start`"""
+    frame = (now - start) // speed
+    return frame % count if loop else min(frame, count - 1)
+
+def animation_length(speed, count):
+    """Ticks a one-shot animation takes to play out"""
+    return speed * count
+
+# ============================================
+# ENTITY SYSTEM
+# ============================================
+
+# Direction ids (same order as the spritesheet rows)
+DIR_UP = 0
+DIR_LEFT = 1
+DIR_DOWN = 2
+DIR_RIGHT = 3
+
+DIRECTION_NAMES = ('up', 'left', 'down', 'right')
+DIRECTION_IDS = {name: i for i, name in enumerate(DIRECTION_NAMES)}
+
+# Unit step per direction id
+DIRECTION_STEPS = ((0, -1), (-1, 0), (0, 1), (1, 0))
+
+class EntityPool:
+    """Dense storage for live entities with O(1) despawn and object recycling.
+
+    Live entities sit in a dense list; despawning swaps the last entity into
+    the freed index. Despawned objects go to a free list and are reused by
+    the next spawn, so heavy spawn/kill rates allocate nothing new.
+    """
+
+    def __init__(self, entity_class):
+        self.entity_class = entity_class
+        self.items = []    # live entities (iteration order is not stable)
+        self.free = []     # despawned entities waiting for reuse
+        self.allocated = 0  # entities ever created
+
+    def spawn(self, *args):
+        """Return a live entity, recycled when possible"""
+        if self.free:
+            entity = self.free.pop()
+            entity.generation += 1
+            entity.reset(*args)
+        else:
+            entity = self.entity_class(*args)
+            self.allocated += 1
+        entity.pool_index = len(self.items)
+        self.items.append(entity)
+        return entity
+
+    def despawn(self, entity):
+        """Swap-remove a live entity and keep it for reuse"""
+        index = entity.pool_index
+        if index < 0:
+            return  # Already despawned
+        last = self.items.pop()
+        if last is not entity:
+            self.items[index] = last
+            last.pool_index = index
+        entity.pool_index = -1
+        self.free.append(entity)
+
+    def clear(self):
+        """Despawn every live entity"""
+        for entity in self.items:
+            entity.pool_index = -1
+        self.free.extend(self.items)
+        self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+class NPC:
+    """Ambulant city NPC - fixed fields instead of a per-NPC dict"""
+    kind = 'npc'
+    __slots__ = ('type', 'x', 'y', 'direction', 'state', 'anim_start', 'anim_ends_at',
+                 'decide_at', 'sit_until', 'flee_until', 'target_x', 'target_y', 'path', 'alive',
+                 'generation', 'pool_index')
+
+    def __init__(self, *args):
+        self.generation = 0
+        self.pool_index = -1
+        self.reset(*args)
+
+    def reset(self, npc_type, x, y, direction):
+        self.type = npc_type
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.state = NPC_STATE_IDLE
+        self.anim_start = timers['now']
+        self.anim_ends_at = None
+        self.sit_until = None
+        self.flee_until = None
+        schedule_timer(self, TIMER_DECIDE, NPC_CONFIG['decision_interval'])
+        self.target_x = None
+        self.target_y = None
+        self.path = None          # HierarchicalPath while commuting
+        self.alive = True
+
+class TrafficCar:
+    """Traffic vehicle - direction and state are integer ids"""
+    __slots__ = ('name', 'x', 'y', 'direction', 'speed', 'target_speed', 'angle', 'state',
+                 'stuck_at', 'target_lane', 'last_intersection', 'turned_at',
+                 'lane_y', 'lane_x', 'destination', 'route', 'route_step', 'reservation', 'granted',
+                 'generation', 'pool_index')
+
+    def __init__(self, *args):
+        self.generation = 0
+        self.pool_index = -1
+        self.reset(*args)
+
+    def reset(self, name, x, y, direction):
+        self.name = name
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.speed = TRAFFIC_CONFIG['car_speed']
+        self.target_speed = TRAFFIC_CONFIG['car_max_speed']
+        self.angle = get_angle_for_direction(direction)
+        self.state = CAR_STATE_DRIVING
+        self.stuck_at = None      # Gridlock deadline while stopped by traffic
+        self.target_lane = None
+        self.last_intersection = None
+        self.turned_at = timers['now'] - 999
+        self.lane_y = y if direction in (DIR_LEFT, DIR_RIGHT) else None
+        self.lane_x = x if direction in (DIR_UP, DIR_DOWN) else None
+        self.destination = None   # Intersection index the car is driving to
+        self.route = None         # ((intersection index, direction), ...) from the route cache
+        self.route_step = 0
+        self.reservation = None   # IntersectionController the car has requested or holds
+        self.granted = False
+
+class Bullet:
+    """Player bullet"""
+    __slots__ = ('x', 'y', 'vel_x', 'vel_y', 'angle', 'expires_at', 'generation', 'pool_index')
+
+    def __init__(self, *args):
+        self.generation = 0
+        self.pool_index = -1
+        self.reset(*args)
+
+    def reset(self, x, y, vel_x, vel_y, angle, lifetime):
+        self.x = x
+        self.y = y
+        self.vel_x = vel_x
+        self.vel_y = vel_y
+        self.angle = angle
+        schedule_timer(self, TIMER_EXPIRE, lifetime)
+
+def load_npc_spritesheets():
+    """Load all NPC spritesheets (npc1-9)"""
+    try:
+        for i in range(1, 10):
+            NPC_SPRITESHEETS[f'npc{i}'] = {
+                'idle': pygame.image.load(f'images/npc{i}idle.png'),
+                'walk': pygame.image.load(f'images/npc{i}walk.png'),
+                'run': pygame.image.load(f'images/npc{i}run.png'),
+                'sit': pygame.image.load(f'images/npc{i}sit.png'),
+                'hurt': pygame.image.load(f'images/npc{i}hurt.png')
+            }
+        print(f"Loaded {len(NPC_SPRITESHEETS)} NPC types successfully!")
+    except Exception as e:
+        print(f"Error loading NPC spritesheets: {e}")
+
+# NPC frame counts (same as player)
+NPC_FRAME_COUNTS = {
+    'idle': 2,
+    'walk': 9,
+    'run': 8,
+    'sit': 3,   
+    'hurt': 6
 }
 
 # Player setup
@@ -59,7 +916,8 @@ GUN_CONFIG = {
 }
 
 # Bullet system
-bullets = []  # List of active bullets
+bullets = EntityPool(Bullet)  # Active bullets
+track_gauge('bullets', bullets.__len__)
 
 # Bullet configuration - ADJUST THESE VALUES
 BULLET_CONFIG = {
@@ -69,17 +927,24 @@ BULLET_CONFIG = {
 }
 
 # NPC System
-npcs = []  # List of all NPCs
+npcs = EntityPool(NPC)  # All NPCs
+track_gauge('npcs', npcs.__len__)
 
 # NPC Configuration - ADJUST POPULATION HERE
 NPC_CONFIG = {
     'max_population': 200,        # CHANGE THIS: Total number of NPCs in the world
     'walk_speed': 1.0,            # NPC walking speed
     'run_speed': 2.0,             # NPC running speed (when scared)
-    'animation_speed': 8,         # Animation frame delay
+    'animation_speed': 8,         # Ticks per animation frame
     'decision_interval': 300,     # Frames between behavior changes (3 seconds at 60fps)
     'sidewalk_preference': 0.9,   # 90% chance to stay on sidewalk
     'sit_duration': 240,          # How long NPCs sit (4 seconds)
+    'lod_distance': 1000,         # Further than this from the player NPCs check for cars less often
+    'lod_stride': 4,              # Ticks between car checks for those NPCs
+    'zone_weights': {             # Relative spawn density per zone
+        'residential': 1.0,
+        'industrial': 1.0,
+    },
 }
 
 # NPC spritesheets
@@ -92,62 +957,48 @@ NPC_STATE_RUNNING = 2
 NPC_STATE_SITTING = 3
 NPC_STATE_HURT = 4
 
-def load_npc_spritesheets():
-    """Load all NPC spritesheets (npc1-9)"""
-    try:
-        for i in range(1, 10):
-            NPC_SPRITESHEETS[f'npc{i}'] = {
-                'idle': pygame.image.load(f'images/npc{i}idle.png'),
-                'walk': pygame.image.load(f'images/npc{i}walk.png'),
-                'run': pygame.image.load(f'images/npc{i}run.png'),
-                'sit': pygame.image.load(f'images/npc{i}sit.png'),
-                'hurt': pygame.image.load(f'images/npc{i}hurt.png')
-            }
-        print(f"Loaded {len(NPC_SPRITESHEETS)} NPC types successfully!")
-    except Exception as e:
-        print(f"Error loading NPC spritesheets: {e}")
+# NPC state id -> spritesheet / frame count key
+NPC_STATE_NAMES = ('idle', 'walk', 'run', 'sit', 'hurt')
 
-# NPC frame counts (same as player)
-NPC_FRAME_COUNTS = {
-    'idle': 2,
-    'walk': 9,
-    'run': 8,
-    'sit': 3,   
-    'hurt': 6
-}
+# States whose animation plays once and holds the last frame
+NPC_HELD_STATES = (NPC_STATE_SITTING, NPC_STATE_HURT)
 
-def get_npc_frame(npc_type, state, direction, frame_index):
-    """Extract NPC frame from spritesheet"""
+def get_npc_frame(npc_type, state, direction, frame_index, scale=1.0):
+    """Extract NPC frame from spritesheet, scaled and cached"""
     if npc_type not in NPC_SPRITESHEETS:
         return None
     
-    state_map = {
-        NPC_STATE_IDLE: 'idle',
-        NPC_STATE_WALKING: 'walk',
-        NPC_STATE_RUNNING: 'run',
-        NPC_STATE_SITTING: 'sit',
-        NPC_STATE_HURT: 'hurt'
-    }
-    
-    state_name = state_map.get(state, 'idle')
+    state_name = NPC_STATE_NAMES[state]
     
     if state_name not in NPC_SPRITESHEETS[npc_type]:
         return None
     
     spritesheet = NPC_SPRITESHEETS[npc_type][state_name]
     
-    # Row mapping (same as player)
-    row = DIRECTION_ROWS.get(direction, 0)
+    # Direction ids are the row index (same as player)
+    row = direction
     
     # Each frame is 64x64
     frame_x = frame_index * 64
     frame_y = row * 64
     
-    try:
-        frame = spritesheet.subsurface(pygame.Rect(frame_x, frame_y, 64, 64))
-        return frame
-    except:
-        return None
+    def build():
+        try:
+            return scale_surface(spritesheet.subsurface(pygame.Rect(frame_x, frame_y, 64, 64)), scale)
+        except ValueError:
+            return None
+    return cached_surface(((npc_type, state_name, frame_x, frame_y), 0, scale), build)
+
+def set_npc_state(npc, state):
+    """Switch an NPC's state, starting that state's animation from its first frame"""
+    if npc.state != state:
+        npc.state = state
+        npc.anim_start = timers['now']
+
+def npc_frame(npc, now):
+    """Frame of an NPC's animation on world tick `now`"""
+    return animation_frame(npc.anim_start, now, NPC_CONFIG['animation_speed'],
+                           NPC_FRAME_COUNTS[NPC_STATE_NAMES[npc.state]], npc.state not in NPC_HELD_STATES)
 
 def is_on_sidewalk(x, y):
     """Check if position is on sidewalk"""
@@ -172,52 +1023,567 @@ def is_on_walkable_surface(x, y):
             return True
     return False
 
-def spawn_npc():
+# Sidewalk spawn index - every sidewalk tile grouped by zone, built once
+# after the map is generated so spawning never has to search the map
+sidewalk_index = {
+    'zones': [],        # Zones that have at least one sidewalk tile
+    'tiles': {},        # Zone -> list of (tile_x, tile_y)
+    'cum_weights': [],  # Running zone weights for rng.choices
+}
+
+def get_zone(tile_x):
+    """Zone name for a tile column"""
+    zone = MAP_ZONES[0][0]
+    for name, first_column in MAP_ZONES:
+        if tile_x < first_column:
+            break
+        zone = name
+    return zone
+
+def build_sidewalk_index():
+    """Collect sidewalk tiles per zone and weight the zones for spawning"""
+    tiles = {}
+    for tile_y in range(MAP_TILES_HEIGHT):
+        row = map_grid[tile_y]
+        for tile_x in range(MAP_TILES_WIDTH):
+            # Spawn points are anywhere inside the tile, so the whole tile must be free
+            if 'sidewalk' in row[tile_x].lower() and not tile_solid(tile_x, tile_y):
+                tiles.setdefault(get_zone(tile_x), []).append((tile_x, tile_y))
+
+    zones = []
+    cum_weights = []
+    total = 0.0
+    for zone, zone_tiles in tiles.items():
+        # Weight is per tile, so a zone with more sidewalk gets more NPCs
+        weight = NPC_CONFIG['zone_weights'].get(zone, 1.0) * len(zone_tiles)
+        if weight <= 0:
+            continue
+        total += weight
+        zones.append(zone)
+        cum_weights.append(total)
+
+    sidewalk_index['zones'] = zones
+    sidewalk_index['tiles'] = tiles
+    sidewalk_index['cum_weights'] = cum_weights
+
+def random_sidewalk_position(zone=None):
+    """Random point on a sidewalk tile, optionally inside one zone"""
+    if zone is None:
+        zone = rng.choices(sidewalk_index['zones'], cum_weights=sidewalk_index['cum_weights'])[0]
+    tile_x, tile_y = rng.choice(sidewalk_index['tiles'][zone])
+    x = tile_x * TILE_SIZE + rng.random() * TILE_SIZE
+    y = tile_y * TILE_SIZE + rng.random() * TILE_SIZE
+    return x, y
+
+def spawn_npc(zone=None):
     """Spawn a single NPC on a random sidewalk"""
-    # Try random positions until we find a sidewalk
-    for attempt in range(50):
-        x = random.randint(100, MAP_WIDTH - 100)
-        y = random.randint(100, MAP_HEIGHT - 100)
-        
-        if is_on_sidewalk(x, y):
-            # Choose random NPC type
-            npc_type = f'npc{random.randint(1, 9)}'
-            
-            npcs.append({
-                'type': npc_type,
-                'x': float(x),
-                'y': float(y),
-                'direction': random.choice(['up', 'down', 'left', 'right']),
-                'state': NPC_STATE_IDLE,
-                'current_frame': 0,
-                'frame_delay': 0,
-                'decision_timer': 0,
-                'sit_timer': 0,
-                'target_x': None,
-                'target_y': None,
-                'alive': True
-            })
-            return True
-    return False
+    if not sidewalk_index['zones']:
+        return False
+    
+    x, y = random_sidewalk_position(zone)
+    # Choose random NPC type
+    npc_type = f'npc{rng.randint(1, 9)}'
+    
+    npc = npcs.spawn(npc_type, x, y, rng.randrange(4))
+    post_event(EVENT_SPAWN, 'npc', npc)
+    return True
+
+def spawn_npcs(count):
+    """Spawn many NPCs at once - zones are drawn in one batch"""
+    zones = sidewalk_index['zones']
+    if not zones:
+        return 0
+    
+    for zone in rng.choices(zones, cum_weights=sidewalk_index['cum_weights'], k=count):
+        spawn_npc(zone)
+    return count
 
 def initialize_npcs():
     """Spawn initial NPC population"""
     npcs.clear()
-    for i in range(NPC_CONFIG['max_population']):
-        spawn_npc()
+    spawn_npcs(NPC_CONFIG['max_population'])
     print(f"Spawned {len(npcs)} NPCs")
 
+# ============================================
+# CROWD FLOW FIELDS
+# ============================================
+# One BFS distance field per goal over walkable tiles, shared by every NPC
+# that moves toward (or away from) that goal. Following a field is a few
+# array reads per NPC, so the cost is per goal, not per agent.
+
+FLOW_CONFIG = {
+    'goal_cell': 4,            # Goals snap to cells this many tiles wide
+    'cache_size': 16,          # Finished fields kept (LRU) for reuse
+    'nodes_per_tick': 4000,    # BFS budget per tick for fields being rebuilt
+    'flee_radius': 250,        # NPCs this close to gunfire run away
+    'flee_duration': 300,      # Frames an NPC keeps running
+}
+
+# 1 = walkable tile (sidewalk or crosswalk), row-major
+walkable_grid = bytearray(MAP_TILES_WIDTH * MAP_TILES_HEIGHT)
+
+flow_field_cache = OrderedDict()  # Goal cell -> finished FlowField
+flow_goals = {}                   # Goal name -> {'cell', 'field', 'pending'}
+
+def build_walkable_grid():
+    """Rasterize walkable tiles once after the map is generated"""
+    for tile_y in range(MAP_TILES_HEIGHT):
+        row = map_grid[tile_y]
+        base = tile_y * MAP_TILES_WIDTH
+        for tile_x in range(MAP_TILES_WIDTH):
+            tile = row[tile_x].lower()
+            walkable = 'sidewalk' in tile or 'crosswalk' in tile
+            # Paths run through tile centres - a footprint over the centre blocks the tile
+            if walkable and is_solid((tile_x + 0.5) * TILE_SIZE, (tile_y + 0.5) * TILE_SIZE):
+                walkable = False
+            walkable_grid[base + tile_x] = 1 if walkable else 0
+    flow_field_cache.clear()
+    flow_goals.clear()
+
+class FlowField:
+    """BFS distance field from one goal cell, built in budgeted slices"""
+    __slots__ = ('cell', 'distance', 'frontier')
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.distance = array('i', [-1]) * (MAP_TILES_WIDTH * MAP_TILES_HEIGHT)
+        self.frontier = deque()
+        # Seed from every walkable tile in the goal cell so goals on roads still work
+        size = FLOW_CONFIG['goal_cell']
+        for tile_y in range(cell[1] * size, min(MAP_TILES_HEIGHT, (cell[1] + 1) * size)):
+            for tile_x in range(cell[0] * size, min(MAP_TILES_WIDTH, (cell[0] + 1) * size)):
+                index = tile_y * MAP_TILES_WIDTH + tile_x
+                if walkable_grid[index]:
+                    self.distance[index] = 0
+                    self.frontier.append(index)
+
+    @property
+    def done(self):
+        return not self.frontier
+
+    def expand(self, budget):
+        """Run up to budget BFS steps, return how many were used"""
+        distance = self.distance
+        frontier = self.frontier
+        width = MAP_TILES_WIDTH
+        size = len(distance)
+        used = 0
+        while frontier and used < budget:
+            index = frontier.popleft()
+            used += 1
+            next_distance = distance[index] + 1
+            column = index % width
+            for neighbor in (index - width, index + width,
+                             index - 1 if column > 0 else -1,
+                             index + 1 if column < width - 1 else -1):
+                if 0 <= neighbor < size and walkable_grid[neighbor] and distance[neighbor] < 0:
+                    distance[neighbor] = next_distance
+                    frontier.append(neighbor)
+        return used
+
+    def direction_at(self, x, y, flee=False):
+        """Best direction id from a world position, or -1 if there is none"""
+        tile_x = int(x // TILE_SIZE)
+        tile_y = int(y // TILE_SIZE)
+        if not (0 <= tile_x < MAP_TILES_WIDTH and 0 <= tile_y < MAP_TILES_HEIGHT):
+            return -1
+        distance = self.distance
+        index = tile_y * MAP_TILES_WIDTH + tile_x
+        best = distance[index]
+        if best < 0:
+            return -1
+        best_direction = -1
+        for direction, neighbor, valid in (
+                (DIR_UP, index - MAP_TILES_WIDTH, tile_y > 0),
+                (DIR_LEFT, index - 1, tile_x > 0),
+                (DIR_DOWN, index + MAP_TILES_WIDTH, tile_y < MAP_TILES_HEIGHT - 1),
+                (DIR_RIGHT, index + 1, tile_x < MAP_TILES_WIDTH - 1)):
+            if not valid:
+                continue
+            value = distance[neighbor]
+            if value < 0:
+                continue
+            if (value > best) if flee else (value < best):
+                best = value
+                best_direction = direction
+        return best_direction
+
+def set_flow_goal(name, x, y):
+    """Point a named goal at a world position - fields rebuild incrementally"""
+    size = FLOW_CONFIG['goal_cell'] * TILE_SIZE
+    cell = (int(x // size), int(y // size))
+    goal = flow_goals.setdefault(name, {'cell': None, 'field': None, 'pending': None})
+    if goal['cell'] == cell:
+        return
+    goal['cell'] = cell
+
+    cached = flow_field_cache.get(cell)
+    if cached is not None:
+        flow_field_cache.move_to_end(cell)
+        goal['field'] = cached
+        goal['pending'] = None
+    elif goal['pending'] is None or goal['pending'].cell != cell:
+        # Keep following the old field until the new one is finished
+        goal['pending'] = FlowField(cell)
+
+def update_flow_fields():
+    """Spend this tick's BFS budget on fields that are still being built"""
+    budget = FLOW_CONFIG['nodes_per_tick']
+    for goal in flow_goals.values():
+        pending = goal['pending']
+        if pending is None or budget <= 0:
+            continue
+        budget -= pending.expand(budget)
+        if pending.done:
+            goal['field'] = pending
+            goal['pending'] = None
+            flow_field_cache[pending.cell] = pending
+            if len(flow_field_cache) > FLOW_CONFIG['cache_size']:
+                flow_field_cache.popitem(last=False)
+
+def get_flow_field(name):
+    """Finished field for a goal name, or None while the first one builds"""
+    goal = flow_goals.get(name)
+    return goal['field'] if goal else None
+
+def scare_npcs(x, y):
+    """Make NPCs near a point run away from it along the gunfire field"""
+    set_flow_goal('gunfire', x, y)
+    radius_sq = FLOW_CONFIG['flee_radius'] ** 2
+    for npc in npcs:
+        if not npc.alive or npc.state == NPC_STATE_HURT:
+            continue
+        dx = npc.x - x
+        dy = npc.y - y
+        if dx * dx + dy * dy < radius_sq:
+            set_npc_state(npc, NPC_STATE_RUNNING)
+            schedule_timer(npc, TIMER_FLEE, FLOW_CONFIG['flee_duration'])
+            cancel_timer(npc, TIMER_DECIDE)
+            npc.path = None
+
+def scare_from_shots(batch):
+    for x, y, _ in batch:
+        scare_npcs(x, y)
+
+subscribe(EVENT_SHOT_FIRED, scare_from_shots)
+
+# ============================================
+# HIERARCHICAL PATHFINDING (HPA*)
+# ============================================
+# The tile grid is cut into clusters at chunk borders and zone borders.
+# Passable openings along cluster borders become portal nodes, joined by
+# precomputed in-cluster distances. A long route is an abstract path over
+# portals, refined into tiles one segment at a time as the agent walks it.
+
+PATH_CONFIG = {
+    'cluster_size': 16,        # Tiles per cluster side
+    'long_opening': 6,         # Border openings wider than this get a portal at each end
+    'path_cache_size': 1024,   # Abstract paths kept (LRU)
+    'tree_cache_size': 32,     # Per-goal abstract search trees kept (LRU)
+    'entry_cache_size': 4096,  # Tile -> portal cost lists kept (LRU)
+    'segment_cache_size': 4096,  # Refined segments kept (LRU)
+    'commute_chance': 0.1,     # Chance a walking NPC heads somewhere far away
+}
+
+def lru_get(cache, key):
+    """Look up an LRU OrderedDict entry, refreshing it - returns (found, value)"""
+    if key in cache:
+        cache.move_to_end(key)
+        return True, cache[key]
+    return False, None
+
+def lru_put(cache, key, value, limit):
+    cache[key] = value
+    if len(cache) > limit:
+        cache.popitem(last=False)
+
+class HierarchicalGrid:
+    """HPA* over a passability grid (one byte per tile, row-major)"""
+
+    def __init__(self, passable, width, height):
+        self.passable = passable
+        self.width = width
+        self.height = height
+        self.built = False
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def build(self):
+        """Find portals on every cluster border and link them inside clusters"""
+        size = PATH_CONFIG['cluster_size']
+        # Cluster columns also break at zone borders so zones never share a cluster
+        columns = set(range(0, self.width, size))
+        columns.update(first for _, first in MAP_ZONES if 0 < first < self.width)
+        self.col_bounds = sorted(columns) + [self.width]
+        self.row_bounds = list(range(0, self.height, size)) + [self.height]
+        self.col_cluster = array('i', [0]) * self.width
+        self.row_cluster = array('i', [0]) * self.height
+        for cluster_x in range(len(self.col_bounds) - 1):
+            for tile_x in range(self.col_bounds[cluster_x], self.col_bounds[cluster_x + 1]):
+                self.col_cluster[tile_x] = cluster_x
+        for cluster_y in range(len(self.row_bounds) - 1):
+            for tile_y in range(self.row_bounds[cluster_y], self.row_bounds[cluster_y + 1]):
+                self.row_cluster[tile_y] = cluster_y
+
+        self.node_of_tile = {}    # Tile index -> abstract node
+        self.node_tiles = []      # Abstract node -> tile index
+        self.neighbors = []       # Abstract node -> [(node, cost), ...]
+        self.cluster_nodes = {}   # Cluster -> [node, ...]
+        self.entry_cache = OrderedDict()
+        self.tree_cache = OrderedDict()
+        self.path_cache = OrderedDict()
+        self.segment_cache = OrderedDict()
+
+        width = self.width
+        # Vertical borders: tiles (border - 1, y) | (border, y)
+        for border in self.col_bounds[1:-1]:
+            for cluster_y in range(len(self.row_bounds) - 1):
+                pairs = [((border - 1) + y * width, border + y * width)
+                         for y in range(self.row_bounds[cluster_y], self.row_bounds[cluster_y + 1])]
+                self.add_portals(pairs)
+        # Horizontal borders: tiles (x, border - 1) / (x, border)
+        for border in self.row_bounds[1:-1]:
+            for cluster_x in range(len(self.col_bounds) - 1):
+                pairs = [(x + (border - 1) * width, x + border * width)
+                         for x in range(self.col_bounds[cluster_x], self.col_bounds[cluster_x + 1])]
+                self.add_portals(pairs)
+
+        # Intra-cluster edges between every pair of portals that can reach each other
+        for cluster, nodes in self.cluster_nodes.items():
+            for node in nodes:
+                distance = self.local_search(self.node_tiles[node], cluster)[0]
+                for other in nodes:
+                    if other != node and self.node_tiles[other] in distance:
+                        self.neighbors[node].append((other, distance[self.node_tiles[other]]))
+        self.built = True
+
+    def add_portals(self, pairs):
+        """Turn each run of passable tile pairs along a border into portals"""
+        passable = self.passable
+        run = []
+        for pair in pairs + [None]:
+            if pair is not None and passable[pair[0]] and passable[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                if len(run) > PATH_CONFIG['long_opening']:
+                    chosen = (run[0], run[-1])
+                else:
+                    chosen = (run[len(run) // 2],)
+                for inside, outside in chosen:
+                    a = self.get_node(inside)
+                    b = self.get_node(outside)
+                    self.neighbors[a].append((b, 1))
+                    self.neighbors[b].append((a, 1))
+                run = []
+
+    def get_node(self, tile):
+        node = self.node_of_tile.get(tile)
+        if node is None:
+            node = len(self.node_tiles)
+            self.node_of_tile[tile] = node
+            self.node_tiles.append(tile)
+            self.neighbors.append([])
+            self.cluster_nodes.setdefault(self.cluster_of(tile), []).append(node)
+        return node
+
+    def cluster_of(self, tile):
+        return (self.col_cluster[tile % self.width], self.row_cluster[tile // self.width])
+
+    def local_search(self, source, cluster, target=None):
+        """BFS that never leaves one cluster - returns (distance, parent)"""
+        x0 = self.col_bounds[cluster[0]]
+        x1 = self.col_bounds[cluster[0] + 1]
+        y0 = self.row_bounds[cluster[1]]
+        y1 = self.row_bounds[cluster[1] + 1]
+        width = self.width
+        passable = self.passable
+        distance = {source: 0}
+        parent = {source: None}
+        frontier = deque([source])
+        while frontier:
+            tile = frontier.popleft()
+            if tile == target:
+                break
+            x = tile % width
+            y = tile // width
+            for nx, ny in ((x, y - 1), (x - 1, y), (x, y + 1), (x + 1, y)):
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    neighbor = ny * width + nx
+                    if passable[neighbor] and neighbor not in distance:
+                        distance[neighbor] = distance[tile] + 1
+                        parent[neighbor] = tile
+                        frontier.append(neighbor)
+        return distance, parent
+
+    def entries(self, tile):
+        """Portals reachable from a tile inside its own cluster, with costs"""
+        found, result = lru_get(self.entry_cache, tile)
+        if found:
+            return result
+        cluster = self.cluster_of(tile)
+        distance = self.local_search(tile, cluster)[0]
+        result = tuple((node, distance[self.node_tiles[node]])
+                       for node in self.cluster_nodes.get(cluster, ())
+                       if self.node_tiles[node] in distance)
+        lru_put(self.entry_cache, tile, result, PATH_CONFIG['entry_cache_size'])
+        return result
+
+    def goal_tree(self, goal):
+        """Dijkstra outwards from a goal over the portal graph - (cost, next hop) per node"""
+        found, tree = lru_get(self.tree_cache, goal)
+        if found:
+            return tree
+        cost = {}
+        next_hop = {}
+        heap = []
+        for node, entry_cost in self.entries(goal):
+            cost[node] = entry_cost
+            next_hop[node] = None  # Straight to the goal inside the cluster
+            heap.append((entry_cost, node))
+        heapq.heapify(heap)
+        while heap:
+            node_cost, node = heapq.heappop(heap)
+            if node_cost > cost[node]:
+                continue
+            for neighbor, edge_cost in self.neighbors[node]:
+                new_cost = node_cost + edge_cost
+                if new_cost < cost.get(neighbor, float('inf')):
+                    cost[neighbor] = new_cost
+                    next_hop[neighbor] = node
+                    heapq.heappush(heap, (new_cost, neighbor))
+        tree = (cost, next_hop)
+        lru_put(self.tree_cache, goal, tree, PATH_CONFIG['tree_cache_size'])
+        return tree
+
+    def find_path(self, start, goal):
+        """Abstract path as a tuple of tile waypoints, or None if unreachable"""
+        if not (self.passable[start] and self.passable[goal]):
+            return None
+        if not self.built:
+            self.build()
+        key = (start, goal)
+        found, waypoints = lru_get(self.path_cache, key)
+        if found:
+            self.stats['hits'] += 1
+            return waypoints
+        self.stats['misses'] += 1
+
+        waypoints = None
+        cluster = self.cluster_of(start)
+        if cluster == self.cluster_of(goal) and goal in self.local_search(start, cluster, goal)[0]:
+            waypoints = (start, goal)
+        else:
+            cost, next_hop = self.goal_tree(goal)
+            best_node = None
+            best_cost = float('inf')
+            for node, entry_cost in self.entries(start):
+                total = entry_cost + cost.get(node, float('inf'))
+                if total < best_cost:
+                    best_cost = total
+                    best_node = node
+            if best_node is not None:
+                route = [start]
+                node = best_node
+                while node is not None:
+                    route.append(self.node_tiles[node])
+                    node = next_hop[node]
+                route.append(goal)
+                waypoints = tuple(route)
+
+        lru_put(self.path_cache, key, waypoints, PATH_CONFIG['path_cache_size'])
+        return waypoints
+
+    def refine(self, a, b):
+        """Tiles from waypoint a to waypoint b (excluding a)"""
+        if a == b:
+            return ()
+        found, tiles = lru_get(self.segment_cache, (a, b))
+        if found:
+            return tiles
+        ax, ay = a % self.width, a // self.width
+        bx, by = b % self.width, b // self.width
+        if abs(ax - bx) + abs(ay - by) == 1:
+            tiles = (b,)  # Portal crossing
+        else:
+            parent = self.local_search(a, self.cluster_of(a), b)[1]
+            tiles = []
+            tile = b if b in parent else None
+            while tile is not None and tile != a:
+                tiles.append(tile)
+                tile = parent[tile]
+            tiles.reverse()
+            tiles = tuple(tiles)
+        lru_put(self.segment_cache, (a, b), tiles, PATH_CONFIG['segment_cache_size'])
+        return tiles
+
+class HierarchicalPath:
+    """A route being walked - refines one abstract segment at a time"""
+    __slots__ = ('grid', 'waypoints', 'segment', 'tiles', 'position')
+
+    def __init__(self, grid, waypoints):
+        self.grid = grid
+        self.waypoints = waypoints
+        self.segment = 0
+        self.tiles = (waypoints[0],)
+        self.position = 0
+
+    def current_tile(self):
+        while self.position >= len(self.tiles):
+            if self.segment + 1 >= len(self.waypoints):
+                return None
+            self.tiles = self.grid.refine(self.waypoints[self.segment], self.waypoints[self.segment + 1])
+            self.segment += 1
+            self.position = 0
+        return self.tiles[self.position]
+
+    def step(self, x, y, speed):
+        """Move up to speed toward the next tile - (x, y, direction) or None when done"""
+        width = self.grid.width
+        while True:
+            tile = self.current_tile()
+            if tile is None:
+                return None
+            target_x = (tile % width + 0.5) * TILE_SIZE
+            target_y = (tile // width + 0.5) * TILE_SIZE
+            dx = target_x - x
+            dy = target_y - y
+            if abs(dx) < 0.01 and abs(dy) < 0.01:
+                self.position += 1
+                continue
+            if abs(dx) >= abs(dy):
+                move = max(-speed, min(speed, dx))
+                return x + move, y, DIR_RIGHT if dx > 0 else DIR_LEFT
+            move = max(-speed, min(speed, dy))
+            return x, y + move, DIR_DOWN if dy > 0 else DIR_UP
+
+pedestrian_paths = HierarchicalGrid(walkable_grid, MAP_TILES_WIDTH, MAP_TILES_HEIGHT)
+
+def find_walk_path(start_x, start_y, goal_x, goal_y):
+    """Long-distance walking path between two world positions, or None"""
+    start_tile_x = int(start_x // TILE_SIZE)
+    start_tile_y = int(start_y // TILE_SIZE)
+    goal_tile_x = int(goal_x // TILE_SIZE)
+    goal_tile_y = int(goal_y // TILE_SIZE)
+    if not (0 <= start_tile_x < MAP_TILES_WIDTH and 0 <= start_tile_y < MAP_TILES_HEIGHT and
+            0 <= goal_tile_x < MAP_TILES_WIDTH and 0 <= goal_tile_y < MAP_TILES_HEIGHT):
+        return None
+    waypoints = pedestrian_paths.find_path(start_tile_y * MAP_TILES_WIDTH + start_tile_x,
+                                           goal_tile_y * MAP_TILES_WIDTH + goal_tile_x)
+    if waypoints is None:
+        return None
+    return HierarchicalPath(pedestrian_paths, waypoints)
+
 def check_npc_player_collision(new_x, new_y):
     """Check if player would collide with any NPC"""
     player_radius = 8
     npc_radius = 10
     
     for npc in npcs:
-        if not npc['alive']:
+        if not npc.alive:
             continue
             
-        dx = new_x - npc['x']
-        dy = new_y - npc['y']
+        dx = new_x - npc.x
+        dy = new_y - npc.y
         distance = (dx * dx + dy * dy) ** 0.5
         
         if distance < (player_radius + npc_radius):
@@ -231,120 +1597,184 @@ def check_npc_car_collision(npc):
     car_radius = 14
     
     for car in traffic_vehicles:
-        dx = npc['x'] - car['x']
-        dy = npc['y'] - car['y']
+        dx = npc.x - car.x
+        dy = npc.y - car.y
         distance = (dx * dx + dy * dy) ** 0.5
         
         if distance < (npc_radius + car_radius):
-            return True
-    return False
+            return car
+    return None
 
-def update_npc(npc):
+def update_npc(npc, check_cars=True):
     """Update single NPC behavior"""
-    if not npc['alive']:
+    if not npc.alive:
         return
     
-    # Update animation frame (but NOT for sitting - it should stay on last frame)
-    if npc['state'] != NPC_STATE_SITTING:
-        npc['frame_delay'] += 1
-        if npc['frame_delay'] >= NPC_CONFIG['animation_speed']:
-            npc['frame_delay'] = 0
-            npc['current_frame'] += 1
-            
-            # Get max frames for current state
-            state_map = {
-                NPC_STATE_IDLE: 'idle',
-                NPC_STATE_WALKING: 'walk',
-                NPC_STATE_RUNNING: 'run',
-                NPC_STATE_SITTING: 'sit',
-                NPC_STATE_HURT: 'hurt'
-            }
-            state_name = state_map.get(npc['state'], 'idle')
-            max_frames = NPC_FRAME_COUNTS.get(state_name, 2)
-            
-            if npc['current_frame'] >= max_frames:
-                npc['current_frame'] = 0
-    
     # Check collision with cars
-    if check_npc_car_collision(npc):
-        npc['state'] = NPC_STATE_HURT
-        npc['alive'] = False
-        npc['current_frame'] = 0
-        # Spawn replacement
-        spawn_npc()
+    car = check_npc_car_collision(npc) if check_cars else None
+    if car is not None:
+        post_event(EVENT_COLLISION, 'npc_car', npc, car)
         return
     
-    # Behavior decision timer
-    npc['decision_timer'] += 1
+    # Fleeing - follow the gunfire field away from the shooter
+    if npc.state == NPC_STATE_RUNNING:
+        field = get_flow_field('gunfire')
+        direction = field.direction_at(npc.x, npc.y, flee=True) if field else -1
+        if direction >= 0:
+            npc.direction = direction
+        speed = NPC_CONFIG['run_speed']
+        step_x, step_y = DIRECTION_STEPS[npc.direction]
+        next_x = npc.x + step_x * speed
+        next_y = npc.y + step_y * speed
+        if is_on_walkable_surface(next_x, next_y) and not is_solid(next_x, next_y):
+            npc.x = next_x
+            npc.y = next_y
+        return
     
-    if npc['decision_timer'] >= NPC_CONFIG['decision_interval']:
-        npc['decision_timer'] = 0
-        
-        # Decide new behavior
-        behavior_choice = random.random()
-        
-        if behavior_choice < 0.3:
-            # 30% - Start walking
-            npc['state'] = NPC_STATE_WALKING
-            npc['direction'] = random.choice(['up', 'down', 'left', 'right'])
-        elif behavior_choice < 0.5:
-            # 20% - Sit down
-            npc['state'] = NPC_STATE_SITTING
-            npc['sit_timer'] = NPC_CONFIG['sit_duration']
-            npc['current_frame'] = 0  # Start sit animation from beginning
-        else:
-            # 50% - Stay idle
-            npc['state'] = NPC_STATE_IDLE
-    
-    # Handle sitting
-    if npc['state'] == NPC_STATE_SITTING:
-        npc['sit_timer'] -= 1
-        # Keep on last frame of sit animation
-        npc['current_frame'] = NPC_FRAME_COUNTS['sit'] - 1
-        if npc['sit_timer'] <= 0:
-            npc['state'] = NPC_STATE_IDLE
-            npc['current_frame'] = 0  # Reset frame when standing up
+    # Commuting - walk a long-distance path across the city
+    if npc.path is not None:
+        moved = npc.path.step(npc.x, npc.y, NPC_CONFIG['walk_speed'])
+        if moved is None:
+            # Arrived
+            npc.path = None
+            set_npc_state(npc, NPC_STATE_IDLE)
+            schedule_timer(npc, TIMER_DECIDE, NPC_CONFIG['decision_interval'])
+            return
+        npc.x, npc.y, npc.direction = moved
+        return
     
     # Handle walking
-    if npc['state'] == NPC_STATE_WALKING:
+    if npc.state == NPC_STATE_WALKING:
         speed = NPC_CONFIG['walk_speed']
         
-        next_x = npc['x']
-        next_y = npc['y']
+        next_x = npc.x
+        next_y = npc.y
         
-        if npc['direction'] == 'up':
+        if npc.direction == DIR_UP:
             next_y -= speed
-        elif npc['direction'] == 'down':
+        elif npc.direction == DIR_DOWN:
             next_y += speed
-        elif npc['direction'] == 'left':
+        elif npc.direction == DIR_LEFT:
             next_x -= speed
-        elif npc['direction'] == 'right':
+        elif npc.direction == DIR_RIGHT:
             next_x += speed
         
         # Check if next position is walkable
-        if is_on_walkable_surface(next_x, next_y):
-            npc['x'] = next_x
-            npc['y'] = next_y
+        if is_on_walkable_surface(next_x, next_y) and not is_solid(next_x, next_y):
+            npc.x = next_x
+            npc.y = next_y
         else:
             # Hit obstacle, change direction
-            npc['direction'] = random.choice(['up', 'down', 'left', 'right'])
-            npc['decision_timer'] = NPC_CONFIG['decision_interval'] - 10
+            npc.direction = rng.randrange(4)
+            schedule_timer(npc, TIMER_DECIDE, 10)
+
+def decide_npc_behavior(npc):
+    """TIMER_DECIDE - pick what an NPC does next"""
+    if not npc.alive:
+        return
+    behavior_choice = rng.random()
+    
+    if behavior_choice < 0.3:
+        # 30% - Start walking
+        set_npc_state(npc, NPC_STATE_WALKING)
+        npc.direction = rng.randrange(4)
+        if rng.random() < PATH_CONFIG['commute_chance']:
+            # Head for a sidewalk somewhere else in the city
+            goal_x, goal_y = random_sidewalk_position()
+            npc.path = find_walk_path(npc.x, npc.y, goal_x, goal_y)
+    elif behavior_choice < 0.5:
+        # 20% - Sit down
+        set_npc_state(npc, NPC_STATE_SITTING)
+        schedule_timer(npc, TIMER_SIT, NPC_CONFIG['sit_duration'])
+    else:
+        # 50% - Stay idle
+        set_npc_state(npc, NPC_STATE_IDLE)
+    
+    # Commuters decide again when they arrive
+    if npc.path is None:
+        schedule_timer(npc, TIMER_DECIDE, NPC_CONFIG['decision_interval'])
+
+def stand_up_npc(npc):
+    """TIMER_SIT - a sitting NPC gets up"""
+    if npc.alive and npc.state == NPC_STATE_SITTING:
+        set_npc_state(npc, NPC_STATE_IDLE)
+
+def stop_fleeing_npc(npc):
+    """TIMER_FLEE - a fleeing NPC calms down"""
+    if npc.alive and npc.state == NPC_STATE_RUNNING:
+        set_npc_state(npc, NPC_STATE_IDLE)
+        schedule_timer(npc, TIMER_DECIDE, NPC_CONFIG['decision_interval'])
+
+on_timer(TIMER_DECIDE, decide_npc_behavior)
+on_timer(TIMER_SIT, stand_up_npc)
+on_timer(TIMER_FLEE, stop_fleeing_npc)
+
+def finish_npc_animation(npc):
+    """TIMER_ANIMATION - an NPC's or enemy's one-shot animation has played out"""
+    post_event(EVENT_ANIMATION_DONE, npc.kind, npc, NPC_STATE_NAMES[npc.state])
+
+on_timer(TIMER_ANIMATION, finish_npc_animation)
 
 def update_npcs():
-    """Update all NPCs"""
-    for npc in npcs[:]:
-        update_npc(npc)
-        
-        # Remove dead NPCs after hurt animation
-        if not npc['alive'] and npc['state'] == NPC_STATE_HURT:
-            # Check if hurt animation finished
-            if npc['current_frame'] >= NPC_FRAME_COUNTS['hurt'] - 1:
-                npcs.remove(npc)
+    """Update all NPCs - beyond lod_distance each checks for cars every lod_stride ticks"""
+    lod_distance_sq = NPC_CONFIG['lod_distance'] ** 2
+    stride = NPC_CONFIG['lod_stride']
+    phase = timers['now'] % stride
+    player_x, player_y = player.x, player.y
+    # Walk backwards so swap-removal never skips an NPC
+    items = npcs.items
+    for i in range(len(items) - 1, -1, -1):
+        npc = items[i]
+        near = (npc.x - player_x) ** 2 + (npc.y - player_y) ** 2 <= lod_distance_sq
+        update_npc(npc, near or i % stride == phase)
+
+def rebalance_npcs():
+    """Move the living NPC count toward max_population a few NPCs at a time"""
+    if game_state['tick'] % GOVERNOR_CONFIG['rebalance_interval']:
+        return
+    living = [npc for npc in npcs if npc.alive]
+    excess = len(living) - NPC_CONFIG['max_population']
+    step = GOVERNOR_CONFIG['rebalance_step']
+    if excess < 0:
+        spawn_npcs(min(-excess, step))
+    elif excess > 0:
+        # Furthest from the player first - they are off screen
+        living.sort(key=lambda npc: (npc.x - player.x) ** 2 + (npc.y - player.y) ** 2)
+        for npc in living[-min(excess, step):]:
+            npcs.despawn(npc)
+            post_event(EVENT_DESPAWN, 'npc', npc.x, npc.y)
+
+def knock_down_npcs(batch):
+    """NPCs hit by cars die"""
+    for kind, npc, _ in batch:
+        if kind == 'npc_car' and npc.alive:
+            set_npc_state(npc, NPC_STATE_HURT)
+            npc.alive = False
+            schedule_timer(npc, TIMER_ANIMATION,
+                           animation_length(NPC_CONFIG['animation_speed'], NPC_FRAME_COUNTS['hurt']))
+            post_event(EVENT_DEATH, 'npc', npc)
+
+def replace_dead_npcs(batch):
+    """Spawn a replacement for every NPC that died"""
+    for kind, _ in batch:
+        if kind == 'npc':
+            spawn_npc()
+
+def remove_dead_npcs(batch):
+    """Dead NPCs are removed once their hurt animation has played"""
+    for kind, npc, _ in batch:
+        if kind == 'npc' and not npc.alive and npc.pool_index >= 0:
+            npcs.despawn(npc)
+            post_event(EVENT_DESPAWN, 'npc', npc.x, npc.y)
+
+subscribe(EVENT_COLLISION, knock_down_npcs)
+subscribe(EVENT_DEATH, replace_dead_npcs)
+subscribe(EVENT_ANIMATION_DONE, remove_dead_npcs)
 
 # NEW Player animation system for spritesheets
 player_animation = {
-    'current_frame': 0,
-    'frame_delay': 0,
+    'start': 0,            # game_state['tick'] the animation started on
+    'ends_at': None,       # Tick a one-shot animation ends on
     'animation_speed': 6,  # Lower = faster animation
     'direction': 'down',   # Start facing down
     'state': 'idle',       # idle, walk, or run
@@ -407,8 +1837,8 @@ def load_player_spritesheets():
     # Initialize NPC population - ADD THIS
     initialize_npcs()
 
-def get_player_frame(state, direction, frame_index):
-    """Extract a single frame from spritesheet"""
+def get_player_frame(state, direction, frame_index, scale=1.0):
+    """Extract a single frame from spritesheet, scaled and cached"""
     if state not in player_animation['spritesheets']:
         return None
     
@@ -428,8 +1858,9 @@ def get_player_frame(state, direction, frame_index):
     frame_y = row * frame_size
     
     # Extract the frame
-    frame = spritesheet.subsurface(pygame.Rect(frame_x, frame_y, frame_size, frame_size))
-    return frame
+    def build():
+        return scale_surface(spritesheet.subsurface(pygame.Rect(frame_x, frame_y, frame_size, frame_size)), scale)
+    return cached_surface((('player', state, frame_x, frame_y), 0, scale), build)
 
 def get_rotated_gun(direction):
     """Get gun rotated based on direction"""
@@ -501,61 +1932,74 @@ def spawn_bullet():
         'down': 90
     }
     
-    bullet = {
-        'x': float(start_x),
-        'y': float(start_y),
-        'vel_x': vel_x,
-        'vel_y': vel_y,
-        'angle': rotation_angles.get(direction, 0),
-        'lifetime': BULLET_CONFIG['lifetime']
-    }
-    
-    bullets.append(bullet)
-    print(f"BULLET SPAWNED! Position: ({start_x}, {start_y}), Direction: {direction}, Total: {len(bullets)}")
+    bullet = bullets.spawn(float(start_x), float(start_y), vel_x, vel_y,
+                           rotation_angles.get(direction, 0), BULLET_CONFIG['lifetime'])
+    post_event(EVENT_SPAWN, 'bullet', bullet)
+    post_event(EVENT_SHOT_FIRED, start_x, start_y, direction)
 
 def update_bullets():
     """Update all bullets"""
-    for bullet in bullets[:]:
+    items = bullets.items
+    for i in range(len(items) - 1, -1, -1):
+        bullet = items[i]
         # Move bullet
-        bullet['x'] += bullet['vel_x']
-        bullet['y'] += bullet['vel_y']
-        
-        # Decrease lifetime
-        bullet['lifetime'] -= 1
+        start_x = bullet.x
+        start_y = bullet.y
+        bullet.x += bullet.vel_x
+        bullet.y += bullet.vel_y
         
-        # Remove if lifetime expired or off map
-        if (bullet['lifetime'] <= 0 or 
-            bullet['x'] < 0 or bullet['x'] > MAP_WIDTH or
-            bullet['y'] < 0 or bullet['y'] > MAP_HEIGHT):
-            bullets.remove(bullet)
-
+        # Remove if off map or stopped by a wall on the way - TIMER_EXPIRE ends its range
+        if (bullet.x < 0 or bullet.x > WORLD_WIDTH or
+            bullet.y < 0 or bullet.y > WORLD_HEIGHT or
+            segment_solid(start_x, start_y, bullet.x, bullet.y)):
+            bullets.despawn(bullet)
+            post_event(EVENT_DESPAWN, 'bullet', bullet.x, bullet.y)
+
+def expire_bullet(bullet):
+    """TIMER_EXPIRE - the bullet has flown its range"""
+    bullets.despawn(bullet)
+    post_event(EVENT_DESPAWN, 'bullet', bullet.x, bullet.y)
+
+on_timer(TIMER_EXPIRE, expire_bullet)
+
+def play_player_animation(state):
+    """Start a player animation from its first frame"""
+    tick = game_state['tick']
+    player_animation['state'] = state
+    player_animation['start'] = tick
+    # Any other animation cuts a katana swing short
+    player_weapon['attacking'] = state == 'slash_katana'
+    if state in ONE_SHOT_ANIMATIONS:
+        player_animation['ends_at'] = tick + animation_length(player_animation['animation_speed'], FRAME_COUNTS[state])
+    else:
+        player_animation['ends_at'] = None
 
 def update_player_animation(state, direction):
-    """Update animation based on state (idle/walk/run) and direction"""
-    player_animation['state'] = state
+    """Switch to a looping animation (idle/walk/run) and direction"""
     player_animation['direction'] = direction
-    
-    if state != 'idle':  # Walking or running
-        player_animation['frame_delay'] += 1
-        
-        if player_animation['frame_delay'] >= player_animation['animation_speed']:
-            player_animation['frame_delay'] = 0
-            player_animation['current_frame'] += 1
-            
-            # Loop animation
-            max_frames = FRAME_COUNTS[state]
-            if player_animation['current_frame'] >= max_frames:
-                player_animation['current_frame'] = 0
-    else:  # Idle
-        # Animate idle slowly
-        player_animation['frame_delay'] += 1
-        
-        if player_animation['frame_delay'] >= player_animation['animation_speed'] * 3:  # Slower
-            player_animation['frame_delay'] = 0
-            player_animation['current_frame'] += 1
-            
-            if player_animation['current_frame'] >= FRAME_COUNTS['idle']:
-                player_animation['current_frame'] = 0
+    if player_animation['state'] != state:
+        play_player_animation(state)
+
+def player_frame():
+    """Frame of the player's animation on this tick"""
+    state = player_animation['state']
+    speed = player_animation['animation_speed']
+    if state == 'idle':
+        speed *= 3  # Animate idle slowly
+    return animation_frame(player_animation['start'], game_state['tick'], speed, FRAME_COUNTS[state],
+                           state not in ONE_SHOT_ANIMATIONS)
+
+def finish_player_animation(batch):
+    """End the katana swing, or hold the gun after the shoot animation"""
+    for kind, _, animation in batch:
+        if kind != 'player' or player_animation['state'] != animation:
+            continue
+        if animation == 'slash_katana':
+            player_weapon['attacking'] = False
+        elif animation == 'shoot':
+            player_weapon['shoot_animation_done'] = True
+
+subscribe(EVENT_ANIMATION_DONE, finish_player_animation)
 
 # Map grid
 map_grid = []
@@ -571,7 +2015,8 @@ for y in range(MAP_TILES_HEIGHT):
 map_objects = []
 
 # Traffic system
-traffic_vehicles = []  
+traffic_vehicles = EntityPool(TrafficCar)
+track_gauge('cars', traffic_vehicles.__len__)
 
 # Traffic configuration - REPLACE OLD ONE
 TRAFFIC_CONFIG = {
@@ -584,11 +2029,21 @@ TRAFFIC_CONFIG = {
     'brake_distance': 120,
     'brake_force': 0.15,
     'intersection_wait': 30,     # Frames to wait at intersection if blocked
+    'route_cache_size': 2048,    # Routes kept in the LRU route cache
+    'turn_rate': 9,              # Degrees the sprite turns per frame
+    'stuck_ticks': 500,          # Ticks stopped behind traffic before a car is despawned as gridlocked
 }
 
 # Spawn timer
 spawn_timer = 0
 
+# Vehicle sprites traffic spawns with
+CAR_TYPES = ('ambulanceup', 'truckup', 'carup1')
+
+# Car sprites are pre-rotated into this many headings
+CAR_HEADINGS = 32
+HEADING_STEP = 360 / CAR_HEADINGS
+
 # COMPLETE intersection map with proper lane positions
 INTERSECTIONS = [
     # Residential - Row 1 (y=30)
@@ -703,22 +2158,118 @@ INTERSECTIONS = [
     # Continue pattern for y=72, 92, 112, 130...
 ]
 
-#rotated images
-rotated_images = {}
+# ============================================
+# SURFACE CACHE
+# ============================================
+# Every sprite drawn goes through one LRU of transformed surfaces keyed by
+# (asset, rotation, scale). The cache has a byte budget, so zooming through
+# ZOOM_LEVELS builds each level once and old levels fall out again.
 
-def get_rotated_image(image_name, angle):
-    """Get a cached rotated image"""
-    cache_key = f"{image_name}_{angle}"
-    if cache_key not in rotated_images:
-        try:
-            img = pygame.image.load(f'images/{image_name}.png')
-            if angle != 0:
-                rotated_images[cache_key] = pygame.transform.rotate(img, angle)
-            else:
-                rotated_images[cache_key] = img
-        except:
-            rotated_images[cache_key] = None
-    return rotated_images[cache_key]
+SURFACE_CACHE_CONFIG = {
+    'budget_bytes': 64 * 1024 * 1024,   # Pixel memory the cache may hold
+    'retry_seconds': 5.0,               # Retry a failed image load after this long
+}
+
+surface_cache = OrderedDict()   # (asset, rotation, scale) -> Surface, most recently used last
+failed_assets = {}              # Image name -> time of the next load attempt
+surface_lock = threading.RLock()  # Chunk bake threads share the cache with the main thread
+
+surface_cache_stats = {
+    'hits': 0,
+    'misses': 0,
+    'evictions': 0,
+    'failures': 0,
+    'bytes': 0,
+}
+track_total('surface_cache_hits', surface_cache_stats, 'hits')
+track_total('surface_cache_misses', surface_cache_stats, 'misses')
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+def cached_surface(key, build):
+    """Surface for key from the LRU, calling build() on a miss - None if it fails"""
+    with surface_lock:
+        surface = surface_cache.get(key)
+        if surface is not None:
+            surface_cache.move_to_end(key)
+            surface_cache_stats['hits'] += 1
+            return surface
+        surface_cache_stats['misses'] += 1
+    
+    # Build without the lock so one slow load does not stall every other lookup
+    surface = build()
+    if surface is None:
+        return None
+    if pygame.display.get_surface() is not None:
+        surface = surface.convert_alpha()  # Match the display format for fast blits
+    
+    with surface_lock:
+        existing = surface_cache.get(key)
+        if existing is not None:
+            # Another thread built it meanwhile - keep the first one so callers share it
+            surface_cache.move_to_end(key)
+            return existing
+        surface_cache[key] = surface
+        surface_cache_stats['bytes'] += surface_bytes(surface)
+        while surface_cache_stats['bytes'] > SURFACE_CACHE_CONFIG['budget_bytes'] and len(surface_cache) > 1:
+            _, evicted = surface_cache.popitem(last=False)
+            surface_cache_stats['bytes'] -= surface_bytes(evicted)
+            surface_cache_stats['evictions'] += 1
+        return surface
+
+def scale_surface(surface, scale):
+    """Scale a surface, rounding up so neighbouring tiles never leave gaps"""
+    if scale == 1.0:
+        return surface
+    return pygame.transform.scale(surface, (math.ceil(surface.get_width() * scale),
+                                            math.ceil(surface.get_height() * scale)))
+
+def load_image(image_name):
+    """Load images/<image_name>.png, or None while a failed load is waiting to be retried"""
+    now = time.perf_counter()
+    if failed_assets.get(image_name, 0) > now:
+        return None
+    try:
+        image = pygame.image.load(f'images/{image_name}.png')
+    except (pygame.error, FileNotFoundError) as e:
+        with surface_lock:
+            failed_assets[image_name] = now + SURFACE_CACHE_CONFIG['retry_seconds']
+            surface_cache_stats['failures'] += 1
+        print(f"Could not load image {image_name}: {e}")
+        return None
+    with surface_lock:
+        failed_assets.pop(image_name, None)
+    return image
+
+def get_surface(image_name, rotation=0, scale=1.0):
+    """Image rotated by `rotation` degrees and scaled by `scale`, cached"""
+    if rotation == 0 and scale == 1.0:
+        return cached_surface((image_name, 0, 1.0), lambda: load_image(image_name))
+    
+    def build():
+        # Scaled sprites start from the cached rotation, so each rotation is done once
+        if scale == 1.0:
+            image = get_surface(image_name)
+            return pygame.transform.rotate(image, rotation) if image else None
+        image = get_surface(image_name, rotation)
+        return scale_surface(image, scale) if image else None
+    return cached_surface((image_name, rotation, scale), build)
+
+def update_zoom():
+    """Step the camera zoom one level toward the target"""
+    global camera_zoom, camera_zoom_level
+    if camera_zoom_level < camera_zoom_target:
+        camera_zoom_level += 1
+    elif camera_zoom_level > camera_zoom_target:
+        camera_zoom_level -= 1
+    camera_zoom = ZOOM_LEVELS[camera_zoom_level]
+    return camera_zoom
+
+def change_zoom(steps):
+    """Move the zoom target by `steps` levels"""
+    global camera_zoom_target
+    camera_zoom_target = max(0, min(len(ZOOM_LEVELS) - 1, camera_zoom_target + steps))
 
 def place_tile(tile_name, tile_x, tile_y, rotation=0):
     if 0 <= tile_x < MAP_TILES_WIDTH and 0 <= tile_y < MAP_TILES_HEIGHT:
@@ -1273,26 +2824,644 @@ place_object('box2', 191 * TILE_SIZE, 98 * TILE_SIZE)
 place_object('toilet', 149 * TILE_SIZE, 138 * TILE_SIZE)
 place_object('vendingmachine', 174 * TILE_SIZE, 138 * TILE_SIZE)
 
+# ============================================
+# COLLISION BITMAP
+# ============================================
+# Footprints of solid map objects are rasterised once into bit-packed grids
+# of COLLISION_CELL-pixel cells: one for the authored map, and one per
+# streamed chunk for its generated trees. A point query is a single bit
+# test, a box tests the few cells it covers and a segment walks the cells it
+# crosses, so the cost per query does not depend on how many buildings the
+# map has.
+
+COLLISION_CONFIG = {
+    'cell': 6,                 # Cell size in px - must divide TILE_SIZE
+}
+
+# Solid objects by name fragment (first match wins): footprint as a fraction
+# of the sprite's width and height, anchored at the bottom of the sprite
+SOLID_OBJECTS = (
+    ('building', (1.0, 1.0)),
+    ('house', (1.0, 1.0)),
+    ('shop', (1.0, 1.0)),
+    ('supermarket', (1.0, 1.0)),
+    ('toilet', (1.0, 1.0)),
+    ('vendingmachine', (1.0, 1.0)),
+    ('tree', (0.4, 0.3)),      # Trunk only - the crown overhangs
+    ('bench', (1.0, 0.6)),
+    ('box', (1.0, 0.6)),
+    ('bin', (1.0, 0.6)),
+    ('parklight', (0.6, 0.2)),
+    ('firehydrant', (0.6, 0.5)),
+    ('mailbox', (0.6, 0.5)),
+)
+
+COLLISION_CELL = COLLISION_CONFIG['cell']
+WORLD_CELLS_WIDTH = WORLD_WIDTH // COLLISION_CELL
+WORLD_CELLS_HEIGHT = WORLD_HEIGHT // COLLISION_CELL
+
+object_sizes = {}  # Object name -> sprite (width, height), read once
+
+class SolidGrid:
+    """Bit-packed solid cells - cell (col, row) is bit col & 7 of byte row * stride + (col >> 3)"""
+    __slots__ = ('columns', 'rows', 'stride', 'bits')
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+        self.stride = (columns + 7) >> 3
+        self.bits = bytearray(self.stride * rows)
+
+    def fill(self, left, top, right, bottom):
+        """Mark every cell overlapping the pixel rectangle, relative to the grid's corner"""
+        first_col = max(0, int(left // COLLISION_CELL))
+        last_col = min(self.columns, int(-(-right // COLLISION_CELL)))
+        first_row = max(0, int(top // COLLISION_CELL))
+        last_row = min(self.rows, int(-(-bottom // COLLISION_CELL)))
+        bits = self.bits
+        for row in range(first_row, last_row):
+            base = row * self.stride
+            for col in range(first_col, last_col):
+                bits[base + (col >> 3)] |= 1 << (col & 7)
+
+def object_size(name):
+    """Sprite size of a map object - the drawn fallback shape's size if the image is missing"""
+    size = object_sizes.get(name)
+    if size is None:
+        image = load_image(name)
+        if image is not None:
+            size = image.get_size()
+        elif 'building' in name or 'house' in name or 'shop' in name:
+            size = (50, 80)
+        elif 'tree' in name:
+            size = (16, 16)
+        else:
+            size = (10, 10)
+        object_sizes[name] = size
+    return size
+
+def object_footprint(obj):
+    """(left, top, right, bottom) blocked by a map object in world pixels - None if it is not solid"""
+    name = obj['name']
+    for fragment, (width_fraction, height_fraction) in SOLID_OBJECTS:
+        if fragment in name:
+            width, height = object_size(name)
+            bottom = obj['y'] + height / 2
+            half_width = width * width_fraction / 2
+            return (obj['x'] - half_width, bottom - height * height_fraction, obj['x'] + half_width, bottom)
+    return None
+
+def rasterize_objects(grid, objects, origin_x, origin_y):
+    """Add the footprints of the solid objects to a grid whose corner is at (origin_x, origin_y)"""
+    for obj in objects:
+        footprint = object_footprint(obj)
+        if footprint is not None:
+            left, top, right, bottom = footprint
+            grid.fill(left - origin_x, top - origin_y, right - origin_x, bottom - origin_y)
+
+authored_solid = SolidGrid(MAP_WIDTH // COLLISION_CELL, MAP_HEIGHT // COLLISION_CELL)
+rasterize_objects(authored_solid, map_objects, 0, 0)
+
+def solid_cell(col, row):
+    """1 if a collision cell is blocked - cells outside the world count as blocked"""
+    grid = authored_solid
+    if col >= grid.columns or row >= grid.rows:
+        if col < 0 or row < 0 or col >= WORLD_CELLS_WIDTH or row >= WORLD_CELLS_HEIGHT:
+            return 1
+        cells = CHUNK_PIXELS // COLLISION_CELL
+        grid = get_chunk(col // cells, row // cells).solid
+        col %= cells
+        row %= cells
+    elif col < 0 or row < 0:
+        return 1
+    return grid.bits[row * grid.stride + (col >> 3)] >> (col & 7) & 1
+
+def is_solid(x, y):
+    """Point query"""
+    return solid_cell(int(x // COLLISION_CELL), int(y // COLLISION_CELL)) == 1
+
+def box_solid(left, top, right, bottom):
+    """True if any cell overlapping the rectangle is blocked"""
+    first_col = int(left // COLLISION_CELL)
+    last_col = int(-(-right // COLLISION_CELL))
+    for row in range(int(top // COLLISION_CELL), int(-(-bottom // COLLISION_CELL))):
+        for col in range(first_col, last_col):
+            if solid_cell(col, row):
+                return True
+    return False
+
+def swept_box_solid(x, y, half_width, half_height, dx, dy):
+    """True if a box centred on (x, y) hits a blocked cell moving by (dx, dy).
+
+    Tests the bounds of the whole move, which is exact for moves along one
+    axis and slightly conservative for diagonal ones.
+    """
+    return box_solid(min(x, x + dx) - half_width, min(y, y + dy) - half_height,
+                     max(x, x + dx) + half_width, max(y, y + dy) + half_height)
+
+def segment_start_cell(p, d):
+    """Cell a segment from p heading d enters - the one behind p if p is on a border and d < 0"""
+    if d < 0:
+        return -int(-p // COLLISION_CELL) - 1
+    return int(p // COLLISION_CELL)
+
+def segment_solid(x0, y0, x1, y1):
+    """True if the segment crosses a blocked cell - walks the cells in order (Amanatides & Woo)"""
+    dx = x1 - x0
+    dy = y1 - y0
+    col = segment_start_cell(x0, dx)
+    row = segment_start_cell(y0, dy)
+    step_col = 1 if dx > 0 else -1
+    step_row = 1 if dy > 0 else -1
+    # Borders to cross on each axis - the walk ends in the end point's cell
+    cols_left = abs(int(x1 // COLLISION_CELL) - col)
+    rows_left = abs(int(y1 // COLLISION_CELL) - row)
+    # Segment fraction at the next column / row border, and per cell crossed
+    if dx:
+        next_x = ((col + (dx > 0)) * COLLISION_CELL - x0) / dx
+        delta_x = COLLISION_CELL / abs(dx)
+    else:
+        next_x = delta_x = math.inf
+    if dy:
+        next_y = ((row + (dy > 0)) * COLLISION_CELL - y0) / dy
+        delta_y = COLLISION_CELL / abs(dy)
+    else:
+        next_y = delta_y = math.inf
+    
+    if solid_cell(col, row):
+        return True
+    while cols_left or rows_left:
+        if cols_left and (not rows_left or next_x < next_y):
+            col += step_col
+            next_x += delta_x
+            cols_left -= 1
+        elif rows_left and (not cols_left or next_y < next_x):
+            row += step_row
+            next_y += delta_y
+            rows_left -= 1
+        else:
+            # Exactly through a corner - the cells beside it are only touched
+            col += step_col
+            row += step_row
+            next_x += delta_x
+            next_y += delta_y
+            cols_left -= 1
+            rows_left -= 1
+        if solid_cell(col, row):
+            return True
+    return False
+
+def tile_solid(tile_x, tile_y):
+    """True if any part of the tile is blocked"""
+    left = tile_x * TILE_SIZE
+    top = tile_y * TILE_SIZE
+    return box_solid(left, top, left + TILE_SIZE, top + TILE_SIZE)
+
+def player_step_blocked(dx, dy):
+    """True if a player step runs into a solid cell - never while already overlapping one, so the player can walk out"""
+    size = PLAYER_HIT_SIZE
+    if box_solid(player.x - size, player.y - size, player.x + size, player.y + size):
+        return False
+    return swept_box_solid(player.x, player.y, size, size, dx, dy)
+
+build_sidewalk_index()
+build_walkable_grid()
+pedestrian_paths.build()  # Once, up front - built on the first commute it stalled that tick
+
 load_player_spritesheets()
 
 # Sort objects
 map_objects.sort(key=lambda obj: obj['y'])
 
 # ============================================
-# TRAFFIC SYSTEM
+# WORLD STREAMING
 # ============================================
+# The world is cut into square chunks. Chunks over the authored map are
+# sliced from map_grid/map_objects, the rest are generated from the world
+# seed. Chunks around the camera live in an LRU, chunks ahead of the player
+# are generated on a worker thread, and chunks far away are evicted, so
+# memory stays bounded however far the player travels.
+
+WORLD_CONFIG = {
+    'chunk_size': 32,          # Tiles per chunk side
+    'cache_chunks': 192,       # Chunks kept in memory (LRU)
+    'prefetch_chunks': 3,      # How many chunks ahead of the player to prefetch
+    'seed': 1337,              # Terrain seed - the same world every run
+    'road_spacing': 4,         # Generated roads every N chunks
+    'trees_per_chunk': 12,
+}
 
-# Car state flags
-CAR_STATE_DRIVING = 0
-CAR_STATE_WAITING = 1
-CAR_STATE_TURNING = 2
-CAR_STATE_BRAKING = 3
+CHUNK_SIZE = WORLD_CONFIG['chunk_size']
+CHUNK_PIXELS = CHUNK_SIZE * TILE_SIZE
+WORLD_CHUNKS_WIDTH = (WORLD_TILES_WIDTH + CHUNK_SIZE - 1) // CHUNK_SIZE
+WORLD_CHUNKS_HEIGHT = (WORLD_TILES_HEIGHT + CHUNK_SIZE - 1) // CHUNK_SIZE
+
+# Generated roads use the same cross-section as place_horizontal/vertical_road_normal
+ROAD_OFFSET = CHUNK_SIZE // 2 - 4
+HORIZONTAL_ROAD_ROWS = ('sidewalkmiddle', 'sidewalkmiddle', 'road', 'road', 'roadhorizontal|rot90',
+                        'road', 'road', 'sidewalkmiddle', 'sidewalkmiddle')
+VERTICAL_ROAD_COLUMNS = ('sidewalkmiddle|rot90', 'sidewalkmiddle|rot90', 'road|rot90', 'road|rot90',
+                         'roadhorizontal', 'road|rot90', 'road|rot90', 'sidewalkmiddle|rot90',
+                         'sidewalkmiddle|rot90')
+GENERATED_TREES = ('tree1', 'tree2')
+
+class Chunk:
+    """Tiles (row-major), y-sorted objects and solid cells for one chunk"""
+    __slots__ = ('cx', 'cy', 'tiles', 'objects', 'solid')
+
+    def __init__(self, cx, cy, tiles, objects, solid):
+        self.cx = cx
+        self.cy = cy
+        self.tiles = tiles
+        self.objects = objects
+        self.solid = solid
+
+chunk_cache = OrderedDict()    # (cx, cy) -> Chunk, most recently used last
+chunk_requests = deque()       # Chunks waiting for the worker
+chunk_requested = set()        # Chunks queued or being generated
+chunk_ready = deque()          # Finished chunks, moved into the cache by the main thread
+chunk_signal = threading.Condition()
+authored_objects = {}          # (cx, cy) -> authored objects, built once
+
+streaming = {
+    'worker': None,
+    'last_x': None,            # Player position at the previous stream update
+    'last_y': None,
+}
 
-def spawn_traffic_car():
-    """Spawn with STRICT lane separation"""
-    global spawn_timer
+chunk_stats = {
+    'hits': 0,
+    'sync_loads': 0,           # Chunks the main thread had to build itself
+    'prefetched': 0,           # Chunks delivered by the worker
+    'evicted': 0,
+}
+track_total('chunk_sync_loads', chunk_stats, 'sync_loads')
+
+def index_authored_objects():
+    """Bucket the authored map objects by chunk (keeps them y-sorted)"""
+    authored_objects.clear()
+    for obj in map_objects:
+        key = (int(obj['x'] // CHUNK_PIXELS), int(obj['y'] // CHUNK_PIXELS))
+        authored_objects.setdefault(key, []).append(obj)
+    # Resolve every sprite size a chunk can need here on the main thread, so the
+    # worker only reads object_sizes and never loads images itself
+    for name in {obj['name'] for obj in map_objects}.union(GENERATED_TREES):
+        object_size(name)
+
+def generate_chunk(cx, cy):
+    """Build a chunk - safe to call from the worker thread once index_authored_objects() has run"""
+    base_x = cx * CHUNK_SIZE
+    base_y = cy * CHUNK_SIZE
+    spacing = WORLD_CONFIG['road_spacing']
+    road_row = cy % spacing == 0
+    road_column = cx % spacing == 0
     
-    if len(traffic_vehicles) >= TRAFFIC_CONFIG['max_cars']:
+    tiles = []
+    for local_y in range(CHUNK_SIZE):
+        tile_y = base_y + local_y
+        row_tile = None
+        if road_row and 0 <= local_y - ROAD_OFFSET < len(HORIZONTAL_ROAD_ROWS):
+            row_tile = HORIZONTAL_ROAD_ROWS[local_y - ROAD_OFFSET]
+        authored_row = map_grid[tile_y] if tile_y < MAP_TILES_HEIGHT else None
+        for local_x in range(CHUNK_SIZE):
+            tile_x = base_x + local_x
+            if authored_row is not None and tile_x < MAP_TILES_WIDTH:
+                tiles.append(authored_row[tile_x])
+                continue
+            column = local_x - ROAD_OFFSET
+            if road_column and 0 <= column < len(VERTICAL_ROAD_COLUMNS):
+                # Crossings are plain road
+                tiles.append('road' if row_tile else VERTICAL_ROAD_COLUMNS[column])
+            else:
+                tiles.append(row_tile or 'grassfieldmiddle')
+    
+    objects = list(authored_objects.get((cx, cy), ()))
+    if base_x >= MAP_TILES_WIDTH or base_y >= MAP_TILES_HEIGHT:
+        # Scatter trees off the roads, the same way every run
+        terrain = random.Random((WORLD_CONFIG['seed'] * WORLD_CHUNKS_HEIGHT + cy) * WORLD_CHUNKS_WIDTH + cx)
+        for _ in range(WORLD_CONFIG['trees_per_chunk']):
+            local_x = terrain.randrange(CHUNK_SIZE)
+            local_y = terrain.randrange(CHUNK_SIZE)
+            if tiles[local_y * CHUNK_SIZE + local_x] == 'grassfieldmiddle':
+                objects.append({'name': terrain.choice(GENERATED_TREES),
+                                'x': (base_x + local_x + 0.5) * TILE_SIZE,
+                                'y': (base_y + local_y + 0.5) * TILE_SIZE})
+        objects.sort(key=lambda obj: obj['y'])
+    
+    # Only read outside the authored map - generated trees never cross a chunk border
+    solid = SolidGrid(CHUNK_PIXELS // COLLISION_CELL, CHUNK_PIXELS // COLLISION_CELL)
+    rasterize_objects(solid, objects, base_x * TILE_SIZE, base_y * TILE_SIZE)
+    return Chunk(cx, cy, tiles, objects, solid)
+
+def chunk_worker():
+    """Generate requested chunks in the background"""
+    while True:
+        with chunk_signal:
+            while not chunk_requests:
+                chunk_signal.wait()
+            cx, cy = chunk_requests.popleft()
+        chunk_ready.append(generate_chunk(cx, cy))
+
+def store_chunk(chunk):
+    """Add a chunk to the LRU, evicting the least recently used"""
+    chunk_cache[(chunk.cx, chunk.cy)] = chunk
+    while len(chunk_cache) > WORLD_CONFIG['cache_chunks']:
+        chunk_cache.popitem(last=False)
+        chunk_stats['evicted'] += 1
+
+def collect_ready_chunks():
+    """Move chunks the worker finished into the cache"""
+    while chunk_ready:
+        chunk = chunk_ready.popleft()
+        key = (chunk.cx, chunk.cy)
+        chunk_requested.discard(key)
+        if key not in chunk_cache:
+            store_chunk(chunk)
+            chunk_stats['prefetched'] += 1
+
+def get_chunk(cx, cy):
+    """Chunk at chunk coordinates - built on the spot if it was not prefetched"""
+    key = (cx, cy)
+    chunk = chunk_cache.get(key)
+    if chunk is not None:
+        chunk_cache.move_to_end(key)
+        chunk_stats['hits'] += 1
+        return chunk
+    
+    collect_ready_chunks()
+    chunk = chunk_cache.get(key)
+    if chunk is None:
+        chunk = generate_chunk(cx, cy)
+        store_chunk(chunk)
+        chunk_stats['sync_loads'] += 1
+    return chunk
+
+def request_chunk(cx, cy):
+    """Queue a chunk for the worker unless it is cached or already queued"""
+    key = (cx, cy)
+    if key in chunk_cache or key in chunk_requested:
+        return
+    if not (0 <= cx < WORLD_CHUNKS_WIDTH and 0 <= cy < WORLD_CHUNKS_HEIGHT):
+        return
+    if streaming['worker'] is None:
+        streaming['worker'] = threading.Thread(target=chunk_worker, daemon=True)
+        streaming['worker'].start()
+    chunk_requested.add(key)
+    with chunk_signal:
+        chunk_requests.append(key)
+        chunk_signal.notify()
+
+def chunk_range(left, top, width, height, margin=0):
+    """Chunk coordinate ranges covering a world-space rectangle"""
+    return (range(max(0, int(left // CHUNK_PIXELS) - margin),
+                  min(WORLD_CHUNKS_WIDTH, int((left + width) // CHUNK_PIXELS) + 1 + margin)),
+            range(max(0, int(top // CHUNK_PIXELS) - margin),
+                  min(WORLD_CHUNKS_HEIGHT, int((top + height) // CHUNK_PIXELS) + 1 + margin)))
+
+def update_streaming(view_x, view_y, view_width, view_height):
+    """Prefetch the chunks the view will reach if the player keeps moving - returns that movement"""
+    collect_ready_chunks()
+    
+    last_x = streaming['last_x']
+    move_x = 0 if last_x is None else player.x - last_x
+    move_y = 0 if last_x is None else player.y - streaming['last_y']
+    streaming['last_x'] = player.x
+    streaming['last_y'] = player.y
+    
+    step_x = CHUNK_PIXELS * ((move_x > 0) - (move_x < 0))
+    step_y = CHUNK_PIXELS * ((move_y > 0) - (move_y < 0))
+    for ahead in range(WORLD_CONFIG['prefetch_chunks'] + 1):
+        columns, rows = chunk_range(view_x + step_x * ahead, view_y + step_y * ahead,
+                                    view_width, view_height, margin=1)
+        for cy in rows:
+            for cx in columns:
+                request_chunk(cx, cy)
+        if not (step_x or step_y):
+            break
+    return move_x, move_y
+
+def get_tile(tile_x, tile_y):
+    """Tile name anywhere in the world"""
+    if tile_x < MAP_TILES_WIDTH and tile_y < MAP_TILES_HEIGHT:
+        return map_grid[tile_y][tile_x]
+    chunk = get_chunk(tile_x // CHUNK_SIZE, tile_y // CHUNK_SIZE)
+    return chunk.tiles[(tile_y % CHUNK_SIZE) * CHUNK_SIZE + tile_x % CHUNK_SIZE]
+
+def visible_objects(view_x, view_y, view_width, view_height):
+    """Objects of the chunks around the view, in y order"""
+    columns, rows = chunk_range(view_x, view_y, view_width, view_height, margin=1)
+    lists = [get_chunk(cx, cy).objects for cy in rows for cx in columns]
+    return heapq.merge(*lists, key=lambda obj: obj['y'])
+
+index_authored_objects()
+
+# ============================================
+# CHUNK BAKING
+# ============================================
+# For native rendering, a chunk's ground tiles and every static object
+# overlapping it are drawn once into a chunk-sized surface on a thread pool
+# (pygame releases the GIL while blitting). The frame then blits a few chunk
+# surfaces instead of a thousand tiles. The view is baked along with the
+# path to where it will be after lookahead_ticks at the player's current
+# velocity. Workers append finished surfaces to a deque that the main thread
+# drains, so the frame never waits on a lock held by a bake.
+
+BAKE_CONFIG = {
+    'enabled': True,
+    'workers': 2,              # Bake pool threads
+    'baked_chunks': 24,        # Baked surfaces kept (LRU) - CHUNK_PIXELS^2 * 4 bytes each
+    'lookahead_ticks': 90,     # How far ahead of the player's velocity to bake
+}
+
+# Tile colours used when an image is missing, first match wins
+TILE_FALLBACK_COLORS = (('road', (60, 60, 60)), ('sidewalk', (100, 100, 110)), ('grass', (60, 140, 60)))
+# Largest object drawn without an image (the building rectangle)
+OBJECT_FALLBACK_SIZE = (80, 80)
+
+baked_chunks = OrderedDict()   # (cx, cy) -> Surface, most recently used last
+bake_pending = set()           # Chunks submitted to the pool and not collected yet
+bake_ready = deque()           # (key, Surface) appended by the pool, drained by the main thread
+
+baking = {
+    'pool': None,
+}
+
+bake_stats = {
+    'baked': 0,
+    'evicted': 0,
+    'fallback_frames': 0,      # Frames drawn tile by tile because a visible chunk was not ready
+}
+track_total('bake_fallback_frames', bake_stats, 'fallback_frames')
+
+def split_tile(tile_data):
+    """'name' or 'name|rotN' -> (name, rotation)"""
+    if '|rot' in tile_data:
+        tile_name, rotation = tile_data.split('|rot')
+        return tile_name, int(rotation)
+    return tile_data, 0
+
+def fill_missing_tile(target, tile_name, screen_x, screen_y, scale):
+    """Flat colour in place of a tile image that failed to load"""
+    for pattern, color in TILE_FALLBACK_COLORS:
+        if pattern in tile_name:
+            target.fill(color, Rect(int(screen_x), int(screen_y), int(TILE_SIZE * scale) + 1, int(TILE_SIZE * scale) + 1))
+            return
+
+def draw_object(target, obj, screen_x, screen_y, scale):
+    """Draw a map object centred on (screen_x, screen_y)"""
+    img = get_surface(obj['name'], 0, scale)
+    if img:
+        # Floor, not blit's truncation, so sprites half off the top/left edge land where the bake put them
+        target.blit(img, (math.floor(screen_x - img.get_width()//2), math.floor(screen_y - img.get_height()//2)))
+    elif 'building' in obj['name'] or 'house' in obj['name'] or 'shop' in obj['name']:
+        target.fill((120, 100, 100), Rect(screen_x-25*scale, screen_y-40*scale, 50*scale, 80*scale))
+    elif 'tree' in obj['name']:
+        pygame.draw.circle(target, (50, 150, 50), (int(screen_x), int(screen_y)), int(8*scale))
+    else:
+        target.fill((150, 150, 150), Rect(screen_x-5*scale, screen_y-5*scale, 10*scale, 10*scale))
+
+def bake_chunk(key, tiles, object_lists):
+    """Draw one chunk's ground and the objects overlapping it - runs on the bake pool"""
+    cx, cy = key
+    display = pygame.display.get_surface()
+    if display is not None:
+        surface = pygame.Surface((CHUNK_PIXELS, CHUNK_PIXELS), 0, display)
+    else:
+        surface = pygame.Surface((CHUNK_PIXELS, CHUNK_PIXELS))
+    
+    # A chunk uses a handful of distinct tiles - look each up once so the
+    # worker spends its time in blits (GIL released) rather than in Python
+    images = {tile_data: get_surface(*split_tile(tile_data)) for tile_data in set(tiles)}
+    blits = []
+    for index, tile_data in enumerate(tiles):
+        x = (index % CHUNK_SIZE) * TILE_SIZE
+        y = (index // CHUNK_SIZE) * TILE_SIZE
+        img = images[tile_data]
+        if img:
+            blits.append((img, (x, y)))
+        else:
+            fill_missing_tile(surface, split_tile(tile_data)[0], x, y, 1.0)
+    surface.blits(blits, doreturn=False)
+    
+    # Objects of the 3x3 neighbourhood in the same y order the live draw uses,
+    # skipping the ones whose sprite cannot reach this chunk
+    left = cx * CHUNK_PIXELS
+    top = cy * CHUNK_PIXELS
+    for obj in heapq.merge(*object_lists, key=lambda obj: obj['y']):
+        x = obj['x'] - left
+        y = obj['y'] - top
+        img = get_surface(obj['name'])
+        reach_x, reach_y = img.get_size() if img else OBJECT_FALLBACK_SIZE
+        if -reach_x < x < CHUNK_PIXELS + reach_x and -reach_y < y < CHUNK_PIXELS + reach_y:
+            draw_object(surface, obj, x, y, 1.0)
+    bake_ready.append((key, surface))
+
+def request_bake(cx, cy):
+    """Submit a chunk to the pool once it and its neighbours are streamed in"""
+    key = (cx, cy)
+    if key in baked_chunks:
+        baked_chunks.move_to_end(key)
+        return
+    if key in bake_pending:
+        return
+    
+    object_lists = []
+    for ny in range(max(0, cy - 1), min(WORLD_CHUNKS_HEIGHT, cy + 2)):
+        for nx in range(max(0, cx - 1), min(WORLD_CHUNKS_WIDTH, cx + 2)):
+            chunk = chunk_cache.get((nx, ny))
+            if chunk is None:
+                request_chunk(nx, ny)  # Submitted on a later frame, once the streaming worker has it
+                return
+            object_lists.append(chunk.objects)
+    
+    if baking['pool'] is None:
+        baking['pool'] = ThreadPoolExecutor(max_workers=BAKE_CONFIG['workers'], thread_name_prefix='bake')
+    bake_pending.add(key)
+    baking['pool'].submit(bake_chunk, key, chunk_cache[key].tiles, object_lists)
+
+def collect_baked_chunks():
+    """Move finished bakes into the LRU"""
+    while bake_ready:
+        key, surface = bake_ready.popleft()
+        bake_pending.discard(key)
+        baked_chunks[key] = surface
+        bake_stats['baked'] += 1
+        while len(baked_chunks) > BAKE_CONFIG['baked_chunks']:
+            baked_chunks.popitem(last=False)
+            bake_stats['evicted'] += 1
+
+def update_baking(view_x, view_y, view_width, view_height, move_x, move_y):
+    """Bake the view and the views along the predicted path of the player"""
+    collect_baked_chunks()
+    if not BAKE_CONFIG['enabled']:
+        return
+    
+    ahead_x = move_x * BAKE_CONFIG['lookahead_ticks']
+    ahead_y = move_y * BAKE_CONFIG['lookahead_ticks']
+    steps = math.ceil(max(abs(ahead_x), abs(ahead_y)) / CHUNK_PIXELS)
+    for step in range(steps + 1):
+        fraction = step / steps if steps else 0
+        columns, rows = chunk_range(view_x + ahead_x * fraction, view_y + ahead_y * fraction,
+                                    view_width, view_height)
+        for cy in rows:
+            for cx in columns:
+                request_bake(cx, cy)
+
+def draw_baked_chunks(target):
+    """Blit the baked chunks under the camera - False, drawing nothing, if one is not ready"""
+    target_width, target_height = target.get_size()
+    columns, rows = chunk_range(camera_x, camera_y, target_width, target_height)
+    blits = []
+    for cy in rows:
+        for cx in columns:
+            surface = baked_chunks.get((cx, cy))
+            if surface is None:
+                bake_stats['fallback_frames'] += 1
+                return False
+            blits.append((surface, (int(cx * CHUNK_PIXELS - camera_x), int(cy * CHUNK_PIXELS - camera_y))))
+    target.blits(blits, doreturn=False)
+    return True
+
+# ============================================
+# TRAFFIC SYSTEM
+# ============================================
+
+# Car state flags
+CAR_STATE_DRIVING = 0
+CAR_STATE_WAITING = 1
+CAR_STATE_TURNING = 2
+CAR_STATE_BRAKING = 3
+
+# FIXED spawn points with PROPER lane separation
+TRAFFIC_SPAWN_POINTS = [
+    # Horizontal roads - RIGHT direction (upper lanes)
+    {'x': 8 * TILE_SIZE, 'y': 30 * TILE_SIZE, 'direction': DIR_RIGHT},
+    {'x': 8 * TILE_SIZE, 'y': 60 * TILE_SIZE, 'direction': DIR_RIGHT},
+    {'x': 8 * TILE_SIZE, 'y': 84 * TILE_SIZE, 'direction': DIR_RIGHT},
+    
+    # Horizontal roads - LEFT direction (lower lanes, +3 tiles offset)
+    {'x': 100 * TILE_SIZE, 'y': (30 + 3) * TILE_SIZE, 'direction': DIR_LEFT},
+    {'x': 100 * TILE_SIZE, 'y': (60 + 3) * TILE_SIZE, 'direction': DIR_LEFT},
+    {'x': 100 * TILE_SIZE, 'y': (84 + 3) * TILE_SIZE, 'direction': DIR_LEFT},
+    
+    # Vertical roads - DOWN direction (left lanes)
+    {'x': 29 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': DIR_DOWN},
+    {'x': 54 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': DIR_DOWN},
+    {'x': 79 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': DIR_DOWN},
+    {'x': 106 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': DIR_DOWN},
+    
+    # Vertical roads - UP direction (right lanes, +3 tiles offset)
+    {'x': (29 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': DIR_UP},
+    {'x': (54 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': DIR_UP},
+    {'x': (79 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': DIR_UP},
+    {'x': (106 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': DIR_UP},
+]
+
+def spawn_traffic_car():
+    """Spawn with STRICT lane separation"""
+    global spawn_timer
+    
+    if len(traffic_vehicles) >= TRAFFIC_CONFIG['max_cars']:
         return
     
     spawn_timer += 1
@@ -1300,65 +3469,55 @@ def spawn_traffic_car():
         return
     spawn_timer = 0
     
-    # FIXED spawn points with PROPER lane separation
-    spawn_points = [
-        # Horizontal roads - RIGHT direction (upper lanes)
-        {'x': 8 * TILE_SIZE, 'y': 30 * TILE_SIZE, 'direction': 'right'},
-        {'x': 8 * TILE_SIZE, 'y': 60 * TILE_SIZE, 'direction': 'right'},
-        {'x': 8 * TILE_SIZE, 'y': 84 * TILE_SIZE, 'direction': 'right'},
-        
-        # Horizontal roads - LEFT direction (lower lanes, +3 tiles offset)
-        {'x': 100 * TILE_SIZE, 'y': (30 + 3) * TILE_SIZE, 'direction': 'left'},
-        {'x': 100 * TILE_SIZE, 'y': (60 + 3) * TILE_SIZE, 'direction': 'left'},
-        {'x': 100 * TILE_SIZE, 'y': (84 + 3) * TILE_SIZE, 'direction': 'left'},
-        
-        # Vertical roads - DOWN direction (left lanes)
-        {'x': 29 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': 'down'},
-        {'x': 54 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': 'down'},
-        {'x': 79 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': 'down'},
-        {'x': 106 * TILE_SIZE, 'y': 8 * TILE_SIZE, 'direction': 'down'},
-        
-        # Vertical roads - UP direction (right lanes, +3 tiles offset)
-        {'x': (29 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': 'up'},
-        {'x': (54 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': 'up'},
-        {'x': (79 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': 'up'},
-        {'x': (106 + 3) * TILE_SIZE, 'y': 95 * TILE_SIZE, 'direction': 'up'},
-    ]
-    
     for _ in range(5):
-        spawn = random.choice(spawn_points)
+        spawn = rng.choice(TRAFFIC_SPAWN_POINTS)
         
         if not is_position_blocked(spawn['x'], spawn['y'], 100):
-            car_type = random.choice(['ambulanceup', 'truckup', 'carup1'])
+            car_type = rng.choice(CAR_TYPES)
             
-            traffic_vehicles.append({
-                'name': car_type,
-                'x': float(spawn['x']),
-                'y': float(spawn['y']),
-                'direction': spawn['direction'],
-                'speed': TRAFFIC_CONFIG['car_speed'],
-                'target_speed': TRAFFIC_CONFIG['car_max_speed'],
-                'angle': get_angle_for_direction(spawn['direction']),
-                'state': CAR_STATE_DRIVING,
-                'wait_timer': 0,
-                'target_lane': None,
-                'last_intersection': None,
-                'frames_since_turn': 999,
-                'lane_y': spawn['y'] if spawn['direction'] in ['right', 'left'] else None,
-                'lane_x': spawn['x'] if spawn['direction'] in ['up', 'down'] else None,
-            })
+            car = traffic_vehicles.spawn(car_type, float(spawn['x']), float(spawn['y']), spawn['direction'])
+            post_event(EVENT_SPAWN, 'car', car)
             return
 
 def is_position_blocked(x, y, min_dist):
     for car in traffic_vehicles:
-        dx = abs(car['x'] - x)
-        dy = abs(car['y'] - y)
+        dx = abs(car.x - x)
+        dy = abs(car.y - y)
         if (dx * dx + dy * dy) ** 0.5 < min_dist:
             return True
     return False
 
+# Sprite angle per direction id (up, left, down, right)
+CAR_ANGLES = (180, 270, 0, 90)
+
+# Up and left lanes run three tiles right of / below the down and right lanes
+LANE_OFFSET = 3 * TILE_SIZE
+
 def get_angle_for_direction(direction):
-    return {'up': 180, 'down': 0, 'left': 270, 'right': 90}.get(direction, 0)
+    return CAR_ANGLES[direction]
+
+def steer_car(car):
+    """Turn the sprite angle toward the car's direction at turn_rate degrees per frame"""
+    target = CAR_ANGLES[car.direction]
+    diff = (target - car.angle + 180) % 360 - 180
+    rate = TRAFFIC_CONFIG['turn_rate']
+    if abs(diff) <= rate:
+        car.angle = target
+    else:
+        car.angle = (car.angle + (rate if diff > 0 else -rate)) % 360
+
+def prerotate_car_sprites():
+    """Rotate every vehicle sprite into CAR_HEADINGS headings up front"""
+    for name in CAR_TYPES:
+        for heading in range(CAR_HEADINGS):
+            get_surface(name, heading * HEADING_STEP)
+
+def get_car_sprite(name, angle, scale):
+    """Pre-rotated sprite for the heading nearest to angle"""
+    heading = round(angle / HEADING_STEP) % CAR_HEADINGS
+    return get_surface(name, heading * HEADING_STEP, scale)
+
+prerotate_car_sprites()
 
 def is_on_road(x, y):
     """Check if on road - INCLUDING CROSSWALKS"""
@@ -1373,89 +3532,468 @@ def is_on_road(x, y):
             return True
     return False
 
-def is_at_intersection(x, y):
+def intersection_corner(intersection, direction):
+    """Point where a car heading this way first crosses the intersection's lanes"""
+    # Down and right lanes meet at the listed corner, up and left lanes LANE_OFFSET past it
+    if direction in (DIR_UP, DIR_LEFT):
+        return intersection['x'] + LANE_OFFSET, intersection['y'] + LANE_OFFSET
+    return intersection['x'], intersection['y']
+
+def is_at_intersection(x, y, direction):
     """Check if at intersection"""
     threshold = 12
     
-    for intersection in INTERSECTIONS:
-        dx = abs(x - intersection['x'])
-        dy = abs(y - intersection['y'])
+    # Only intersections whose trigger box touches this tile can match
+    candidates = lane_graph['tile_index'].get((int(x // TILE_SIZE), int(y // TILE_SIZE)))
+    if not candidates:
+        return None
+    
+    for intersection in candidates:
+        corner_x, corner_y = intersection_corner(intersection, direction)
+        dx = abs(x - corner_x)
+        dy = abs(y - corner_y)
         
         if dx < threshold and dy < threshold:
             return intersection
     return None
 
 def get_opposite_direction(direction):
-    return {'up': 'down', 'down': 'up', 'left': 'right', 'right': 'left'}.get(direction, direction)
+    return (direction + 2) % 4
 
 def choose_new_direction(car, intersection):
     """Choose direction - 90% go straight"""
-    current_dir = car['direction']
+    current_dir = car.direction
     opposite_dir = get_opposite_direction(current_dir)
     
-    available_dirs = [d for d in intersection['directions'].keys() if d != opposite_dir]
+    available_dirs = [DIRECTION_IDS[d] for d in intersection['directions'] if DIRECTION_IDS[d] != opposite_dir]
     
     if not available_dirs:
         return current_dir, None
     
     # 90% go straight to reduce turns
-    if current_dir in available_dirs and random.random() < 0.90:
+    if current_dir in available_dirs and rng.random() < 0.90:
         new_dir = current_dir
     else:
-        new_dir = random.choice(available_dirs)
+        new_dir = rng.choice(available_dirs)
     
-    # Get target lane
-    target_positions = intersection['directions'][new_dir]
+    return new_dir, get_turn_target(car, intersection, new_dir)
+
+def get_turn_target(car, intersection, new_dir):
+    """Target lane point for leaving an intersection, and update lane tracking"""
+    target_positions = intersection['directions'][DIRECTION_NAMES[new_dir]]
     target_lane = target_positions[0] if target_positions else None
     
+    # Exits are listed on the down/right lane lines - up and left traffic drives on the far lane
+    if target_lane and new_dir == DIR_UP:
+        target_lane = (target_lane[0] + LANE_OFFSET, target_lane[1])
+    elif target_lane and new_dir == DIR_LEFT:
+        target_lane = (target_lane[0], target_lane[1] + LANE_OFFSET)
+    
     # Update lane tracking
-    if new_dir in ['right', 'left']:
-        car['lane_y'] = target_lane[1] if target_lane else car['y']
-        car['lane_x'] = None
+    if new_dir in (DIR_RIGHT, DIR_LEFT):
+        car.lane_y = target_lane[1] if target_lane else car.y
+        car.lane_x = None
+    else:
+        car.lane_x = target_lane[0] if target_lane else car.x
+        car.lane_y = None
+    
+    return target_lane
+
+# ============================================
+# LANE GRAPH AND ROUTING
+# ============================================
+# Directed graph of intersections connected by drivable lanes. A lane node
+# is (intersection index, heading on arrival) so routes never need a U-turn.
+# Routes are shared between cars through an LRU cache.
+
+lane_graph = {
+    'edges': [],         # Intersection index -> [(direction, next index, cost), ...]
+    'tile_index': {},    # (tile_x, tile_y) -> intersections with a trigger box covering the tile
+    'destinations': [],  # Intersections that can be reached from somewhere
+}
+
+route_cache = OrderedDict()  # ((origin, heading), destination) -> route tuple or None
+route_stats = {'hits': 0, 'misses': 0}
+track_total('route_hits', route_stats, 'hits')
+track_total('route_misses', route_stats, 'misses')
+
+def build_lane_graph():
+    """Follow the lane out of every intersection exit to the next intersection"""
+    by_corner = {}
+    tile_index = {}
+    for index, intersection in enumerate(INTERSECTIONS):
+        intersection['id'] = index
+        # One trigger box per lane crossing, each +-12px around a tile corner - at most 4 tiles
+        for far_lane in (False, True):
+            corner_x, corner_y = intersection_corner(intersection, DIR_UP if far_lane else DIR_DOWN)
+            corner_tx = int(corner_x // TILE_SIZE)
+            corner_ty = int(corner_y // TILE_SIZE)
+            by_corner[(corner_tx, corner_ty, far_lane)] = index
+            for tx in (corner_tx - 1, corner_tx):
+                for ty in (corner_ty - 1, corner_ty):
+                    tile_index.setdefault((tx, ty), []).append(intersection)
+
+    edges = []
+    reachable = set()
+    for index, intersection in enumerate(INTERSECTIONS):
+        exits = []
+        for name in intersection['directions']:
+            direction = DIRECTION_IDS[name]
+            far_lane = direction in (DIR_UP, DIR_LEFT)
+            step_x, step_y = DIRECTION_STEPS[direction]
+            # Walk the lane line itself - the far lanes are not on the road everywhere
+            x, y = intersection_corner(intersection, direction)
+            distance = 0
+            while True:
+                x += step_x * TILE_SIZE
+                y += step_y * TILE_SIZE
+                distance += TILE_SIZE
+                if not is_on_road(x, y):
+                    break  # Dead end - no edge
+                next_index = by_corner.get((int(x // TILE_SIZE), int(y // TILE_SIZE), far_lane))
+                if next_index is not None:
+                    exits.append((direction, next_index, distance))
+                    reachable.add(next_index)
+                    break
+        edges.append(exits)
+
+    lane_graph['edges'] = edges
+    lane_graph['tile_index'] = tile_index
+    lane_graph['destinations'] = sorted(reachable)
+    route_cache.clear()
+
+def search_route(origin, heading, destination):
+    """A* over lane nodes - returns ((intersection, direction to take), ...) or None"""
+    goal = INTERSECTIONS[destination]
+
+    def estimate(index):
+        node = INTERSECTIONS[index]
+        return abs(node['x'] - goal['x']) + abs(node['y'] - goal['y'])
+
+    start = (origin, heading)
+    open_heap = [(estimate(origin), 0, start)]
+    came_from = {start: None}
+    best_cost = {start: 0}
+    edges = lane_graph['edges']
+
+    while open_heap:
+        _, cost, node = heapq.heappop(open_heap)
+        index, node_heading = node
+        if cost > best_cost[node]:
+            continue  # Stale heap entry
+        if index == destination and node is not start:
+            route = []
+            while came_from[node] is not None:
+                previous, direction = came_from[node]
+                route.append((previous[0], direction))
+                node = previous
+            route.reverse()
+            return tuple(route)
+
+        no_u_turn = get_opposite_direction(node_heading)
+        for direction, next_index, length in edges[index]:
+            if direction == no_u_turn:
+                continue
+            next_node = (next_index, direction)
+            next_cost = cost + length
+            if next_cost < best_cost.get(next_node, float('inf')):
+                best_cost[next_node] = next_cost
+                came_from[next_node] = (node, direction)
+                heapq.heappush(open_heap, (next_cost + estimate(next_index), next_cost, next_node))
+    return None
+
+def find_route(origin, heading, destination):
+    """Cached route from a lane node to an intersection"""
+    key = ((origin, heading), destination)
+    if key in route_cache:
+        route_cache.move_to_end(key)
+        route_stats['hits'] += 1
+        return route_cache[key]
+
+    route_stats['misses'] += 1
+    route = search_route(origin, heading, destination)
+    route_cache[key] = route
+    if len(route_cache) > TRAFFIC_CONFIG['route_cache_size']:
+        route_cache.popitem(last=False)
+    return route
+
+def plan_car_route(car, origin):
+    """Pick a new reachable destination for a car arriving at an intersection"""
+    destinations = lane_graph['destinations']
+    for _ in range(5):
+        destination = rng.choice(destinations)
+        if destination == origin:
+            continue
+        route = find_route(origin, car.direction, destination)
+        if route:
+            car.destination = destination
+            car.route = route
+            car.route_step = 0
+            return True
+    car.destination = None
+    car.route = None
+    return False
+
+def choose_route_direction(car, intersection):
+    """Follow the car's route, replanning when it is finished or off-route"""
+    index = intersection['id']
+    route = car.route
+    on_route = route is not None and car.route_step < len(route) and route[car.route_step][0] == index
+    
+    if not on_route:
+        car.route = None
+        if car.destination is not None and car.destination != index:
+            # Drifted off the route - rejoin it from here
+            car.route = find_route(index, car.direction, car.destination)
+            car.route_step = 0
+        if not car.route:
+            plan_car_route(car, index)
+    
+    if not car.route:
+        # Nowhere reachable - avoid exits that lead to dead ends
+        exits = [d for d, _, _ in lane_graph['edges'][index] if d != get_opposite_direction(car.direction)]
+        if not exits:
+            return choose_new_direction(car, intersection)
+        new_dir = car.direction if car.direction in exits else rng.choice(exits)
+        return new_dir, get_turn_target(car, intersection, new_dir)
+    
+    new_dir = car.route[car.route_step][1]
+    car.route_step += 1
+    return new_dir, get_turn_target(car, intersection, new_dir)
+
+build_lane_graph()
+
+# ============================================
+# INTERSECTION CONTROL
+# ============================================
+# Every intersection has a controller that owns its conflict zone - the box
+# where its four lanes cross. Cars request the zone as they approach and
+# stop at its edge until granted, instead of checking each other pairwise.
+# Requests queue first-come and are granted while the signal shows green for
+# the car's axis. A phase gaps out once its granted cars have left and cross
+# traffic is waiting, or ends after max_green; the all-red clearance lasts
+# until every granted car has left the zone.
+
+INTERSECTION_CONFIG = {
+    'zone_margin': 44,        # Zone padding around the lane lines (> half a car length + half its width)
+    'request_distance': 120,  # Distance before the zone edge where cars request it
+    'min_green': 60,          # Ticks a phase stays green before it can gap out
+    'max_green': 360,         # Ticks before a phase ends while cross traffic keeps waiting
+    'clearance': 15,          # Minimum all-red ticks between phases
+}
+
+# Signal phases - a car's axis is its direction id & 1
+AXIS_VERTICAL = 0
+AXIS_HORIZONTAL = 1
+SIGNAL_CLEARANCE = 2
+
+# Cars are binned into a grid each tick for car following
+TRAFFIC_CELL = 128
+TRAFFIC_CELL_SLACK = 10  # Cars move a few pixels after binning - widen queries by this much
+
+intersection_controllers = []
+controller_index = {}  # (tile_x, tile_y) -> controllers whose request area covers the tile
+traffic_grid = {}      # (x // TRAFFIC_CELL, y // TRAFFIC_CELL) -> cars at the start of the tick
+traffic_stats = {'requests': 0, 'passes': 0, 'switches': 0, 'stuck': 0}
+
+class IntersectionController:
+    """Signal phase and first-come reservation queue for one conflict zone"""
+    __slots__ = ('intersection', 'left', 'top', 'right', 'bottom', 'phase', 'next_phase',
+                 'timer', 'queue', 'holders')
+
+    def __init__(self, intersection):
+        margin = INTERSECTION_CONFIG['zone_margin']
+        self.intersection = intersection
+        self.left = intersection['x'] - margin
+        self.top = intersection['y'] - margin
+        self.right = intersection['x'] + LANE_OFFSET + margin
+        self.bottom = intersection['y'] + LANE_OFFSET + margin
+        self.phase = AXIS_HORIZONTAL
+        self.next_phase = AXIS_VERTICAL
+        self.timer = 0
+        self.queue = []     # Cars waiting for the zone, oldest request first
+        self.holders = []   # Granted cars that have not left the zone yet
+
+    def gap(self, car):
+        """Distance along the car's heading to the zone edge - 0 inside, -1 if not approaching"""
+        x, y = car.x, car.y
+        inside_x = self.left <= x <= self.right
+        inside_y = self.top <= y <= self.bottom
+        if inside_x and inside_y:
+            return 0
+        direction = car.direction
+        if direction == DIR_RIGHT:
+            return self.left - x if inside_y and x < self.left else -1
+        if direction == DIR_LEFT:
+            return x - self.right if inside_y and x > self.right else -1
+        if direction == DIR_DOWN:
+            return self.top - y if inside_x and y < self.top else -1
+        return y - self.bottom if inside_x and y > self.bottom else -1
+
+    def request(self, car, inside=False):
+        """Queue a car - granted at once on green, or if it is already in the zone"""
+        car.reservation = self
+        traffic_stats['requests'] += 1
+        if inside or self.phase == car.direction & 1:
+            self.grant(car)
+        else:
+            car.granted = False
+            self.queue.append(car)
+
+    def grant(self, car):
+        car.granted = True
+        self.holders.append(car)
+
+    def release(self, car):
+        """The car has left the zone (or given up its request)"""
+        if car.granted:
+            self.holders.remove(car)
+            traffic_stats['passes'] += 1
+        else:
+            self.queue.remove(car)
+        car.reservation = None
+        car.granted = False
+
+    def update(self):
+        """Advance the signal and grant queued requests - once per tick"""
+        # Despawned cars drop out here instead of at every despawn site
+        if self.queue:
+            self.queue = [car for car in self.queue if car.reservation is self and car.pool_index >= 0]
+        if self.holders:
+            self.holders = [car for car in self.holders if car.reservation is self and car.pool_index >= 0]
+        
+        self.timer += 1
+        config = INTERSECTION_CONFIG
+        if self.phase == SIGNAL_CLEARANCE:
+            if self.timer < config['clearance'] or self.holders:
+                return  # Granted cars may be turning onto either axis - wait for all of them
+            self.phase = self.next_phase
+            self.timer = 0
+            traffic_stats['switches'] += 1
+        elif self.queue:
+            # While green, only cross traffic is left waiting
+            if self.timer >= config['max_green'] or (self.timer >= config['min_green'] and not self.holders):
+                self.next_phase = self.queue[0].direction & 1
+                self.phase = SIGNAL_CLEARANCE
+                self.timer = 0
+            return
+        
+        if self.queue:
+            waiting = []
+            for car in self.queue:
+                if car.direction & 1 == self.phase:
+                    self.grant(car)
+                else:
+                    waiting.append(car)
+            self.queue = waiting
+
+def build_intersection_controllers():
+    """One controller per intersection, indexed by the tiles its request area covers"""
+    intersection_controllers.clear()
+    controller_index.clear()
+    reach = INTERSECTION_CONFIG['request_distance']
+    for intersection in INTERSECTIONS:
+        controller = IntersectionController(intersection)
+        intersection_controllers.append(controller)
+        for tile_x in range(int((controller.left - reach) // TILE_SIZE), int((controller.right + reach) // TILE_SIZE) + 1):
+            for tile_y in range(int((controller.top - reach) // TILE_SIZE), int((controller.bottom + reach) // TILE_SIZE) + 1):
+                controller_index.setdefault((tile_x, tile_y), []).append(controller)
+
+def update_intersections():
+    """Advance every signal and rebuild the traffic grid for this tick"""
+    for controller in intersection_controllers:
+        controller.update()
+    
+    traffic_grid.clear()
+    for car in traffic_vehicles.items:
+        traffic_grid.setdefault((int(car.x // TRAFFIC_CELL), int(car.y // TRAFFIC_CELL)), []).append(car)
+
+def cars_ahead(car, distance):
+    """Cars binned in the grid cells covering the lane up to distance ahead"""
+    step_x, step_y = DIRECTION_STEPS[car.direction]
+    x0 = x1 = car.x
+    y0 = y1 = car.y
+    if step_x > 0:
+        x1 += distance
+    elif step_x < 0:
+        x0 -= distance
+    elif step_y > 0:
+        y1 += distance
     else:
-        car['lane_x'] = target_lane[0] if target_lane else car['x']
-        car['lane_y'] = None
+        y0 -= distance
+    reach = 15 + TRAFFIC_CELL_SLACK  # Lane tolerance
+    nearby = []
+    for cell_x in range(int((x0 - reach) // TRAFFIC_CELL), int((x1 + reach) // TRAFFIC_CELL) + 1):
+        for cell_y in range(int((y0 - reach) // TRAFFIC_CELL), int((y1 + reach) // TRAFFIC_CELL) + 1):
+            cell = traffic_grid.get((cell_x, cell_y))
+            if cell:
+                nearby.extend(cell)
+    return nearby
+
+def intersection_stop_gap(car):
+    """Ask the zone ahead for permission - distance to its edge if the car must stop, else None"""
+    controller = car.reservation
+    if controller is None:
+        candidates = controller_index.get((int(car.x // TILE_SIZE), int(car.y // TILE_SIZE)))
+        if not candidates:
+            return None
+        for candidate in candidates:
+            gap = candidate.gap(car)
+            if 0 <= gap <= INTERSECTION_CONFIG['request_distance']:
+                candidate.request(car, inside=gap == 0)
+                controller = candidate
+                break
+        else:
+            return None
     
-    return new_dir, target_lane
+    gap = controller.gap(car)
+    if gap < 0:
+        controller.release(car)
+        return None
+    if car.granted:
+        return None
+    return gap
+
+build_intersection_controllers()
 
-def check_obstacle_ahead(car, check_distance):
+def check_obstacle_ahead(car, check_distance, player_x, player_y):
     """Check for cars AND PLAYER ahead"""
     min_distance = check_distance
     found_obstacle = False
     
     # Check other cars - STRICT lane checking
-    for other_car in traffic_vehicles:
-        if other_car == car:
+    for other_car in cars_ahead(car, check_distance + TRAFFIC_CELL_SLACK):
+        if other_car is car or other_car.pool_index < 0:
             continue
         
         same_lane = False
         is_ahead = False
         dist = 0
         
-        if car['direction'] == 'right':
+        if car.direction == DIR_RIGHT:
             # STRICT: same lane means very close Y position
-            same_lane = abs(car['y'] - other_car['y']) < 15
-            if same_lane and other_car['x'] > car['x']:
+            same_lane = abs(car.y - other_car.y) < 15
+            if same_lane and other_car.x > car.x:
                 is_ahead = True
-                dist = other_car['x'] - car['x']
+                dist = other_car.x - car.x
                 
-        elif car['direction'] == 'left':
-            same_lane = abs(car['y'] - other_car['y']) < 15
-            if same_lane and other_car['x'] < car['x']:
+        elif car.direction == DIR_LEFT:
+            same_lane = abs(car.y - other_car.y) < 15
+            if same_lane and other_car.x < car.x:
                 is_ahead = True
-                dist = car['x'] - other_car['x']
+                dist = car.x - other_car.x
                 
-        elif car['direction'] == 'down':
-            same_lane = abs(car['x'] - other_car['x']) < 15
-            if same_lane and other_car['y'] > car['y']:
+        elif car.direction == DIR_DOWN:
+            same_lane = abs(car.x - other_car.x) < 15
+            if same_lane and other_car.y > car.y:
                 is_ahead = True
-                dist = other_car['y'] - car['y']
+                dist = other_car.y - car.y
                 
-        elif car['direction'] == 'up':
-            same_lane = abs(car['x'] - other_car['x']) < 15
-            if same_lane and other_car['y'] < car['y']:
+        elif car.direction == DIR_UP:
+            same_lane = abs(car.x - other_car.x) < 15
+            if same_lane and other_car.y < car.y:
                 is_ahead = True
-                dist = car['y'] - other_car['y']
+                dist = car.y - other_car.y
         
         if is_ahead and 0 < dist < min_distance:
             min_distance = dist
@@ -1465,21 +4003,21 @@ def check_obstacle_ahead(car, check_distance):
     player_ahead = False
     player_dist = 0
     
-    if car['direction'] == 'right':
-        if abs(car['y'] - player.y) < 25 and player.x > car['x']:
-            player_dist = player.x - car['x']
+    if car.direction == DIR_RIGHT:
+        if abs(car.y - player_y) < 25 and player_x > car.x:
+            player_dist = player_x - car.x
             player_ahead = True
-    elif car['direction'] == 'left':
-        if abs(car['y'] - player.y) < 25 and player.x < car['x']:
-            player_dist = car['x'] - player.x
+    elif car.direction == DIR_LEFT:
+        if abs(car.y - player_y) < 25 and player_x < car.x:
+            player_dist = car.x - player_x
             player_ahead = True
-    elif car['direction'] == 'down':
-        if abs(car['x'] - player.x) < 25 and player.y > car['y']:
-            player_dist = player.y - car['y']
+    elif car.direction == DIR_DOWN:
+        if abs(car.x - player_x) < 25 and player_y > car.y:
+            player_dist = player_y - car.y
             player_ahead = True
-    elif car['direction'] == 'up':
-        if abs(car['x'] - player.x) < 25 and player.y < car['y']:
-            player_dist = car['y'] - player.y
+    elif car.direction == DIR_UP:
+        if abs(car.x - player_x) < 25 and player_y < car.y:
+            player_dist = car.y - player_y
             player_ahead = True
     
     if player_ahead and player_dist < min_distance:
@@ -1491,198 +4029,755 @@ def check_obstacle_ahead(car, check_distance):
 def update_traffic():
     """Traffic update with STRICT lane keeping"""
     spawn_traffic_car()
+    update_intersections()
+    player_x, player_y = player.x, player.y  # Actor attribute reads are slow - read once per tick
+    now = timers['now']
     
-    for car in traffic_vehicles[:]:
-        if 'frames_since_turn' not in car:
-            car['frames_since_turn'] = 999
-        car['frames_since_turn'] += 1
+    items = traffic_vehicles.items
+    for i in range(len(items) - 1, -1, -1):
+        car = items[i]
+        turn_settled = now - car.turned_at > 30
+        if car.angle != CAR_ANGLES[car.direction]:
+            steer_car(car)
         
         # STRICT lane keeping - cars MUST stay in their lane
-        if car['state'] == CAR_STATE_DRIVING and car['frames_since_turn'] > 30:
-            if car['direction'] in ['right', 'left'] and car['lane_y'] is not None:
+        if car.state == CAR_STATE_DRIVING and turn_settled:
+            if car.direction in (DIR_RIGHT, DIR_LEFT) and car.lane_y is not None:
                 # Keep Y position fixed to lane
-                if abs(car['y'] - car['lane_y']) > 3:
-                    car['y'] += (car['lane_y'] - car['y']) * 0.15
-            elif car['direction'] in ['up', 'down'] and car['lane_x'] is not None:
+                if abs(car.y - car.lane_y) > 3:
+                    car.y += (car.lane_y - car.y) * 0.15
+            elif car.direction in (DIR_UP, DIR_DOWN) and car.lane_x is not None:
                 # Keep X position fixed to lane
-                if abs(car['x'] - car['lane_x']) > 3:
-                    car['x'] += (car['lane_x'] - car['x']) * 0.15
+                if abs(car.x - car.lane_x) > 3:
+                    car.x += (car.lane_x - car.x) * 0.15
         
         # Check obstacles
-        has_obstacle, obstacle_dist = check_obstacle_ahead(car, TRAFFIC_CONFIG['brake_distance'])
+        has_obstacle, obstacle_dist = check_obstacle_ahead(car, TRAFFIC_CONFIG['brake_distance'], player_x, player_y)
+        
+        # A zone that has not been granted is an obstacle at its edge - stop before entering it
+        at_signal = False
+        stop_gap = intersection_stop_gap(car)
+        if stop_gap is not None:
+            signal_dist = stop_gap + TRAFFIC_CONFIG['stop_distance'] - TRAFFIC_CONFIG['car_max_speed']
+            if signal_dist < obstacle_dist:
+                has_obstacle, obstacle_dist, at_signal = True, signal_dist, True
         
         # Braking system
-        if has_obstacle:
+        if car.state == CAR_STATE_TURNING and car.target_lane:
+            pass  # Finish the turn inside the granted zone before following traffic again
+        elif has_obstacle:
             if obstacle_dist < TRAFFIC_CONFIG['stop_distance']:
-                car['state'] = CAR_STATE_WAITING
-                car['speed'] = max(0, car['speed'] - TRAFFIC_CONFIG['brake_force'] * 3)
-                car['wait_timer'] += 1
-                
-                if car['wait_timer'] > 500:
-                    traffic_vehicles.remove(car)
+                car.state = CAR_STATE_WAITING
+                car.speed = max(0, car.speed - TRAFFIC_CONFIG['brake_force'] * 3)
+                if at_signal:
+                    continue  # Waiting for green is not gridlock
+                if car.stuck_at is None:
+                    schedule_timer(car, TIMER_STUCK, TRAFFIC_CONFIG['stuck_ticks'])
                 continue
             elif obstacle_dist < TRAFFIC_CONFIG['brake_distance']:
-                car['state'] = CAR_STATE_BRAKING
-                car['speed'] = max(1.0, car['speed'] - TRAFFIC_CONFIG['brake_force'])
+                car.state = CAR_STATE_BRAKING
+                car.speed = max(1.0, car.speed - TRAFFIC_CONFIG['brake_force'])
             else:
-                car['state'] = CAR_STATE_DRIVING
-                car['speed'] = min(car['target_speed'], car['speed'] + 0.06)
+                car.state = CAR_STATE_DRIVING
+                car.speed = min(car.target_speed, car.speed + 0.06)
         else:
-            car['state'] = CAR_STATE_DRIVING
-            car['speed'] = min(car['target_speed'], car['speed'] + 0.06)
-            car['wait_timer'] = 0
+            car.state = CAR_STATE_DRIVING
+            car.speed = min(car.target_speed, car.speed + 0.06)
+            car.stuck_at = None
         
         # Intersection handling
         intersection = None
-        if car['frames_since_turn'] > 30:
-            intersection = is_at_intersection(car['x'], car['y'])
+        if turn_settled:
+            intersection = is_at_intersection(car.x, car.y, car.direction)
         
-        if intersection and car['state'] in [CAR_STATE_DRIVING, CAR_STATE_BRAKING]:
-            if car.get('last_intersection') != intersection:
-                new_direction, target_lane = choose_new_direction(car, intersection)
+        if intersection and car.state in [CAR_STATE_DRIVING, CAR_STATE_BRAKING]:
+            if car.last_intersection is not intersection:
+                corner_x, corner_y = intersection_corner(intersection, car.direction)
+                new_direction, target_lane = choose_route_direction(car, intersection)
                 
-                if new_direction != car['direction']:
-                    car['direction'] = new_direction
-                    car['angle'] = get_angle_for_direction(new_direction)
-                    car['target_lane'] = target_lane
-                    car['state'] = CAR_STATE_TURNING
-                    car['frames_since_turn'] = 0
+                if new_direction != car.direction:
+                    car.direction = new_direction
+                    car.target_lane = target_lane
+                    car.state = CAR_STATE_TURNING
+                    car.turned_at = now
                     
-                    car['x'] = float(intersection['x'])
-                    car['y'] = float(intersection['y'])
+                    car.x = float(corner_x)
+                    car.y = float(corner_y)
                 
-                car['last_intersection'] = intersection
+                car.last_intersection = intersection
         
         # Turn completion
-        if car['state'] == CAR_STATE_TURNING and car['target_lane']:
-            target_x, target_y = car['target_lane']
+        if car.state == CAR_STATE_TURNING and car.target_lane:
+            target_x, target_y = car.target_lane
             
-            dx = target_x - car['x']
-            dy = target_y - car['y']
+            dx = target_x - car.x
+            dy = target_y - car.y
             dist = (dx * dx + dy * dy) ** 0.5
             
             if dist < 10:
-                car['state'] = CAR_STATE_DRIVING
-                car['target_lane'] = None
+                car.state = CAR_STATE_DRIVING
+                car.target_lane = None
             else:
-                car['x'] += dx * 0.15
-                car['y'] += dy * 0.15
+                car.x += dx * 0.15
+                car.y += dy * 0.15
         
         # Movement
-        if car['state'] in [CAR_STATE_DRIVING, CAR_STATE_BRAKING]:
-            next_x, next_y = car['x'], car['y']
+        if car.state in [CAR_STATE_DRIVING, CAR_STATE_BRAKING]:
+            next_x, next_y = car.x, car.y
             
-            if car['direction'] == 'right':
-                next_x += car['speed']
-            elif car['direction'] == 'left':
-                next_x -= car['speed']
-            elif car['direction'] == 'down':
-                next_y += car['speed']
-            elif car['direction'] == 'up':
-                next_y -= car['speed']
+            if car.direction == DIR_RIGHT:
+                next_x += car.speed
+            elif car.direction == DIR_LEFT:
+                next_x -= car.speed
+            elif car.direction == DIR_DOWN:
+                next_y += car.speed
+            elif car.direction == DIR_UP:
+                next_y -= car.speed
             
             if is_on_road(next_x, next_y):
-                car['x'], car['y'] = next_x, next_y
+                car.x, car.y = next_x, next_y
                 
                 if intersection is None:
-                    car['last_intersection'] = None
+                    car.last_intersection = None
             else:
-                traffic_vehicles.remove(car)
+                traffic_vehicles.despawn(car)
+                post_event(EVENT_DESPAWN, 'car', car.x, car.y)
                 continue
         
         # Despawn
-        dist = ((car['x'] - player.x)**2 + (car['y'] - player.y)**2)**0.5
+        dist = ((car.x - player_x)**2 + (car.y - player_y)**2)**0.5
         if dist > TRAFFIC_CONFIG['despawn_distance']:
-            traffic_vehicles.remove(car)
+            traffic_vehicles.despawn(car)
+            post_event(EVENT_DESPAWN, 'car', car.x, car.y)
+    
+    update_car_boxes()
 
+def despawn_stuck_car(car):
+    """TIMER_STUCK - a car held up by traffic for too long is removed"""
+    traffic_stats['stuck'] += 1
+    traffic_vehicles.despawn(car)
+    post_event(EVENT_DESPAWN, 'car', car.x, car.y)
+
+on_timer(TIMER_STUCK, despawn_stuck_car)
+
+
+# ============================================
+# SPATIAL QUERIES
+# ============================================
+# Batched k-nearest and radius queries over point sets. A SpatialIndex sorts
+# its points by uniform-grid cell once per build. A batch of query points
+# then looks up the cells within reach of every query in one searchsorted,
+# measures all the candidate pairs with numpy and keeps the k closest per
+# query. Systems collect a tick's queries and run them together, so the
+# Python-level cost is per batch and nobody scans every point.
+
+SPATIAL_KEY_STRIDE = 1 << 20   # Cell key = row * stride + column
+
+spatial_stats = {'batches': 0, 'queries': 0, 'pairs': 0}
+track_total('spatial_queries', spatial_stats, 'queries')
+
+class SpatialIndex:
+    """Points bucketed by grid cell for batched nearest-neighbour queries"""
+
+    def __init__(self, cell):
+        self.cell = cell
+        self.build((), ())
+
+    def build(self, xs, ys):
+        """Index the points (xs[i], ys[i]) - queries return their i"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        keys = self.cell_keys(xs, ys)
+        order = np.argsort(keys, kind='stable')
+        self.ids = order
+        self.keys = keys[order]
+        self.xs = xs[order]
+        self.ys = ys[order]
+
+    def cell_keys(self, xs, ys):
+        return ((ys // self.cell).astype(np.int64) * SPATIAL_KEY_STRIDE
+                + (xs // self.cell).astype(np.int64))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def within(self, query_x, query_y, radius):
+        """(query, point, distance squared) for every point within radius of a query.
+
+        Pairs come out grouped by query; point is a position in the sorted
+        arrays - self.ids maps it back to the index given to build().
+        """
+        query_x = np.asarray(query_x, dtype=np.float64)
+        query_y = np.asarray(query_y, dtype=np.float64)
+        spatial_stats['batches'] += 1
+        spatial_stats['queries'] += len(query_x)
+        if not len(self.ids) or not len(query_x):
+            return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0)
+        
+        # Every (query, neighbouring cell) key, looked up in one pass
+        reach = int(math.ceil(radius / self.cell))
+        steps = np.arange(-reach, reach + 1)
+        offsets = (steps[:, None] * SPATIAL_KEY_STRIDE + steps[None, :]).ravel()
+        keys = (self.cell_keys(query_x, query_y)[:, None] + offsets).ravel()
+        first = np.searchsorted(self.keys, keys, 'left')
+        counts = np.searchsorted(self.keys, keys, 'right') - first
+        total = int(counts.sum())
+        spatial_stats['pairs'] += total
+        
+        # Expand each cell's run of points into (query, point) pairs
+        query = np.repeat(np.arange(len(query_x)), counts.reshape(len(query_x), -1).sum(axis=1))
+        point = np.arange(total) + np.repeat(first - np.cumsum(counts) + counts, counts)
+        dx = self.xs[point] - query_x[query]
+        dy = self.ys[point] - query_y[query]
+        distance = dx * dx + dy * dy
+        inside = distance <= radius * radius
+        return query[inside], point[inside], distance[inside]
+
+    def nearest(self, query_x, query_y, k, radius):
+        """Up to k closest points within radius of every query point.
+
+        Returns (query, point, distance squared) arrays sorted by query, then
+        by distance - point is the index given to build().
+        """
+        query, point, distance = self.within(query_x, query_y, radius)
+        if not len(query):
+            return query, point, distance
+        # Queries are already grouped - sort by distance inside each group
+        order = np.argsort(query * (radius * radius + 1.0) + distance, kind='stable')
+        query, point, distance = query[order], point[order], distance[order]
+        group = np.flatnonzero(np.diff(query, prepend=-1))
+        rank = np.arange(len(query)) - np.repeat(group, np.diff(group, append=len(query)))
+        keep = rank < k
+        return query[keep], self.ids[point[keep]], distance[keep]
+
+    def nearest_one(self, query_x, query_y, radius):
+        """(point, distance) per query - -1 and inf where nothing is in range"""
+        count = len(query_x)
+        query, point, distance = self.nearest(query_x, query_y, 1, radius)
+        points = np.full(count, -1, np.int64)
+        distances = np.full(count, np.inf)
+        points[query] = point
+        distances[query] = np.sqrt(distance)
+        return points, distances
+
+    def count_within(self, query_x, query_y, radius):
+        """Number of points within radius of every query"""
+        query, _, _ = self.within(query_x, query_y, radius)
+        return np.bincount(query, minlength=len(query_x))
+
+# ============================================
+# ENEMY AI
+# ============================================
+# Hostile NPCs run a behavior tree every ENEMY_CONFIG['think_interval'] ticks
+# and walk toward whatever their tree chose on every tick in between. Thinking
+# is spread over ticks by TIMER_THINK. Perception nodes (Sense) read a
+# blackboard that perceive() fills for all of a tick's thinkers at once - the
+# nearest player, nearest cover and allies around are one batched
+# SpatialIndex query each, where a naive search would have every enemy scan
+# every other enemy and every cover point.
+
+ENEMY_CONFIG = {
+    'population': 12,          # Enemies kept alive in their zone
+    'zone': 'industrial',      # Zone enemies spawn in
+    'think_interval': 12,      # Ticks between behavior tree runs per enemy
+    'sight_radius': 320,       # Enemies notice the player inside this distance
+    'cover_radius': 240,       # How far an enemy looks for cover
+    'ally_radius': 160,        # Allies inside this distance count for courage
+    'brave_allies': 2,         # Allies a scout needs around before it attacks
+    'wander_distance': 96,     # Furthest a wandering enemy strolls per decision
+    'hit_radius': 14,          # Bullets closer than this hit an enemy
+    'katana_reach': 40,        # A katana swing hits enemies this close to the player
+    'spawn_distance': 480,     # Enemies spawn at least this far from the player
+    'cell': 160,               # SpatialIndex cell for enemies - about the ally radius
+}
+
+# Hostile types - sprite is an NPC spritesheet, tinted when drawn
+ENEMY_TYPES = {
+    'thug': {'sprite': 'npc7', 'health': 3, 'walk_speed': 0.8, 'run_speed': 1.6, 'reach': 24, 'cooldown': 60},
+    'scout': {'sprite': 'npc4', 'health': 2, 'walk_speed': 1.0, 'run_speed': 1.8, 'reach': 24, 'cooldown': 45},
+}
+ENEMY_TYPE_NAMES = tuple(ENEMY_TYPES)
+ENEMY_TINT = (255, 140, 140)
+
+class Enemy:
+    """Hostile NPC - the behavior tree sets a target and speed, movement follows them"""
+    kind = 'enemy'
+    __slots__ = ('type', 'x', 'y', 'direction', 'state', 'anim_start', 'anim_ends_at', 'alive', 'health',
+                 'think_at', 'attack_ready', 'target_x', 'target_y', 'speed',
+                 'player_distance', 'cover', 'allies',   # Blackboard, filled by perceive()
+                 'generation', 'pool_index')
+
+    def __init__(self, *args):
+        self.generation = 0
+        self.pool_index = -1
+        self.reset(*args)
+
+    def reset(self, enemy_type, x, y, direction):
+        self.type = enemy_type
+        self.x = x
+        self.y = y
+        self.direction = direction
+        self.state = NPC_STATE_IDLE
+        self.anim_start = timers['now']
+        self.anim_ends_at = None
+        self.alive = True
+        self.health = ENEMY_TYPES[enemy_type]['health']
+        self.think_at = None
+        self.attack_ready = 0      # World tick the next attack is allowed on
+        self.target_x = None
+        self.target_y = None
+        self.speed = 0.0
+        self.player_distance = math.inf
+        self.cover = None          # Footprint of the nearest solid object
+        self.allies = 0
+
+enemies = EntityPool(Enemy)
+track_gauge('enemies', enemies.__len__)
+
+enemy_ai = {
+    'thinking': [],    # Enemies whose TIMER_THINK fired this tick
+    'indexed': [],     # Enemies in enemy_index, by point index
+}
+enemy_index = SpatialIndex(ENEMY_CONFIG['cell'])
+player_index = SpatialIndex(ENEMY_CONFIG['sight_radius'])
+cover_index = SpatialIndex(ENEMY_CONFIG['cover_radius'])
+cover_footprints = []  # Cover point index -> (left, top, right, bottom)
+
+def index_cover():
+    """Every solid object on the authored map is cover - indexed once by footprint centre"""
+    cover_footprints.clear()
+    for obj in map_objects:
+        footprint = object_footprint(obj)
+        if footprint is not None:
+            cover_footprints.append(footprint)
+    cover_index.build([(left + right) / 2 for left, _, right, _ in cover_footprints],
+                      [(top + bottom) / 2 for _, top, _, bottom in cover_footprints])
+
+# Behavior tree runtime - nodes are stateless and the tree is re-run from the
+# root on every think, so a change in perception switches behavior at once
+
+BT_SUCCESS = 0
+BT_FAILURE = 1
+BT_RUNNING = 2
+
+class Sequence:
+    """Ticks children in order until one does not succeed"""
+    __slots__ = ('children',)
+
+    def __init__(self, *children):
+        self.children = children
+
+    def tick(self, enemy):
+        for child in self.children:
+            status = child.tick(enemy)
+            if status != BT_SUCCESS:
+                return status
+        return BT_SUCCESS
+
+class Selector:
+    """Ticks children in order until one does not fail"""
+    __slots__ = ('children',)
+
+    def __init__(self, *children):
+        self.children = children
+
+    def tick(self, enemy):
+        for child in self.children:
+            status = child.tick(enemy)
+            if status != BT_FAILURE:
+                return status
+        return BT_FAILURE
+
+class Action:
+    """Leaf that runs act(enemy) and returns its status"""
+    __slots__ = ('act',)
+
+    def __init__(self, act):
+        self.act = act
+
+    def tick(self, enemy):
+        return self.act(enemy)
+
+class Sense:
+    """Perception leaf - tests the blackboard field filled by the batched `query`"""
+    __slots__ = ('query', 'test')
+
+    def __init__(self, query, test):
+        self.query = query
+        self.test = test
+
+    def tick(self, enemy):
+        return BT_SUCCESS if self.test(enemy) else BT_FAILURE
+
+def tree_queries(node):
+    """Names of the perception queries a tree's Sense nodes read"""
+    if isinstance(node, Sense):
+        return {node.query}
+    return set().union(*(tree_queries(child) for child in getattr(node, 'children', ())))
+
+def player_in_reach(enemy):
+    return enemy.player_distance <= ENEMY_TYPES[enemy.type]['reach']
+
+def player_in_sight(enemy):
+    return enemy.player_distance <= ENEMY_CONFIG['sight_radius']
+
+def has_allies(enemy):
+    return enemy.allies >= ENEMY_CONFIG['brave_allies']
+
+def has_cover(enemy):
+    return enemy.cover is not None
+
+def move_enemy_to(enemy, x, y, speed):
+    """Head for a point - movement runs every tick until it is reached"""
+    enemy.target_x = x
+    enemy.target_y = y
+    enemy.speed = speed
+    set_npc_state(enemy, NPC_STATE_RUNNING if speed > ENEMY_TYPES[enemy.type]['walk_speed'] else NPC_STATE_WALKING)
+
+def stop_enemy(enemy):
+    enemy.target_x = None
+    enemy.target_y = None
+    set_npc_state(enemy, NPC_STATE_IDLE)
+
+def face(dx, dy):
+    """Direction id for a heading"""
+    if abs(dx) > abs(dy):
+        return DIR_RIGHT if dx > 0 else DIR_LEFT
+    return DIR_DOWN if dy > 0 else DIR_UP
+
+def attack_player(enemy):
+    """Strike when the cooldown allows - a hit kills the player like a car does"""
+    stop_enemy(enemy)
+    enemy.direction = face(player.x - enemy.x, player.y - enemy.y)
+    now = timers['now']
+    if now < enemy.attack_ready:
+        return BT_RUNNING
+    enemy.attack_ready = now + ENEMY_TYPES[enemy.type]['cooldown']
+    post_event(EVENT_COLLISION, 'player_enemy', player, enemy)
+    return BT_SUCCESS
+
+def chase_player(enemy):
+    move_enemy_to(enemy, player.x, player.y, ENEMY_TYPES[enemy.type]['run_speed'])
+    return BT_RUNNING
+
+def take_cover(enemy):
+    """Run to the side of the nearest cover that faces away from the player"""
+    left, top, right, bottom = enemy.cover
+    center_x = (left + right) / 2
+    center_y = (top + bottom) / 2
+    away_x = center_x - player.x
+    away_y = center_y - player.y
+    length = math.hypot(away_x, away_y) or 1.0
+    margin = math.hypot(right - left, bottom - top) / 2 + 8
+    x = center_x + away_x / length * margin
+    y = center_y + away_y / length * margin
+    if is_solid(x, y):
+        x, y = center_x, bottom + 8
+    move_enemy_to(enemy, x, y, ENEMY_TYPES[enemy.type]['run_speed'])
+    return BT_RUNNING
+
+def wander(enemy):
+    """Stroll somewhere nearby now and then"""
+    if enemy.target_x is None and rng.random() < 0.2:
+        distance = ENEMY_CONFIG['wander_distance']
+        move_enemy_to(enemy, enemy.x + rng.uniform(-distance, distance), enemy.y + rng.uniform(-distance, distance),
+                      ENEMY_TYPES[enemy.type]['walk_speed'])
+    return BT_RUNNING
+
+ENEMY_TREES = {
+    # Thugs go for the player as soon as they see them
+    'thug': Selector(
+        Sequence(Sense('player', player_in_reach), Action(attack_player)),
+        Sequence(Sense('player', player_in_sight), Action(chase_player)),
+        Action(wander),
+    ),
+    # Scouts only attack in a group and hide behind cover when alone
+    'scout': Selector(
+        Sequence(Sense('player', player_in_reach), Action(attack_player)),
+        Sequence(Sense('player', player_in_sight), Sense('allies', has_allies), Action(chase_player)),
+        Sequence(Sense('player', player_in_sight), Sense('cover', has_cover), Action(take_cover)),
+        Action(wander),
+    ),
+}
+ENEMY_TREE_QUERIES = {name: tree_queries(tree) for name, tree in ENEMY_TREES.items()}
+
+def perceive(thinkers):
+    """Fill the blackboards of this tick's thinkers - one batched query per perception"""
+    needed = set().union(*(ENEMY_TREE_QUERIES[enemy.type] for enemy in thinkers))
+    count = len(thinkers)
+    query_x = np.fromiter((enemy.x for enemy in thinkers), np.float64, count)
+    query_y = np.fromiter((enemy.y for enemy in thinkers), np.float64, count)
+    if 'player' in needed:
+        player_index.build((player.x,), (player.y,))
+        _, distances = player_index.nearest_one(query_x, query_y, ENEMY_CONFIG['sight_radius'])
+        for enemy, distance in zip(thinkers, distances.tolist()):
+            enemy.player_distance = distance
+    if 'cover' in needed:
+        points, _ = cover_index.nearest_one(query_x, query_y, ENEMY_CONFIG['cover_radius'])
+        for enemy, point in zip(thinkers, points.tolist()):
+            enemy.cover = cover_footprints[point] if point >= 0 else None
+    if 'allies' in needed:
+        # Thinkers are in the index themselves
+        counts = enemy_index.count_within(query_x, query_y, ENEMY_CONFIG['ally_radius'])
+        for enemy, allies in zip(thinkers, counts.tolist()):
+            enemy.allies = allies - 1
+
+def index_enemies():
+    """Rebuild enemy_index from the living enemies"""
+    living = [enemy for enemy in enemies.items if enemy.alive]
+    enemy_ai['indexed'] = living
+    count = len(living)
+    enemy_index.build(np.fromiter((enemy.x for enemy in living), np.float64, count),
+                      np.fromiter((enemy.y for enemy in living), np.float64, count))
+
+def hurt_enemy(enemy):
+    """Take one hit point - the last one kills"""
+    enemy.health -= 1
+    if enemy.health > 0:
+        return
+    enemy.alive = False
+    enemy.target_x = None
+    enemy.target_y = None
+    set_npc_state(enemy, NPC_STATE_HURT)
+    schedule_timer(enemy, TIMER_ANIMATION, animation_length(NPC_CONFIG['animation_speed'], NPC_FRAME_COUNTS['hurt']))
+    post_event(EVENT_DEATH, 'enemy', enemy)
+
+def take_player_hits():
+    """Bullets and a katana swing starting this tick hurt the enemies they reach"""
+    indexed = enemy_ai['indexed']
+    if not indexed:
+        return
+    shots = list(bullets.items)
+    if shots:
+        query, point, _ = enemy_index.nearest(np.fromiter((bullet.x for bullet in shots), np.float64, len(shots)),
+                                              np.fromiter((bullet.y for bullet in shots), np.float64, len(shots)),
+                                              1, ENEMY_CONFIG['hit_radius'])
+        for shot, hit in zip(query.tolist(), point.tolist()):
+            enemy = indexed[hit]
+            if enemy.alive:
+                bullet = shots[shot]
+                hurt_enemy(enemy)
+                bullets.despawn(bullet)
+                post_event(EVENT_DESPAWN, 'bullet', bullet.x, bullet.y)
+    if player_weapon['attacking'] and player_animation['start'] == game_state['tick']:
+        _, point, _ = enemy_index.nearest((player.x,), (player.y,), len(indexed), ENEMY_CONFIG['katana_reach'])
+        for hit in point.tolist():
+            if indexed[hit].alive:
+                hurt_enemy(indexed[hit])
+
+def move_enemies():
+    """Step every enemy toward its target, sliding along walls"""
+    for enemy in enemies.items:
+        if enemy.target_x is None:
+            continue
+        dx = enemy.target_x - enemy.x
+        dy = enemy.target_y - enemy.y
+        distance = (dx * dx + dy * dy) ** 0.5
+        speed = enemy.speed
+        if distance <= speed:
+            stop_enemy(enemy)
+            continue
+        next_x = enemy.x + dx / distance * speed
+        next_y = enemy.y + dy / distance * speed
+        moved = False
+        if not is_solid(next_x, enemy.y):
+            enemy.x = next_x
+            moved = True
+        if not is_solid(enemy.x, next_y):
+            enemy.y = next_y
+            moved = True
+        if moved:
+            enemy.direction = face(dx, dy)
+        else:
+            stop_enemy(enemy)
+
+def update_enemies():
+    """Hits, then the behavior trees of this tick's thinkers, then movement"""
+    index_enemies()
+    take_player_hits()
+    thinkers = [enemy for enemy in enemy_ai['thinking'] if enemy.alive]
+    enemy_ai['thinking'] = []
+    if thinkers:
+        perceive(thinkers)
+        interval = ENEMY_CONFIG['think_interval']
+        for enemy in thinkers:
+            ENEMY_TREES[enemy.type].tick(enemy)
+            schedule_timer(enemy, TIMER_THINK, interval)
+    move_enemies()
+
+def queue_enemy_think(enemy):
+    """TIMER_THINK - run the enemy's behavior tree in update_enemies()"""
+    if enemy.alive:
+        enemy_ai['thinking'].append(enemy)
+
+on_timer(TIMER_THINK, queue_enemy_think)
+
+def spawn_enemy():
+    """Spawn a hostile NPC on a sidewalk of its zone, out of the player's sight if possible"""
+    zone = ENEMY_CONFIG['zone']
+    if zone not in sidewalk_index['tiles']:
+        return None
+    min_distance_sq = ENEMY_CONFIG['spawn_distance'] ** 2
+    for _ in range(8):
+        x, y = random_sidewalk_position(zone)
+        if (x - player.x) ** 2 + (y - player.y) ** 2 >= min_distance_sq:
+            break
+    enemy = enemies.spawn(rng.choice(ENEMY_TYPE_NAMES), x, y, rng.randrange(4))
+    # Spread thinking over the interval
+    schedule_timer(enemy, TIMER_THINK, rng.randint(1, ENEMY_CONFIG['think_interval']))
+    post_event(EVENT_SPAWN, 'enemy', enemy)
+    return enemy
+
+def initialize_enemies():
+    """Spawn the initial enemy population"""
+    enemies.clear()
+    for _ in range(ENEMY_CONFIG['population']):
+        spawn_enemy()
+
+def replace_dead_enemies(batch):
+    """A new enemy turns up for every one killed"""
+    for kind, _ in batch:
+        if kind == 'enemy':
+            spawn_enemy()
+
+def remove_dead_enemies(batch):
+    """Dead enemies are removed once their hurt animation has played"""
+    for kind, enemy, _ in batch:
+        if kind == 'enemy' and not enemy.alive and enemy.pool_index >= 0:
+            enemies.despawn(enemy)
+            post_event(EVENT_DESPAWN, 'enemy', enemy.x, enemy.y)
+
+subscribe(EVENT_DEATH, replace_dead_enemies)
+subscribe(EVENT_ANIMATION_DONE, remove_dead_enemies)
+
+def get_enemy_frame(enemy_type, state, direction, frame_index, scale=1.0):
+    """NPC frame of the enemy's spritesheet, tinted and cached"""
+    def build():
+        frame = get_npc_frame(ENEMY_TYPES[enemy_type]['sprite'], state, direction, frame_index, scale)
+        if frame is None:
+            return None
+        frame = frame.copy()
+        frame.fill(ENEMY_TINT, special_flags=pygame.BLEND_RGB_MULT)
+        return frame
+    return cached_surface((('enemy', enemy_type, state, direction, frame_index), 0, scale), build)
+
+index_cover()
+initialize_enemies()
 
 # ============================================
 # REPLACE check_collision_with_cars function
 # ============================================
 def play_hurt_animation():
     """Play hurt animation once"""
-    player_animation['state'] = 'hurt'
-    player_animation['current_frame'] = 0
-    player_animation['frame_delay'] = 0
-
-def get_car_hitbox(car):
-    """Get rectangular hitbox for car based on direction and type"""
-    # Determine car size
-    if car['name'] in ['truckup']:
-        width, height = 32, 51  # Larger vehicles
-    else:
-        width, height = 27, 46  # Regular cars
-    
-    # Rotate hitbox based on direction
-    if car['direction'] in ['up', 'down']:
-        # Vertical: use width/height as-is
-        half_w = width / 2
-        half_h = height / 2
-    else:  # left, right
-        # Horizontal: swap width and height
-        half_w = height / 2
-        half_h = width / 2
-    
-    return {
-        'left': car['x'] - half_w,
-        'right': car['x'] + half_w,
-        'top': car['y'] - half_h,
-        'bottom': car['y'] + half_h
-    }
+    play_player_animation('hurt')
 
-def check_rect_collision(x, y, hitbox, padding=0):
-    """Check if point (x, y) collides with rectangular hitbox"""
-    player_size = 6 + padding  # Player collision size
-    
-    return (x + player_size > hitbox['left'] and 
-            x - player_size < hitbox['right'] and
-            y + player_size > hitbox['top'] and 
-            y - player_size < hitbox['bottom'])
+# Car hitbox (width, height) facing up or down - swapped when driving left or right
+CAR_HITBOX_SIZES = {
+    'ambulanceup': (27, 46),
+    'truckup': (32, 51),  # Larger vehicles
+    'carup1': (27, 46),
+}
+
+# Half extents per car type, indexed by axis (direction & 1): vertical, horizontal
+CAR_HALF_EXTENTS = {name: ((width / 2, height / 2), (height / 2, width / 2))
+                    for name, (width, height) in CAR_HITBOX_SIZES.items()}
+
+PLAYER_HIT_SIZE = 6        # Player collision half size
+PLAYER_BLOCK_PADDING = 5   # Extra padding when blocking a step into a car
+
+# Car AABBs as rows of (x, y, half width, half height), rebuilt once per tick
+# after traffic has moved - row i belongs to car_box_owners[i]. The player
+# checks share one vectorized query for the cars within a step of the player.
+car_boxes = np.zeros((0, 4))
+car_box_owners = []
+car_collision = {'candidates': None}  # [(car, box), ...] near the player this tick
+
+def update_car_boxes():
+    """Rebuild the AABB array from the live cars"""
+    global car_boxes, car_box_owners
+    items = traffic_vehicles.items
+    car_box_owners = items[:]
+    if items:
+        car_boxes = np.array([(c.x, c.y, *CAR_HALF_EXTENTS[c.name][c.direction & 1]) for c in items])
+    else:
+        car_boxes = np.zeros((0, 4))
+    car_collision['candidates'] = None
+
+def player_car_candidates():
+    """Cars whose box comes within a step of the player - queried once per tick"""
+    candidates = car_collision['candidates']
+    if candidates is None:
+        boxes = car_boxes
+        reach = PLAYER_HIT_SIZE + PLAYER_BLOCK_PADDING + player_run_speed
+        near = np.flatnonzero((np.abs(boxes[:, 0] - player.x) < boxes[:, 2] + reach) &
+                              (np.abs(boxes[:, 1] - player.y) < boxes[:, 3] + reach))
+        owners = car_box_owners
+        candidates = [(owners[i], box) for i, box in zip(near.tolist(), boxes[near].tolist())]
+        car_collision['candidates'] = candidates
+    return candidates
+
+def check_rect_collision(x, y, box, padding=0):
+    """Check if point (x, y) collides with a car box (x, y, half width, half height)"""
+    box_x, box_y, half_w, half_h = box
+    size = PLAYER_HIT_SIZE + padding
+    return abs(x - box_x) < half_w + size and abs(y - box_y) < half_h + size
 
 def check_player_car_collision(new_x, new_y):
     """Check if player would collide with ANY car at new position - RECTANGULAR"""
-    for car in traffic_vehicles:
-        hitbox = get_car_hitbox(car)
-        
-        if check_rect_collision(new_x, new_y, hitbox, padding=5):
+    for car, box in player_car_candidates():
+        if check_rect_collision(new_x, new_y, box, padding=PLAYER_BLOCK_PADDING):
             return True  # Collision - block movement
     
     return False  # No collision - allow movement
 
 def check_collision_with_cars():
-    """Death collision - only fast moving cars from front/side - RECTANGULAR"""
-    for car in traffic_vehicles:
-        hitbox = get_car_hitbox(car)
-        
+    """The car that kills the player, if any - only fast moving cars from front/side - RECTANGULAR"""
+    player_x, player_y = player.x, player.y
+    for car, box in player_car_candidates():
         # Check if player is inside car hitbox
-        if check_rect_collision(player.x, player.y, hitbox, padding=0):
+        if check_rect_collision(player_x, player_y, box, padding=0):
             # Car must be moving fast enough to kill
-            if car['speed'] < 1.8:
+            if car.speed < 1.8:
                 continue  # Stopped/slow car won't kill
             
             # Check impact direction (player position relative to car center)
-            dx = player.x - car['x']
-            dy = player.y - car['y']
+            dx = player_x - car.x
+            dy = player_y - car.y
             
             # Front/side collision only (not rear-end)
-            if car['direction'] == 'right':
+            if car.direction == DIR_RIGHT:
                 if dx > -20:  # Player not behind car
-                    play_hurt_animation()  # Play hurt animation
-                    return True
-            elif car['direction'] == 'left':
+                    return car
+            elif car.direction == DIR_LEFT:
                 if dx < 20:
-                    play_hurt_animation()  # Play hurt animation
-                    return True
-            elif car['direction'] == 'down':
+                    return car
+            elif car.direction == DIR_DOWN:
                 if dy > -20:
-                    play_hurt_animation()  # Play hurt animation
-                    return True
-            elif car['direction'] == 'up':
+                    return car
+            elif car.direction == DIR_UP:
                 if dy < 20:
-                    play_hurt_animation()  # Play hurt animation
-                    return True
+                    return car
     
-    return False
+    return None
+
+# Death screen line per EVENT_COLLISION kind
+DEATH_CAUSES = {
+    'player_car': "Hit by a car!",
+    'player_enemy': "Beaten up by a gang!",
+}
+
+def kill_player(batch):
+    """A fast car or an enemy hit the player"""
+    for kind, _, _ in batch:
+        if kind in DEATH_CAUSES and game_state['alive']:
+            play_hurt_animation()
+            game_state['alive'] = False
+            game_state['death_cause'] = kind
+            game_state['restart_at'] = game_state['tick'] + game_state['death_delay']
+            post_event(EVENT_DEATH, 'player', player)
+
+subscribe(EVENT_COLLISION, kill_player)
+
 
 def restart_game():
     """Restart the game - reset player and game state"""
@@ -1692,7 +4787,7 @@ def restart_game():
     player.x = 500
     player.y = 500
     player_animation['direction'] = 'down'
-    player_animation['current_frame'] = 0
+    play_player_animation('idle')
     
     # Clear all traffic
     traffic_vehicles.clear()
@@ -1702,312 +4797,945 @@ def restart_game():
     
     # Reset game state
     game_state['alive'] = True
-    game_state['death_timer'] = 0
+    game_state['restart_at'] = None
+
+# ============================================
+# SAVE / LOAD
+# ============================================
+# Snapshots are flat struct records: a header with the entity counts, the
+# player/timer block, the RNG state, one fixed-size record per NPC, car and
+# bullet, then the variable-length paths, routes and flow field goals. Loading
+# a snapshot and replaying the same input reproduces the saved run exactly.
+# F5 saves, F9 loads, and the game autosaves every SAVE_CONFIG['autosave_interval'] ticks.
+
+SAVE_CONFIG = {
+    'quicksave_path': 'quicksave.sav',
+    'autosave_path': 'autosave.sav',
+    'autosave_interval': 3600,   # Ticks between autosaves (60 = 1 second), 0 disables
+}
+
+SAVE_MAGIC = b'PGZS'
+SAVE_VERSION = 5
+SAVE_HEADER = struct.Struct('<4sHIIII')            # magic, version, npc, car, bullet, enemy counts
+SAVE_WORLD = struct.Struct('<ddBBIiBBHHBBqQQI')    # player, animation, weapon, game state, world clock, spawn timer
+SAVE_RNG = struct.Struct('<625Id')                 # Mersenne Twister state, gauss_next (nan if unset)
+SAVE_NPC = struct.Struct('<BddBBBIiiiiHHH')        # type, x, y, direction, state, alive, animation age, timers, path length/segment/position
+SAVE_CAR = struct.Struct('<BddBdddBiiiddddiHHhB')  # name, x, y, direction, speeds, angle, state, timers, lanes, destination, route length/step, reservation
+SAVE_BULLET = struct.Struct('<dddddi')             # x, y, vel_x, vel_y, angle, remaining lifetime
+SAVE_ENEMY = struct.Struct('<BddBBBBIiiiddd')      # type, x, y, direction, state, alive, health, animation age, timers, target, speed
+SAVE_TRAILER = struct.Struct('<IIBB')              # path tiles, route steps, flow goals, cached flow fields
+SAVE_GOAL = struct.Struct('<16shhhhhhI')           # name, goal/field/pending cells (-1 if none), pending BFS steps
+SAVE_CELL = struct.Struct('<hh')
+SAVE_SIGNAL = struct.Struct('<BBIH')               # phase, next phase, timer, queued cars (indices follow)
+
+PLAYER_STATES = tuple(FRAME_COUNTS)
+WEAPON_TYPES = ('none', 'katana', 'gun')
+NAN = float('nan')
+NO_CELL = (-1, -1)
+
+save_state = {
+    'writer': None,       # Background thread writing the last snapshot
+    'last_save_ms': 0.0,  # Main-thread cost of the last snapshot
+}
+
+def optional(value):
+    """Pack None as nan"""
+    return NAN if value is None else value
+
+def restore_optional(value):
+    """Unpack nan as None"""
+    return None if value != value else value
+
+def flow_field_progress(field):
+    """BFS steps a field has run - replaying that many rebuilds it exactly"""
+    return sum(1 for value in field.distance if value >= 0) - len(field.frontier)
+
+def capture_snapshot():
+    """Pack the whole simulation state into bytes"""
+    weapon = player_weapon
+    animation = player_animation
+    parts = [
+        SAVE_HEADER.pack(SAVE_MAGIC, SAVE_VERSION, len(npcs), len(traffic_vehicles), len(bullets), len(enemies)),
+        SAVE_WORLD.pack(player.x, player.y,
+                        DIRECTION_IDS[animation['direction']], PLAYER_STATES.index(animation['state']),
+                        game_state['tick'] - animation['start'],
+                        -1 if animation['ends_at'] is None else animation['ends_at'] - game_state['tick'],
+                        WEAPON_TYPES.index(weapon['type']), weapon['attacking'],
+                        weapon['attack_frame'], weapon['attack_delay'], weapon['shoot_animation_done'],
+                        game_state['alive'], -1 if game_state['restart_at'] is None else game_state['restart_at'],
+                        game_state['tick'], timers['now'], spawn_timer),
+    ]
+    _, mt_state, gauss_next = rng.getstate()
+    parts.append(SAVE_RNG.pack(*mt_state, optional(gauss_next)))
+    
+    path_tiles = array('I')
+    pack = SAVE_NPC.pack
+    for n in npcs.items:
+        path = n.path
+        if path is None:
+            path_info = (0, 0, 0)
+        else:
+            path_tiles.extend(path.waypoints)
+            path_info = (len(path.waypoints), path.segment, path.position)
+        parts.append(pack(int(n.type[3:]), n.x, n.y, n.direction, n.state, n.alive,
+                          timers['now'] - n.anim_start, timer_remaining(n.decide_at), timer_remaining(n.sit_until),
+                          timer_remaining(n.flee_until), timer_remaining(n.anim_ends_at), *path_info))
+    
+    route_steps = array('H')
+    pack = SAVE_CAR.pack
+    for c in traffic_vehicles.items:
+        lane = c.target_lane or (NAN, NAN)
+        route = c.route or ()
+        for step in route:
+            route_steps.extend(step)
+        parts.append(pack(CAR_TYPES.index(c.name), c.x, c.y, c.direction, c.speed, c.target_speed,
+                          c.angle, c.state, timer_remaining(c.stuck_at),
+                          c.last_intersection['id'] if c.last_intersection else -1,
+                          min(timers['now'] - c.turned_at, 999), lane[0], lane[1], optional(c.lane_y), optional(c.lane_x),
+                          -1 if c.destination is None else c.destination, len(route), c.route_step,
+                          c.reservation.intersection['id'] if c.reservation else -1, c.granted))
+    
+    pack = SAVE_BULLET.pack
+    parts.extend([pack(b.x, b.y, b.vel_x, b.vel_y, b.angle, timer_remaining(b.expires_at)) for b in bullets.items])
+    
+    pack = SAVE_ENEMY.pack
+    now = timers['now']
+    parts.extend([pack(ENEMY_TYPE_NAMES.index(e.type), e.x, e.y, e.direction, e.state, e.alive, e.health,
+                       now - e.anim_start, timer_remaining(e.think_at), timer_remaining(e.anim_ends_at),
+                       e.attack_ready - now, optional(e.target_x), optional(e.target_y), e.speed)
+                  for e in enemies.items])
+    
+    parts.append(SAVE_TRAILER.pack(len(path_tiles), len(route_steps) // 2, len(flow_goals), len(flow_field_cache)))
+    parts.append(path_tiles.tobytes())
+    parts.append(route_steps.tobytes())
+    for name, goal in flow_goals.items():
+        field = goal['field']
+        pending = goal['pending']
+        parts.append(SAVE_GOAL.pack(name.encode(), *(goal['cell'] or NO_CELL),
+                                    *(field.cell if field else NO_CELL),
+                                    *(pending.cell if pending else NO_CELL),
+                                    flow_field_progress(pending) if pending else 0))
+    parts.extend([SAVE_CELL.pack(*cell) for cell in flow_field_cache])
+    # Holders are rebuilt from the car records - only the queue order needs saving
+    car_index = {c: i for i, c in enumerate(traffic_vehicles.items)}
+    for controller in intersection_controllers:
+        queue = [car_index[c] for c in controller.queue if c.reservation is controller and c.pool_index >= 0]
+        parts.append(SAVE_SIGNAL.pack(controller.phase, controller.next_phase, controller.timer, len(queue)))
+        parts.append(array('H', queue).tobytes())
+    return b''.join(parts)
+
+def restore_flow_field(cell, progress=None, old_cache=None):
+    """Rebuild a flow field, reusing an identical finished one when possible"""
+    if progress is None and old_cache and cell in old_cache:
+        return old_cache[cell]
+    field = FlowField(cell)
+    field.expand(len(walkable_grid) if progress is None else progress)
+    return field
+
+def restore_snapshot(data):
+    """Replace the simulation state with a snapshot from capture_snapshot()"""
+    global spawn_timer
+    
+    # Parse and check the whole snapshot before touching the world - a bad save
+    # raises here and leaves the running game as it was
+    magic, version, npc_count, car_count, bullet_count, enemy_count = SAVE_HEADER.unpack_from(data, 0)
+    if magic != SAVE_MAGIC or version != SAVE_VERSION:
+        raise ValueError(f"not a version {SAVE_VERSION} save")
+    offset = SAVE_HEADER.size
+    
+    (player_x, player_y, direction, state, animation_age, animation_left, weapon_type, attacking,
+     attack_frame, attack_delay, shoot_done, alive, restart_at, tick,
+     world_tick, saved_spawn_timer) = SAVE_WORLD.unpack_from(data, offset)
+    offset += SAVE_WORLD.size
+    direction = DIRECTION_NAMES[direction]
+    state = PLAYER_STATES[state]
+    weapon_type = WEAPON_TYPES[weapon_type]
+    
+    values = SAVE_RNG.unpack_from(data, offset)
+    offset += SAVE_RNG.size
+    rng_state = (3, values[:625], restore_optional(values[625]))
+    random.Random().setstate(rng_state)  # Raises ValueError on a corrupt state
+    
+    def records(record, count):
+        nonlocal offset
+        end = offset + count * record.size
+        if end > len(data):
+            raise ValueError(f"save is {len(data)} bytes, records end at {end}")
+        section = list(record.iter_unpack(data[offset:end]))
+        offset = end
+        return section
+    
+    npc_records = records(SAVE_NPC, npc_count)
+    car_records = records(SAVE_CAR, car_count)
+    bullet_records = records(SAVE_BULLET, bullet_count)
+    enemy_records = records(SAVE_ENEMY, enemy_count)
+    
+    tile_count, step_count, goal_count, cached_count = SAVE_TRAILER.unpack_from(data, offset)
+    offset += SAVE_TRAILER.size
+    path_tiles = array('I')
+    path_tiles.frombytes(data[offset:offset + tile_count * path_tiles.itemsize])
+    offset += tile_count * path_tiles.itemsize
+    route_steps = array('H')
+    route_steps.frombytes(data[offset:offset + step_count * 2 * route_steps.itemsize])
+    offset += step_count * 2 * route_steps.itemsize
+    
+    npc_states = []
+    tile = 0
+    for (npc_type, x, y, npc_direction, npc_state, npc_alive, npc_age, decide_in,
+         sit_for, flee_for, npc_left, path_length, segment, position) in npc_records:
+        if not 1 <= npc_type <= 9:
+            raise ValueError(f"unknown NPC type {npc_type}")
+        path = None
+        if path_length:
+            waypoints = path_tiles[tile:tile + path_length].tolist()
+            tile += path_length
+            if len(waypoints) != path_length or segment >= path_length:
+                raise ValueError("NPC path runs past the saved path tiles")
+            path = HierarchicalPath(pedestrian_paths, waypoints)
+            if segment:
+                path.tiles = pedestrian_paths.refine(waypoints[segment - 1], waypoints[segment])
+            path.segment = segment
+            path.position = position
+        npc_states.append((f'npc{npc_type}', x, y, npc_direction, npc_state, npc_alive, npc_age,
+                           decide_in, sit_for, flee_for, npc_left, path))
+    
+    car_states = []
+    step = 0
+    for (name, x, y, car_direction, speed, target_speed, angle, car_state, stuck_in, last_intersection,
+         since_turn, lane_x_target, lane_y_target, lane_y, lane_x,
+         destination, route_length, route_step, reservation, granted) in car_records:
+        route = None
+        if route_length:
+            if step + route_length > step_count:
+                raise ValueError("car route runs past the saved route steps")
+            route = tuple((route_steps[i], route_steps[i + 1])
+                          for i in range(step * 2, (step + route_length) * 2, 2))
+            step += route_length
+            if any(index >= len(INTERSECTIONS) or heading > DIR_RIGHT for index, heading in route):
+                raise ValueError("car route names an unknown intersection or heading")
+        car_states.append((CAR_TYPES[name], x, y, car_direction, speed, target_speed, angle, car_state, stuck_in,
+                           INTERSECTIONS[last_intersection] if last_intersection >= 0 else None, since_turn,
+                           None if lane_x_target != lane_x_target else (lane_x_target, lane_y_target),
+                           restore_optional(lane_y), restore_optional(lane_x),
+                           destination if destination >= 0 else None, route, route_step,
+                           intersection_controllers[reservation] if reservation >= 0 else None, bool(granted)))
+    
+    enemy_states = [(ENEMY_TYPE_NAMES[enemy_type], *rest) for enemy_type, *rest in enemy_records]
+    
+    # Flow fields are rebuilt to the same BFS progress so crowds move the same way
+    goals = []
+    for _ in range(goal_count):
+        name, *cells, progress = SAVE_GOAL.unpack_from(data, offset)
+        offset += SAVE_GOAL.size
+        goals.append((name.rstrip(b'\0').decode(), cells, progress))
+    cached_cells = [SAVE_CELL.unpack_from(data, offset + i * SAVE_CELL.size) for i in range(cached_count)]
+    offset += cached_count * SAVE_CELL.size
+    signals = []
+    for _ in intersection_controllers:
+        phase, next_phase, timer, queue_length = SAVE_SIGNAL.unpack_from(data, offset)
+        offset += SAVE_SIGNAL.size
+        queue = array('H')
+        queue.frombytes(data[offset:offset + queue_length * queue.itemsize])
+        offset += queue_length * queue.itemsize
+        if any(i >= car_count for i in queue):
+            raise ValueError("signal queue names a car that is not in the save")
+        signals.append((phase, next_phase, timer, queue))
+    if offset != len(data):
+        raise ValueError(f"save is {len(data)} bytes, expected {offset}")
+    
+    cache = {cell: restore_flow_field(cell, old_cache=flow_field_cache) for cell in cached_cells}
+    goal_states = {}
+    for name, cells, progress in goals:
+        goal_cell, field_cell, pending_cell = (tuple(cells[i:i + 2]) for i in (0, 2, 4))
+        field = None
+        if field_cell != NO_CELL:
+            field = cache.get(field_cell) or restore_flow_field(field_cell, old_cache=flow_field_cache)
+        goal_states[name] = {
+            'cell': goal_cell if goal_cell != NO_CELL else None,
+            'field': field,
+            'pending': restore_flow_field(pending_cell, progress) if pending_cell != NO_CELL else None,
+        }
+    
+    # Everything checked out - apply it
+    player.x, player.y = player_x, player_y
+    spawn_timer = saved_spawn_timer
+    player_animation['direction'] = direction
+    player_animation['state'] = state
+    player_weapon['type'] = weapon_type
+    player_weapon['attacking'] = bool(attacking)
+    player_weapon['attack_frame'] = attack_frame
+    player_weapon['attack_delay'] = attack_delay
+    player_weapon['shoot_animation_done'] = bool(shoot_done)
+    game_state['alive'] = bool(alive)
+    game_state['restart_at'] = restart_at if restart_at >= 0 else None
+    game_state['tick'] = tick
+    player_animation['start'] = tick - animation_age
+    player_animation['ends_at'] = tick + animation_left if animation_left >= 0 else None
+    # Timers are rescheduled from the entity records below
+    reset_timers(world_tick)
+    rng.setstate(rng_state)
+    
+    npcs.clear()
+    for (npc_type, x, y, npc_direction, npc_state, npc_alive, npc_age, decide_in,
+         sit_for, flee_for, npc_left, path) in npc_states:
+        npc = npcs.spawn(npc_type, x, y, npc_direction)
+        npc.state = npc_state
+        npc.anim_start = timers['now'] - npc_age
+        npc.alive = bool(npc_alive)
+        restore_timer(npc, TIMER_DECIDE, decide_in)
+        restore_timer(npc, TIMER_SIT, sit_for)
+        restore_timer(npc, TIMER_FLEE, flee_for)
+        restore_timer(npc, TIMER_ANIMATION, npc_left)
+        if path is not None:
+            npc.path = path
+    
+    traffic_vehicles.clear()
+    for (name, x, y, car_direction, speed, target_speed, angle, car_state, stuck_in, last_intersection,
+         since_turn, target_lane, lane_y, lane_x, destination, route, route_step,
+         reservation, granted) in car_states:
+        car = traffic_vehicles.spawn(name, x, y, car_direction)
+        car.speed = speed
+        car.target_speed = target_speed
+        car.angle = angle
+        car.state = car_state
+        restore_timer(car, TIMER_STUCK, stuck_in)
+        car.last_intersection = last_intersection
+        car.turned_at = timers['now'] - since_turn
+        car.target_lane = target_lane
+        car.lane_y = lane_y
+        car.lane_x = lane_x
+        car.destination = destination
+        if route is not None:
+            car.route = route
+        car.route_step = route_step
+        if reservation is not None:
+            car.reservation = reservation
+            car.granted = granted
+    
+    bullets.clear()
+    for record in bullet_records:
+        bullets.spawn(*record)
+    
+    enemies.clear()
+    enemy_ai['thinking'] = []
+    for (enemy_type, x, y, enemy_direction, enemy_state, enemy_alive, health, enemy_age, think_in,
+         enemy_left, attack_in, target_x, target_y, speed) in enemy_states:
+        enemy = enemies.spawn(enemy_type, x, y, enemy_direction)
+        enemy.state = enemy_state
+        enemy.alive = bool(enemy_alive)
+        enemy.health = health
+        enemy.anim_start = timers['now'] - enemy_age
+        restore_timer(enemy, TIMER_THINK, think_in)
+        restore_timer(enemy, TIMER_ANIMATION, enemy_left)
+        enemy.attack_ready = timers['now'] + attack_in
+        enemy.target_x = restore_optional(target_x)
+        enemy.target_y = restore_optional(target_y)
+        enemy.speed = speed
+    
+    cars = traffic_vehicles.items
+    for controller, (phase, next_phase, timer, queue) in zip(intersection_controllers, signals):
+        controller.phase, controller.next_phase, controller.timer = phase, next_phase, timer
+        controller.queue = [cars[i] for i in queue]
+        controller.holders = [car for car in cars if car.reservation is controller and car.granted]
+    
+    flow_field_cache.clear()
+    flow_field_cache.update(cache)
+    flow_goals.clear()
+    flow_goals.update(goal_states)
+
+def write_snapshot(path, data):
+    """Write a snapshot atomically - runs on the writer thread"""
+    try:
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not save {path}: {e}")
+
+def save_game(path):
+    """Snapshot the world now and write it in the background"""
+    writer = save_state['writer']
+    if writer is not None and writer.is_alive():
+        writer.join()  # Keep saves in order
+    
+    start = time.perf_counter()
+    data = capture_snapshot()
+    save_state['last_save_ms'] = (time.perf_counter() - start) * 1000
+    
+    writer = threading.Thread(target=write_snapshot, args=(path, data), daemon=True)
+    writer.start()
+    save_state['writer'] = writer
+
+def load_game(path):
+    """Load a snapshot written by save_game() - returns True on success"""
+    writer = save_state['writer']
+    if writer is not None:
+        writer.join()  # Make sure the file is complete
+    
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        restore_snapshot(data)
+    except (OSError, ValueError, struct.error, IndexError) as e:
+        print(f"Could not load {path}: {e}")
+        return False
+    print(f"Loaded {path}: {len(npcs)} NPCs, {len(enemies)} enemies, {len(traffic_vehicles)} cars, {len(bullets)} bullets")
+    return True
+
+def update_autosave():
+    """Autosave on a fixed tick interval"""
+    interval = SAVE_CONFIG['autosave_interval']
+    if interval and game_state['tick'] % interval == 0 and replay['mode'] != 'replay':
+        save_game(SAVE_CONFIG['autosave_path'])
+
+def finish_saves():
+    """Wait for a pending save before the process exits"""
+    writer = save_state['writer']
+    if writer is not None:
+        writer.join()
+
+atexit.register(finish_saves)
+
+# ============================================
+# POPULATION GOVERNOR
+# ============================================
+# Holds the frame budget by trading population for time. Every tick the
+# governor times update() and the last draw() and keeps moving averages of
+# both. A quality level sets the NPC and car caps, the traffic spawn interval
+# and the NPC LOD distance as a multiple of their configured values.
+#
+# Hysteresis keeps the level from hunting: it drops only once the frame time
+# has stayed over budget for 'patience' ticks, rises only once it has stayed
+# under 'raise_below' of the budget for the longer 'recover', and nothing is
+# decided for 'cooldown' ticks after a change while the population settles.
+#   GAME_GOVERNOR=0 python game.py    keep the configured caps
+
+GOVERNOR_CONFIG = {
+    'enabled': os.environ.get('GAME_GOVERNOR', '1') != '0',
+    'target_ms': 12.0,          # Budget for update() + draw() - a 60 fps frame leaves the rest for the flip
+    'raise_below': 0.6,         # Share of the budget frames must stay under before the level rises
+    'patience': 30,             # Ticks over budget before the level drops
+    'recover': 240,             # Ticks under raise_below before it rises
+    'cooldown': 180,            # Ticks without a decision after a change, and at start
+    'smoothing': 0.1,           # Weight of the newest tick in the moving averages
+    'rebalance_interval': 15,   # Ticks between NPC population corrections
+    'rebalance_step': 10,       # Most NPCs spawned or despawned per correction
+    'log': True,                # Print every level change
+}
+
+# Quality levels - multiples of the configured caps
+GOVERNOR_LEVELS = (0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0)
+GOVERNOR_DEFAULT_LEVEL = GOVERNOR_LEVELS.index(1.0)
+
+# Configured values the levels scale
+GOVERNOR_BASE = {
+    'max_population': NPC_CONFIG['max_population'],
+    'lod_distance': NPC_CONFIG['lod_distance'],
+    'max_cars': TRAFFIC_CONFIG['max_cars'],
+    'spawn_interval': TRAFFIC_CONFIG['spawn_interval'],
+}
+
+governor = {
+    'level': GOVERNOR_DEFAULT_LEVEL,
+    'sim_ms': 0.0,          # Moving average of update()
+    'frame_ms': 0.0,        # Moving average of update() + draw()
+    'draw_seconds': 0.0,    # Last draw(), added to the next tick
+    'over': 0,              # Ticks in a row over budget
+    'under': 0,             # Ticks in a row under raise_below
+    'hold_until': GOVERNOR_CONFIG['cooldown'],  # No decisions before this tick
+    'last_change': None,    # (tick, old level) of the last change
+}
+
+governor_stats = {
+    'drops': 0,
+    'raises': 0,
+}
+track_gauge('governor_scale', lambda: GOVERNOR_LEVELS[governor['level']])
+
+def describe_governor():
+    """The caps the current level sets, for the HUD and the log"""
+    return (f"{NPC_CONFIG['max_population']} NPCs, {TRAFFIC_CONFIG['max_cars']} cars "
+            f"every {TRAFFIC_CONFIG['spawn_interval']} ticks, LOD {NPC_CONFIG['lod_distance']:.0f} px")
+
+def set_governor_level(level):
+    """Scale the live caps to a quality level"""
+    old = governor['level']
+    scale = GOVERNOR_LEVELS[level]
+    governor['level'] = level
+    NPC_CONFIG['max_population'] = max(1, round(GOVERNOR_BASE['max_population'] * scale))
+    NPC_CONFIG['lod_distance'] = GOVERNOR_BASE['lod_distance'] * scale
+    TRAFFIC_CONFIG['max_cars'] = max(1, round(GOVERNOR_BASE['max_cars'] * scale))
+    TRAFFIC_CONFIG['spawn_interval'] = max(1, round(GOVERNOR_BASE['spawn_interval'] / scale))
+    if level != old:
+        governor['last_change'] = (game_state['tick'], old)
+        governor_stats['drops' if level < old else 'raises'] += 1
+        if GOVERNOR_CONFIG['log']:
+            print(f"Governor: {GOVERNOR_LEVELS[old]:g}x -> {scale:g}x at tick {game_state['tick']} "
+                  f"(frame {governor['frame_ms']:.1f} ms, budget {GOVERNOR_CONFIG['target_ms']:g} ms): "
+                  f"{describe_governor()}")
+
+def governor_sample(update_seconds):
+    """Fold in one tick's timings and change the level if the budget calls for it"""
+    config = GOVERNOR_CONFIG
+    weight = config['smoothing']
+    sim_ms = update_seconds * 1000
+    governor['sim_ms'] += (sim_ms - governor['sim_ms']) * weight
+    governor['frame_ms'] += (sim_ms + governor['draw_seconds'] * 1000 - governor['frame_ms']) * weight
+    
+    # Replays take the level from the recording
+    if not config['enabled'] or replay['mode'] == 'replay' or game_state['tick'] < governor['hold_until']:
+        return
+    target = config['target_ms']
+    frame_ms = governor['frame_ms']
+    governor['over'] = governor['over'] + 1 if frame_ms > target else 0
+    governor['under'] = governor['under'] + 1 if frame_ms < target * config['raise_below'] else 0
+    
+    level = governor['level']
+    if governor['over'] >= config['patience'] and level > 0:
+        level -= 1
+    elif governor['under'] >= config['recover'] and level < len(GOVERNOR_LEVELS) - 1:
+        level += 1
+    else:
+        return
+    set_governor_level(level)
+    governor['over'] = governor['under'] = 0
+    governor['hold_until'] = game_state['tick'] + config['cooldown']
+
+# ============================================
+# HUD
+# ============================================
+# Each HUD line is a named slot holding its last rendered surface. A slot is
+# re-rendered only when its text or style changes, and full-screen overlays
+# are built once, so the HUD costs a few blits per frame.
+
+hud_slots = {}      # Slot name -> (text, color, fontsize, Surface)
+hud_fonts = {}      # Font size -> pygame Font
+hud_overlays = {}   # (color, alpha) -> full-screen Surface
+
+hud_stats = {
+    'renders': 0,   # Text surfaces rendered
+    'blits': 0,
+}
+track_total('hud_renders', hud_stats, 'renders')
+track_total('hud_blits', hud_stats, 'blits')
+
+def get_hud_font(fontsize):
+    """Default pgzero font at a size, loaded once"""
+    font = hud_fonts.get(fontsize)
+    if font is None:
+        if not pygame.font.get_init():
+            pygame.font.init()
+        font = hud_fonts[fontsize] = pygame.font.Font(None, fontsize)
+    return font
+
+def hud_text(target, slot, text, color, fontsize, **anchor):
+    """Blit a HUD line, rendering it only if the slot's text or style changed"""
+    entry = hud_slots.get(slot)
+    if entry is None or entry[0] != text or entry[1] != color or entry[2] != fontsize:
+        surface = get_hud_font(fontsize).render(text, True, pygame.Color(color))
+        entry = hud_slots[slot] = (text, color, fontsize, surface)
+        hud_stats['renders'] += 1
+    surface = entry[3]
+    target.blit(surface, surface.get_rect(**anchor))
+    hud_stats['blits'] += 1
+
+def hud_overlay(target, color, alpha):
+    """Blit a persistent translucent full-screen overlay"""
+    key = (color, alpha)
+    overlay = hud_overlays.get(key)
+    if overlay is None:
+        overlay = pygame.Surface((WIDTH, HEIGHT))
+        if pygame.display.get_surface() is not None:
+            overlay = overlay.convert()
+        overlay.fill(color)
+        overlay.set_alpha(alpha)
+        hud_overlays[key] = overlay
+    target.blit(overlay, (0, 0))
+
+def draw_governor_hud(target):
+    """Governor level, frame and simulation time against the budget, and its last decision"""
+    target_ms = GOVERNOR_CONFIG['target_ms']
+    text = (f"Governor: {GOVERNOR_LEVELS[governor['level']]:g}x | frame {governor['frame_ms']:.0f}/{target_ms:g} ms"
+            f" | sim {governor['sim_ms']:.0f} ms")
+    if not GOVERNOR_CONFIG['enabled']:
+        text += " | off"
+    elif governor['last_change'] is not None:
+        tick, old = governor['last_change']
+        text += f" | {'down' if governor['level'] < old else 'up'} from {GOVERNOR_LEVELS[old]:g}x at tick {tick}"
+    color = "orange" if governor['frame_ms'] > target_ms else "white"
+    hud_text(target, 'governor', text, color, 20, topleft=(10, 185))
+    hud_text(target, 'governor_caps', describe_governor(), color, 20, topleft=(10, 205))
+
+def draw_hud(target):
+    """Status lines, hints and the death screen"""
+    hud_text(target, 'position', f"Position: ({int(player.x)}, {int(player.y)})", "white", 24, topleft=(10, 10))
+    hud_text(target, 'tile', f"Tile: ({int(player.x//TILE_SIZE)}, {int(player.y//TILE_SIZE)})", "white", 24, topleft=(10, 35))
+    hud_text(target, 'traffic', f"Traffic: {len(traffic_vehicles)}/{TRAFFIC_CONFIG['max_cars']}", "cyan", 20, topleft=(10, 60))
+    hud_text(target, 'npcs', f"NPCs: {len(npcs)}/{NPC_CONFIG['max_population']}", "green", 20, topleft=(10, 85))
+    hud_text(target, 'bullets', f"BULLETS: {len(bullets)}", "yellow", 24, topleft=(10, 110))
+    hud_text(target, 'weapon', f"WEAPON: {player_weapon['type']}", "orange", 24, topleft=(10, 135))
+    hud_text(target, 'enemies', f"Enemies: {len(enemies)}", "red", 20, topleft=(10, 160))
+    draw_governor_hud(target)
+    hud_text(target, 'hint', "Press 3 = GUN | CLICK = SHOOT", "yellow", 20, topleft=(10, HEIGHT - 30))
+
+    # Death screen overlay
+    if not game_state['alive']:
+        hud_overlay(target, (255, 0, 0), 128)  # Semi-transparent red
+        hud_text(target, 'death_title', "YOU DIED!", "white", 80, center=(WIDTH // 2, HEIGHT // 2 - 50))
+        hud_text(target, 'death_cause', DEATH_CAUSES[game_state['death_cause']], "white", 40,
+                 center=(WIDTH // 2, HEIGHT // 2 + 20))
+        hud_text(target, 'death_restart', "Restarting...", "yellow", 30, center=(WIDTH // 2, HEIGHT // 2 + 80))
+
+# ============================================
+# RENDERING
+# ============================================
+# In 'native' mode the world is drawn at one pixel per world pixel into a
+# WIDTH/zoom x HEIGHT/zoom backbuffer from unscaled sprites, and the finished
+# frame is scaled up to the window once. 'scaled' mode draws every sprite
+# pre-scaled by the zoom straight to the screen. The HUD is drawn on top at
+# window resolution in both modes.
+#   GAME_RENDER=scaled python game.py    per-sprite scaling
+
+RENDER_CONFIG = {
+    'mode': os.environ.get('GAME_RENDER', 'native'),  # 'native' or 'scaled'
+    'upscale': 'nearest',   # 'nearest', or 'scale2x' to smooth edges at exactly 2x zoom
+}
+
+render_buffers = {}  # 'back' / 'upscaled' -> Surface, replaced when the zoom changes its size
+
+def get_render_buffer(role, width, height):
+    """Reusable display-format surface for role, reallocated only on a size change"""
+    surface = render_buffers.get(role)
+    if surface is None or surface.get_size() != (width, height):
+        surface = pygame.Surface((width, height))
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()
+        render_buffers[role] = surface
+    return surface
+
+def get_backbuffer(zoom):
+    """Backbuffer covering the view at this zoom - rounded up to whole pixels"""
+    return get_render_buffer('back', math.ceil(WIDTH / zoom), math.ceil(HEIGHT / zoom))
+
+def present_backbuffer(backbuffer, zoom):
+    """Scale the finished backbuffer to the window in one pass"""
+    target = screen.surface
+    width, height = backbuffer.get_size()
+    if zoom == 2.0 and RENDER_CONFIG['upscale'] == 'scale2x' and (width * 2, height * 2) == target.get_size():
+        pygame.transform.scale2x(backbuffer, target)
+        return
+    
+    # transform.scale is nearest neighbour; non-integer zooms crop the rounded-up edge
+    size = (round(width * zoom), round(height * zoom))
+    if size == target.get_size():
+        pygame.transform.scale(backbuffer, size, target)
+    else:
+        upscaled = get_render_buffer('upscaled', *size)
+        pygame.transform.scale(backbuffer, size, upscaled)
+        target.blit(upscaled, (0, 0))
+
+# ============================================
+# SPRITE BATCHING
+# ============================================
+# Cars, the player, bullets, NPCs and enemies are collected into one list of
+# (surface, position) pairs per frame and submitted with a single
+# Surface.blits(). Screen positions and the on-screen test are computed for
+# a whole entity list at once with numpy, and each distinct sprite is looked
+# up once per frame however many entities show it. Shapes drawn where an
+# image is missing (and the bullets, which are always circles) are cached
+# sprites too, so nothing is rasterised per entity.
+
+def circle_sprite(color, radius):
+    """Cached filled circle, centred at (radius, radius)"""
+    def build():
+        surface = pygame.Surface((radius * 2 + 1, radius * 2 + 1), pygame.SRCALPHA)
+        pygame.draw.circle(surface, color, (radius, radius), radius)
+        return surface
+    return cached_surface(('circle', color, radius), build)
+
+def box_sprite(color, size):
+    """Cached solid square"""
+    def build():
+        surface = pygame.Surface((size, size))
+        surface.fill(color)
+        return surface
+    return cached_surface(('box', color, size), build)
+
+def cull_entities(entities, scale, width, height, margin):
+    """(index, (screen x, screen y)) for the entities within margin of a width x height target"""
+    if not entities:
+        return ()
+    world = np.array([(entity.x, entity.y) for entity in entities], dtype=np.float64)
+    screen_pos = (world - (camera_x, camera_y)) * scale
+    on_screen = ((screen_pos[:, 0] > -margin) & (screen_pos[:, 0] < width + margin) &
+                 (screen_pos[:, 1] > -margin) & (screen_pos[:, 1] < height + margin))
+    indices = np.flatnonzero(on_screen)
+    # astype truncates like int(), matching where single blits used to land
+    return zip(indices.tolist(), screen_pos[indices].astype(np.int64).tolist())
+
+def centred(surface):
+    """(surface, x offset, y offset) placing it centred the way Rect(center=...) does"""
+    return (surface, surface.get_width() // 2, surface.get_height() // 2)
 
 # ============================================
 # MAIN GAME LOOP
 # ============================================
 
 def draw():
-    screen.clear()
-    
     global camera_x, camera_y
     
-    view_width = WIDTH / CAMERA_ZOOM
-    view_height = HEIGHT / CAMERA_ZOOM
+    start = time.perf_counter_ns()
+    zoom = update_zoom()
+    view_width = WIDTH / zoom
+    view_height = HEIGHT / zoom
     
     camera_x = player.x - view_width / 2
     camera_y = player.y - view_height / 2
     
-    camera_x = max(0, min(camera_x, MAP_WIDTH - view_width))
-    camera_y = max(0, min(camera_y, MAP_HEIGHT - view_height))
+    camera_x = max(0, min(camera_x, WORLD_WIDTH - view_width))
+    camera_y = max(0, min(camera_y, WORLD_HEIGHT - view_height))
     
-    start_tile_x = max(0, int(camera_x // TILE_SIZE) - 1)
-    end_tile_x = min(MAP_TILES_WIDTH, int((camera_x + view_width) // TILE_SIZE) + 2)
-    start_tile_y = max(0, int(camera_y // TILE_SIZE) - 1)
-    end_tile_y = min(MAP_TILES_HEIGHT, int((camera_y + view_height) // TILE_SIZE) + 2)
+    move_x, move_y = update_streaming(camera_x, camera_y, view_width, view_height)
+    t = span('streaming', start, LANE_DRAW)
     
-    # Draw tiles
-    for tile_y in range(start_tile_y, end_tile_y):
-        for tile_x in range(start_tile_x, end_tile_x):
-            tile_data = map_grid[tile_y][tile_x]
-            
-            world_x = tile_x * TILE_SIZE
-            world_y = tile_y * TILE_SIZE
-            screen_x = (world_x - camera_x) * CAMERA_ZOOM
-            screen_y = (world_y - camera_y) * CAMERA_ZOOM
-            
-            if '|rot' in tile_data:
-                parts = tile_data.split('|rot')
-                tile_name = parts[0]
-                rotation = int(parts[1])
-            else:
-                tile_name = tile_data
-                rotation = 0
-            
-            try:
-                img = get_rotated_image(tile_name, rotation)
-                if img:
-                    scaled_img = pygame.transform.scale(img, 
-                        (int(img.get_width() * CAMERA_ZOOM) + 1, int(img.get_height() * CAMERA_ZOOM) + 1))
-                    screen.blit(scaled_img, (int(screen_x), int(screen_y)))
-            except:
-                if 'road' in tile_name:
-                    screen.draw.filled_rect(Rect(int(screen_x), int(screen_y), int(TILE_SIZE * CAMERA_ZOOM) + 1, int(TILE_SIZE * CAMERA_ZOOM) + 1), (60, 60, 60))
-                elif 'sidewalk' in tile_name:
-                    screen.draw.filled_rect(Rect(int(screen_x), int(screen_y), int(TILE_SIZE * CAMERA_ZOOM) + 1, int(TILE_SIZE * CAMERA_ZOOM) + 1), (100, 100, 110))
-                elif 'grass' in tile_name:
-                    screen.draw.filled_rect(Rect(int(screen_x), int(screen_y), int(TILE_SIZE * CAMERA_ZOOM) + 1, int(TILE_SIZE * CAMERA_ZOOM) + 1), (60, 140, 60))
-    
-    # Draw objects
-    for obj in map_objects:
-        world_x = obj['x']
-        world_y = obj['y']
-        screen_x = (world_x - camera_x) * CAMERA_ZOOM
-        screen_y = (world_y - camera_y) * CAMERA_ZOOM
+    if RENDER_CONFIG['mode'] == 'native':
+        # Snap to whole world pixels so the upscaled frame stays crisp
+        camera_x = float(int(camera_x))
+        camera_y = float(int(camera_y))
+        update_baking(camera_x, camera_y, view_width, view_height, move_x, move_y)
+        t = span('baking', t, LANE_DRAW)
+        backbuffer = get_backbuffer(zoom)
+        backbuffer.fill((0, 0, 0))
+        draw_world(backbuffer, 1.0)
+        t = span('draw_world', t, LANE_DRAW)
+        present_backbuffer(backbuffer, zoom)
+        t = span('present', t, LANE_DRAW)
+    else:
+        screen.clear()
+        draw_world(screen.surface, zoom)
+        t = span('draw_world', t, LANE_DRAW)
+    
+    # UI
+    draw_hud(screen.surface)
+    span('hud', t, LANE_DRAW)
+    governor['draw_seconds'] = (span('draw', start, LANE_DRAW) - start) / 1e9
+    hitch['drawn'] = telemetry['frames']
+
+def draw_world(target, scale):
+    """Draw the world around the camera into target at scale pixels per world pixel"""
+    target_width, target_height = target.get_size()
+    view_width = target_width / scale
+    view_height = target_height / scale
+    margin = 100 * scale  # Off-screen slack for sprites centred just outside the view
+    start = time.perf_counter_ns()
+    
+    # Ground and static objects come pre-baked per chunk when every visible chunk is ready
+    if not (scale == 1.0 and BAKE_CONFIG['enabled'] and draw_baked_chunks(target)):
+        start_tile_x = max(0, int(camera_x // TILE_SIZE) - 1)
+        end_tile_x = min(WORLD_TILES_WIDTH, int((camera_x + view_width) // TILE_SIZE) + 2)
+        start_tile_y = max(0, int(camera_y // TILE_SIZE) - 1)
+        end_tile_y = min(WORLD_TILES_HEIGHT, int((camera_y + view_height) // TILE_SIZE) + 2)
         
-        if -200 < screen_x < WIDTH + 200 and -200 < screen_y < HEIGHT + 200:
-            try:
-                img = pygame.image.load(f'images/{obj["name"]}.png')
-                scaled_img = pygame.transform.scale(img,
-                    (int(img.get_width() * CAMERA_ZOOM), int(img.get_height() * CAMERA_ZOOM)))
-                screen.blit(scaled_img, (screen_x - scaled_img.get_width()//2, screen_y - scaled_img.get_height()//2))
-            except:
-                if 'building' in obj['name'] or 'house' in obj['name'] or 'shop' in obj['name']:
-                    screen.draw.filled_rect(Rect(screen_x-25*CAMERA_ZOOM, screen_y-40*CAMERA_ZOOM, 50*CAMERA_ZOOM, 80*CAMERA_ZOOM), (120, 100, 100))
-                elif 'tree' in obj['name']:
-                    screen.draw.filled_circle((int(screen_x), int(screen_y)), int(8*CAMERA_ZOOM), (50, 150, 50))
+        # Draw tiles
+        for tile_y in range(start_tile_y, end_tile_y):
+            for tile_x in range(start_tile_x, end_tile_x):
+                screen_x = (tile_x * TILE_SIZE - camera_x) * scale
+                screen_y = (tile_y * TILE_SIZE - camera_y) * scale
+                tile_name, rotation = split_tile(get_tile(tile_x, tile_y))
+                img = get_surface(tile_name, rotation, scale)
+                if img:
+                    target.blit(img, (int(screen_x), int(screen_y)))
                 else:
-                    screen.draw.filled_rect(Rect(screen_x-5*CAMERA_ZOOM, screen_y-5*CAMERA_ZOOM, 10*CAMERA_ZOOM, 10*CAMERA_ZOOM), (150, 150, 150))
-    
-    # Draw traffic cars
-    for car in traffic_vehicles:
-        world_x = car['x']
-        world_y = car['y']
-        screen_x = (world_x - camera_x) * CAMERA_ZOOM
-        screen_y = (world_y - camera_y) * CAMERA_ZOOM
+                    fill_missing_tile(target, tile_name, screen_x, screen_y, scale)
         
-        if -200 < screen_x < WIDTH + 200 and -200 < screen_y < HEIGHT + 200:
-            try:
-                img = pygame.image.load(f'images/{car["name"]}.png')
-                scaled_img = pygame.transform.scale(img,
-                    (int(img.get_width() * CAMERA_ZOOM), int(img.get_height() * CAMERA_ZOOM)))
-                rotated_car = pygame.transform.rotate(scaled_img, car['angle'])
-                car_rect = rotated_car.get_rect(center=(int(screen_x), int(screen_y)))
-                screen.blit(rotated_car, car_rect)
-            except:
-                 screen.draw.filled_rect(Rect(screen_x-10*CAMERA_ZOOM, screen_y-10*CAMERA_ZOOM, 20*CAMERA_ZOOM, 20*CAMERA_ZOOM), (200, 50, 50))
-
-    # Draw player
+        # Draw objects
+        for obj in visible_objects(camera_x, camera_y, view_width, view_height):
+            screen_x = (obj['x'] - camera_x) * scale
+            screen_y = (obj['y'] - camera_y) * scale
+            if -margin < screen_x < target_width + margin and -margin < screen_y < target_height + margin:
+                draw_object(target, obj, screen_x, screen_y, scale)
+    
+    t = span('ground', start, LANE_DRAW)
+    
+    # Dynamic sprites, in draw order, submitted in one blits() call
+    batch = []
+    
+    # Traffic cars
+    cars = traffic_vehicles.items
+    car_sprites = {}  # (name, angle) -> centred sprite, this frame
+    for index, (screen_x, screen_y) in cull_entities(cars, scale, target_width, target_height, margin):
+        car = cars[index]
+        key = (car.name, car.angle)
+        sprite = car_sprites.get(key)
+        if sprite is None:
+            img = get_car_sprite(car.name, car.angle, scale) or box_sprite((200, 50, 50), int(20 * scale))
+            sprite = car_sprites[key] = centred(img)
+        batch.append((sprite[0], (screen_x - sprite[1], screen_y - sprite[2])))
+    
+    # Player
+    center = (target_width // 2, target_height // 2)
     try:
-        state = player_animation['state']
-        direction = player_animation['direction']
-        frame = player_animation['current_frame']
-        
-        player_img = get_player_frame(state, direction, frame)
-        
-        if player_img:
-            # Get frame size and scale based on animation type
-            frame_size = FRAME_SIZES.get(state, 64)
-
-            player_scale = 0.6
-            
-            scaled_player = pygame.transform.scale(player_img,
-                (int(frame_size * CAMERA_ZOOM * player_scale), int(frame_size * CAMERA_ZOOM * player_scale)))
-            player_rect = scaled_player.get_rect(center=(WIDTH // 2, HEIGHT // 2))
-            screen.blit(scaled_player, player_rect)
-        else:
-            screen.draw.filled_circle((WIDTH // 2, HEIGHT // 2), int(10*CAMERA_ZOOM), (255, 255, 0))
-    except Exception as e:
-        screen.draw.filled_circle((WIDTH // 2, HEIGHT // 2), int(10*CAMERA_ZOOM), (255, 255, 0))
+        scaled_player = get_player_frame(player_animation['state'], player_animation['direction'],
+                                         player_frame(), scale * 0.6)
+    except Exception:
+        scaled_player = None
+    img, offset_x, offset_y = centred(scaled_player or circle_sprite((255, 255, 0), int(10*scale)))
+    batch.append((img, (center[0] - offset_x, center[1] - offset_y)))
     
-    # Draw gun if equipped - ADD THIS NEW SECTION
+    # Gun
     if player_weapon['type'] == 'gun' and GUN_CONFIG['image']:
-        try:
-            direction = player_animation['direction']
-            gun_img = get_rotated_gun(direction)
-            
-            if gun_img:
-                # Scale gun
-                gun_width = int(gun_img.get_width() * CAMERA_ZOOM * GUN_CONFIG['scale'])
-                gun_height = int(gun_img.get_height() * CAMERA_ZOOM * GUN_CONFIG['scale'])
-                scaled_gun = pygame.transform.scale(gun_img, (gun_width, gun_height))
-                
-                # Get offset position
-                offset_x, offset_y = get_gun_offset(direction)
-                
-                # Calculate gun position (centered on player + offset)
-                gun_x = WIDTH // 2 + (offset_x * CAMERA_ZOOM)
-                gun_y = HEIGHT // 2 + (offset_y * CAMERA_ZOOM)
-                
-                gun_rect = scaled_gun.get_rect(center=(gun_x, gun_y))
-                screen.blit(scaled_gun, gun_rect)
-        except Exception as e:
-            pass
-
-    # Draw bullets - ALWAYS DRAW YELLOW CIRCLES
-    for bullet in bullets:
-        world_x = bullet['x']
-        world_y = bullet['y']
-        screen_x = (world_x - camera_x) * CAMERA_ZOOM
-        screen_y = (world_y - camera_y) * CAMERA_ZOOM
-        
-        # Only draw if on screen
-        if -100 < screen_x < WIDTH + 100 and -100 < screen_y < HEIGHT + 100:
-            # Draw bright yellow circle - ALWAYS VISIBLE
-            screen.draw.filled_circle((int(screen_x), int(screen_y)), 8, (255, 255, 0))
-
-
-    # Draw NPCs - ADD THIS NEW SECTION (before drawing player)
-    for npc in npcs:
-        world_x = npc['x']
-        world_y = npc['y']
-        screen_x = (world_x - camera_x) * CAMERA_ZOOM
-        screen_y = (world_y - camera_y) * CAMERA_ZOOM
-        
-        # Only draw if on screen
-        if -200 < screen_x < WIDTH + 200 and -200 < screen_y < HEIGHT + 200:
+        direction = player_animation['direction']
+        gun_scale = scale * GUN_CONFIG['scale']
+        scaled_gun = cached_surface(('gun', direction, gun_scale),
+                                    lambda: scale_surface(get_rotated_gun(direction), gun_scale))
+        if scaled_gun:
+            # Centred on the player plus the per-direction offset
+            offset_x, offset_y = get_gun_offset(direction)
+            gun_rect = scaled_gun.get_rect(center=(center[0] + offset_x * scale, center[1] + offset_y * scale))
+            batch.append((scaled_gun, gun_rect.topleft))
+    
+    # Bullets - one cached yellow circle
+    bullet_radius = max(1, int(4 * scale))
+    bullet_sprite = circle_sprite((255, 255, 0), bullet_radius)
+    for _, (screen_x, screen_y) in cull_entities(bullets.items, scale, target_width, target_height, margin):
+        batch.append((bullet_sprite, (screen_x - bullet_radius, screen_y - bullet_radius)))
+    
+    # NPCs
+    walkers = npcs.items
+    now = timers['now']
+    npc_sprites = {}  # (type, state, direction, frame) -> centred sprite or None, this frame
+    for index, (screen_x, screen_y) in cull_entities(walkers, scale, target_width, target_height, margin):
+        npc = walkers[index]
+        frame = npc_frame(npc, now)
+        key = (npc.type, npc.state, npc.direction, frame)
+        sprite = npc_sprites.get(key, False)
+        if sprite is False:
             try:
-                npc_img = get_npc_frame(npc['type'], npc['state'], npc['direction'], npc['current_frame'])
-                
-                if npc_img:
-                    npc_scale = 0.5  # NPCs slightly smaller than player
-                    scaled_npc = pygame.transform.scale(npc_img,
-                        (int(64 * CAMERA_ZOOM * npc_scale), int(64 * CAMERA_ZOOM * npc_scale)))
-                    npc_rect = scaled_npc.get_rect(center=(int(screen_x), int(screen_y)))
-                    screen.blit(scaled_npc, npc_rect)
-            except:
-                # Fallback - draw circle
-                screen.draw.filled_circle((int(screen_x), int(screen_y)), int(8*CAMERA_ZOOM), (100, 200, 100))
+                img = get_npc_frame(npc.type, npc.state, npc.direction, frame, scale * 0.5)
+            except Exception:
+                img = circle_sprite((100, 200, 100), int(8*scale))
+            sprite = npc_sprites[key] = centred(img) if img else None
+        if sprite:
+            batch.append((sprite[0], (screen_x - sprite[1], screen_y - sprite[2])))
     
-    # UI
-    screen.draw.text(f"Position: ({int(player.x)}, {int(player.y)})", (10, 10), color="white", fontsize=24)
-    screen.draw.text(f"Tile: ({int(player.x//TILE_SIZE)}, {int(player.y//TILE_SIZE)})", (10, 35), color="white", fontsize=24)
-    screen.draw.text(f"Traffic: {len(traffic_vehicles)}/{TRAFFIC_CONFIG['max_cars']}", (10, 60), color="cyan", fontsize=20)
-    screen.draw.text(f"NPCs: {len(npcs)}/{NPC_CONFIG['max_population']}", (10, 85), color="green", fontsize=20)
-    screen.draw.text(f"BULLETS: {len(bullets)}", (10, 110), color="yellow", fontsize=24)
-    screen.draw.text(f"WEAPON: {player_weapon['type']}", (10, 135), color="orange", fontsize=24)
-    screen.draw.text("Press 3 = GUN | CLICK = SHOOT", (10, HEIGHT - 30), color="yellow", fontsize=20)
-
-    # Death screen overlay
-    if not game_state['alive']:
-        # Red overlay
-        overlay = pygame.Surface((WIDTH, HEIGHT))
-        overlay.set_alpha(128)  # Semi-transparent
-        overlay.fill((255, 0, 0))  # Red
-        screen.blit(overlay, (0, 0))
-        
-        # Death text
-        screen.draw.text("YOU DIED!", center=(WIDTH // 2, HEIGHT // 2 - 50), 
-                        color="white", fontsize=80)
-        screen.draw.text("Hit by a car!", center=(WIDTH // 2, HEIGHT // 2 + 20), 
-                        color="white", fontsize=40)
-        screen.draw.text("Restarting...", center=(WIDTH // 2, HEIGHT // 2 + 80), 
-                        color="yellow", fontsize=30)
+    # Enemies
+    hostiles = enemies.items
+    enemy_sprites = {}  # (type, state, direction, frame) -> centred sprite, this frame
+    for index, (screen_x, screen_y) in cull_entities(hostiles, scale, target_width, target_height, margin):
+        enemy = hostiles[index]
+        frame = npc_frame(enemy, now)
+        key = (enemy.type, enemy.state, enemy.direction, frame)
+        sprite = enemy_sprites.get(key)
+        if sprite is None:
+            try:
+                img = get_enemy_frame(enemy.type, enemy.state, enemy.direction, frame, scale * 0.5)
+            except Exception:
+                img = None
+            sprite = enemy_sprites[key] = centred(img or circle_sprite((220, 40, 40), int(8*scale)))
+        batch.append((sprite[0], (screen_x - sprite[1], screen_y - sprite[2])))
+    
+    t = span('sprites', t, LANE_DRAW)
+    target.blits(batch, doreturn=False)
+    span('blits', t, LANE_DRAW)
+    count('sprite_blits', len(batch))
 
 
 def update():
-    global player
-    
-    # Update hurt animation if playing
-    if player_animation['state'] == 'hurt':
-        player_animation['frame_delay'] += 1
-        
-        if player_animation['frame_delay'] >= player_animation['animation_speed']:
-            player_animation['frame_delay'] = 0
-            player_animation['current_frame'] += 1
-            
-            # Hurt animation finished
-            if player_animation['current_frame'] >= FRAME_COUNTS['hurt']:
-                player_animation['current_frame'] = 0
-                # Animation done, keep showing hurt state until restart
+    start = time.perf_counter_ns()
+    keys, clicks = read_input()
+    game_state['tick'] += 1
+    check_hitch(begin_frame(start))
+    hitch_wakeup.set()
+    for pos, button in clicks:
+        handle_mouse_down(pos, button)
+    t = span('input', start)
+    update_autosave()
+    t = span('autosave', t)
+    update_world(keys)
+    t = span('update_world', t)
+    dispatch_events()
+    span('events', t)
+    governor_sample((span('update', start) - start) / 1e9)
+
+def update_world(keys):
+    """Advance every system by one tick"""
+    # One-shot player animation played out - the hurt one still plays while dead
+    ends_at = player_animation['ends_at']
+    if ends_at is not None and game_state['tick'] >= ends_at:
+        player_animation['ends_at'] = None
+        post_event(EVENT_ANIMATION_DONE, 'player', player, player_animation['state'])
     
     # Check if player is alive
     if not game_state['alive']:
-        game_state['death_timer'] += 1
-        if game_state['death_timer'] >= game_state['death_delay']:
+        if game_state['tick'] >= game_state['restart_at']:
             restart_game()
         return  # Don't update anything else when dead
     
+    t = time.perf_counter_ns()
+    advance_timers()
+    t = span('timers', t)
+    
     # Update traffic
     update_traffic()
+    t = span('traffic', t)
 
     # Update NPCs - ADD THIS LINE
+    update_flow_fields()
+    t = span('flow_fields', t)
     update_npcs()
+    rebalance_npcs()
+    t = span('npcs', t)
+    update_enemies()
+    t = span('enemies', t)
     
     # Check collision with cars
-    if check_collision_with_cars():
-        game_state['alive'] = False
-        game_state['death_timer'] = 0
+    car = check_collision_with_cars()
+    t = span('player_collision', t)
+    if car is not None:
+        post_event(EVENT_COLLISION, 'player_car', player, car)
         return
     
     # Weapon equip/unequip
-    if keyboard.k_1:
+    if keys.k_1:
         player_weapon['type'] = 'none'
         player_weapon['shoot_animation_done'] = False
-    if keyboard.k_2:
+    if keys.k_2:
         player_weapon['type'] = 'katana'
         player_weapon['shoot_animation_done'] = False
-    if keyboard.k_3:
+    if keys.k_3:
         player_weapon['type'] = 'gun'
         player_weapon['shoot_animation_done'] = False
-        # Start shoot animation
-        player_animation['state'] = 'shoot'
-        player_animation['current_frame'] = 0
-        player_animation['frame_delay'] = 0
-    
-    # Handle shoot animation (plays once when becoming idle with gun)
-    if player_weapon['type'] == 'gun' and player_animation['state'] == 'shoot' and not player_weapon['shoot_animation_done']:
-        player_animation['frame_delay'] += 1
-        
-        if player_animation['frame_delay'] >= player_animation['animation_speed']:
-            player_animation['frame_delay'] = 0
-            player_animation['current_frame'] += 1
-            
-            # Check if animation finished
-            if player_animation['current_frame'] >= FRAME_COUNTS['shoot']:
-                # Stop at last frame
-                player_animation['current_frame'] = FRAME_COUNTS['shoot'] - 1
-                player_weapon['shoot_animation_done'] = True
+        # Start shoot animation - it stops on the last frame
+        play_player_animation('shoot')
     
     # Update bullets
+    t = time.perf_counter_ns()
     update_bullets()
+    span('bullets', t)
     
-    # Handle katana attack
-    if player_weapon['type'] == 'katana' and player_weapon['attacking']:
-        # Continue attack animation
-        player_animation['frame_delay'] += 1
-        
-        if player_animation['frame_delay'] >= player_animation['animation_speed']:
-            player_animation['frame_delay'] = 0
-            player_animation['current_frame'] += 1
-            
-            # Attack animation finished
-            if player_animation['current_frame'] >= FRAME_COUNTS['slash_katana']:
-                player_weapon['attacking'] = False
-                player_animation['current_frame'] = 0
-    else:
-        # Normal movement (only when not attacking)
+    # Normal movement - not while a katana slash plays out
+    if not (player_weapon['type'] == 'katana' and player_weapon['attacking']):
         moving = False
         dx, dy = 0, 0
         
         # Check if SHIFT is pressed for running
-        is_running = keyboard.lshift or keyboard.rshift
+        is_running = keys.lshift or keys.rshift
         current_speed = player_run_speed if is_running else player_walk_speed
         
-        if keyboard.up:
+        if keys.up:
             dy = -current_speed
             player_animation['direction'] = 'up'
             moving = True
-        if keyboard.down:
+        if keys.down:
             dy = current_speed
             player_animation['direction'] = 'down'
             moving = True
-        if keyboard.left:
+        if keys.left:
             dx = -current_speed
             player_animation['direction'] = 'left'
             moving = True
-        if keyboard.right:
+        if keys.right:
             dx = current_speed
             player_animation['direction'] = 'right'
             moving = True
@@ -2031,12 +5759,20 @@ def update():
             # Standing still (idle)
             if player_weapon['type'] == 'gun':
                 # Play shoot animation once, then stay at last frame
-                if not player_weapon['shoot_animation_done']:
-                    player_animation['state'] = 'shoot'
-                    # Animation will be handled by the shoot animation handler above
+                if not player_weapon['shoot_animation_done'] and player_animation['state'] != 'shoot':
+                    play_player_animation('shoot')
             else:
                 update_player_animation('idle', player_animation['direction'])
 
+        # Slide along walls - drop the blocked axis of a diagonal step
+        if moving and player_step_blocked(dx, dy):
+            if dx and dy and not player_step_blocked(dx, 0):
+                dy = 0
+            elif dx and dy and not player_step_blocked(0, dy):
+                dx = 0
+            else:
+                moving = False
+        
         # Apply movement
         if moving:
             new_x = player.x + dx
@@ -2044,14 +5780,40 @@ def update():
 
             # Check car collision AND NPC collision BEFORE moving
             if not check_player_car_collision(new_x, new_y) and not check_npc_player_collision(new_x, new_y):
-                if 0 < new_x < MAP_WIDTH:
+                if 0 < new_x < WORLD_WIDTH:
                     player.x = new_x
-                if 0 < new_y < MAP_HEIGHT:
+                if 0 < new_y < WORLD_HEIGHT:
                     player.y = new_y
 
 
 
 def on_mouse_down(pos, button):
+    """Queue mouse clicks - they are handled (and recorded) at the next tick"""
+    if button in (mouse.WHEEL_UP, mouse.WHEEL_DOWN):
+        # Zoom is view-only, so it is not part of the recorded input
+        change_zoom(1 if button == mouse.WHEEL_UP else -1)
+    elif replay['mode'] != 'replay':
+        pending_clicks.append((int(pos[0]), int(pos[1]), int(button)))
+
+def on_key_down(key):
+    """Zoom, quick save and load, telemetry dump"""
+    if key in (keys.EQUALS, keys.PLUS, keys.KP_PLUS):
+        change_zoom(ZOOM_STEP)
+    elif key in (keys.MINUS, keys.KP_MINUS):
+        change_zoom(-ZOOM_STEP)
+    elif key == keys.F5:
+        save_game(SAVE_CONFIG['quicksave_path'])
+        print(f"Saved {SAVE_CONFIG['quicksave_path']} ({save_state['last_save_ms']:.2f} ms)")
+    elif key == keys.F9:
+        # Loading would desync a recording or replay from its input
+        if replay['mode'] is not None:
+            print("Loading is disabled while recording or replaying")
+        else:
+            load_game(SAVE_CONFIG['quicksave_path'])
+    elif key == keys.F10:
+        dump_telemetry(TELEMETRY_CONFIG['dump_path'])
+
+def handle_mouse_down(pos, button):
     """Handle mouse clicks"""
     # Don't shoot if dead
     if not game_state['alive']:
@@ -2061,18 +5823,1127 @@ def on_mouse_down(pos, button):
         if player_weapon['type'] == 'katana' and not player_weapon['attacking']:
             # Start katana attack
             player_weapon['attacking'] = True
-            player_animation['state'] = 'slash_katana'
-            player_animation['current_frame'] = 0
-            player_animation['frame_delay'] = 0
+            play_player_animation('slash_katana')
         
         elif player_weapon['type'] == 'gun':
             # Shoot bullet
             spawn_bullet()
             # Reset shoot animation to play again
             player_weapon['shoot_animation_done'] = False
-            player_animation['state'] = 'shoot'
-            player_animation['current_frame'] = 0
-            player_animation['frame_delay'] = 0
+            play_player_animation('shoot')
+
+
+# ============================================
+# BENCHMARKS
+# ============================================
+# Run with: GAME_BENCHMARK=1 python game.py
+
+def benchmark_entities(count=10000, rounds=20):
+    """Compare per-entity memory and attribute access: slotted classes vs dicts"""
+    import timeit
+    import tracemalloc
+
+    def make_slotted():
+        return [NPC('npc1', float(i), float(i), DIR_DOWN) for i in range(count)]
+
+    def make_dicts():
+        return [{field: getattr(npc, field) for field in NPC.__slots__}
+                for npc in make_slotted()]
+
+    def measure_memory(factory):
+        tracemalloc.start()
+        entities = factory()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        return entities, size / count
+
+    slotted, slotted_bytes = measure_memory(make_slotted)
+    dicts, dict_bytes = measure_memory(make_dicts)
+
+    def step_slotted():
+        for npc in slotted:
+            npc.x += npc.y + 1.0
+            npc.y += 1
+
+    def step_dicts():
+        for npc in dicts:
+            npc['x'] += npc['y'] + 1.0
+            npc['y'] += 1
+
+    slotted_time = min(timeit.repeat(step_slotted, number=1, repeat=rounds))
+    dict_time = min(timeit.repeat(step_dicts, number=1, repeat=rounds))
+
+    print(f"[bench] entities x{count}")
+    print(f"  memory/entity : slots {slotted_bytes:7.1f} B | dict {dict_bytes:7.1f} B")
+    print(f"  update pass   : slots {slotted_time * 1000:7.2f} ms | dict {dict_time * 1000:7.2f} ms")
+
+def benchmark_pools(population=5000, churn=500, ticks=200):
+    """Heavy spawn/kill churn: pooled swap-remove vs list.remove on a copy"""
+    import time
+    rng = random.Random(0)
+
+    pool = EntityPool(Bullet)
+    for _ in range(population):
+        pool.spawn(0.0, 0.0, 1.0, 0.0, 0, 0)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        items = pool.items
+        for i in range(len(items) - 1, -1, -1):
+            if rng.random() < churn / population:
+                pool.despawn(items[i])
+        while len(pool) < population:
+            pool.spawn(0.0, 0.0, 1.0, 0.0, 0, 0)
+    pool_time = time.perf_counter() - start
+
+    plain = [Bullet(0.0, 0.0, 1.0, 0.0, 0, 0) for _ in range(population)]
+    allocations = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for bullet in plain[:]:
+            if rng.random() < churn / population:
+                plain.remove(bullet)
+        while len(plain) < population:
+            plain.append(Bullet(0.0, 0.0, 1.0, 0.0, 0, 0))
+            allocations += 1
+    list_time = time.perf_counter() - start
+
+    print(f"[bench] pools: {population} live, ~{churn} kills/tick, {ticks} ticks")
+    print(f"  per tick      : pool {pool_time / ticks * 1000:7.2f} ms | list {list_time / ticks * 1000:7.2f} ms")
+    print(f"  objects made  : pool {pool.allocated - population:7d}    | list {allocations:7d}")
+
+def benchmark_spawning(count=10000):
+    """Sidewalk spawn positions from the index vs the old rejection sampling, and a full bulk spawn"""
+    import time
+
+    rng_old = random.Random(0)
+    start = time.perf_counter()
+    attempts = 0
+    found = 0
+    for _ in range(count):
+        for _ in range(50):
+            attempts += 1
+            if is_on_sidewalk(rng_old.randint(100, MAP_WIDTH - 100), rng_old.randint(100, MAP_HEIGHT - 100)):
+                found += 1
+                break
+    rejection_time = time.perf_counter() - start
+
+    # The same zone-weighted draw spawn_npcs() makes, positions only
+    start = time.perf_counter()
+    zones = rng.choices(sidewalk_index['zones'], cum_weights=sidewalk_index['cum_weights'], k=count)
+    for zone in zones:
+        random_sidewalk_position(zone)
+    index_time = time.perf_counter() - start
+
+    npcs.clear()
+    start = time.perf_counter()
+    spawn_npcs(count)
+    spawn_time = time.perf_counter() - start
+    spawned = len(npcs)
+    initialize_npcs()
+
+    print(f"[bench] spawning {count} NPCs")
+    print(f"  positions     : index {index_time * 1000:7.2f} ms | rejection {rejection_time * 1000:7.2f} ms, "
+          f"{found} found in {attempts} tile tests")
+    print(f"  spawn_npcs    : {spawn_time * 1000:7.2f} ms, {spawned} NPCs with their timers and spawn events")
+
+def benchmark_pathfinding(queries=200):
+    """Long-distance walking routes: HPA* cold/warm vs full-grid BFS"""
+    import time
+    rng = random.Random(0)
+
+    def full_grid_bfs(a, b=None):
+        seen = {a}
+        frontier = deque([a])
+        while frontier:
+            tile = frontier.popleft()
+            if tile == b:
+                break
+            for neighbor in (tile - MAP_TILES_WIDTH, tile + MAP_TILES_WIDTH, tile - 1, tile + 1):
+                if 0 <= neighbor < len(walkable_grid) and walkable_grid[neighbor] and neighbor not in seen:
+                    seen.add(neighbor)
+                    frontier.append(neighbor)
+        return seen
+
+    # Route inside the largest connected sidewalk network so every query has an answer
+    unvisited = {index for index, walkable in enumerate(walkable_grid) if walkable}
+    largest = set()
+    while unvisited:
+        component = full_grid_bfs(unvisited.pop())
+        unvisited -= component
+        if len(component) > len(largest):
+            largest = component
+    tiles = sorted(largest)
+    pairs = [(rng.choice(tiles), rng.choice(tiles)) for _ in range(queries)]
+
+    start = time.perf_counter()
+    pedestrian_paths.build()
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    found = sum(1 for a, b in pairs if pedestrian_paths.find_path(a, b))
+    cold_time = time.perf_counter() - start
+    start = time.perf_counter()
+    for a, b in pairs:
+        pedestrian_paths.find_path(a, b)
+    warm_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for a, b in pairs:
+        full_grid_bfs(a, b)
+    grid_time = time.perf_counter() - start
+
+    print(f"[bench] pathfinding {queries} routes in a {len(tiles)}-tile sidewalk network ({found} found)")
+    print(f"  build         : {build_time * 1000:6.1f} ms at startup, {len(pedestrian_paths.node_tiles)} portals")
+    print(f"  per query     : hpa cold {cold_time / queries * 1000:6.3f} ms | "
+          f"hpa warm {warm_time / queries * 1000:6.3f} ms | full grid {grid_time / queries * 1000:6.3f} ms")
+
+def benchmark_snapshots(count=10000, path='benchmark.sav'):
+    """Save and load a world of `count` NPCs, cars and bullets"""
+    import time
+
+    npcs.clear()
+    traffic_vehicles.clear()
+    bullets.clear()
+    spawn_npcs(count * 6 // 10)
+    for i in range(count * 3 // 10):
+        spawn = TRAFFIC_SPAWN_POINTS[i % len(TRAFFIC_SPAWN_POINTS)]
+        traffic_vehicles.spawn(CAR_TYPES[i % len(CAR_TYPES)], float(spawn['x']), float(spawn['y']), spawn['direction'])
+    for i in range(count - len(npcs) - len(traffic_vehicles)):
+        bullets.spawn(float(i), float(i), 1.0, 0.0, 0.0, 60)
+    before = state_checksum()
+
+    start = time.perf_counter()
+    save_game(path)
+    capture_time = time.perf_counter() - start
+    save_state['writer'].join()
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    loaded = load_game(path)
+    load_time = time.perf_counter() - start
+    size = os.path.getsize(path)
+    round_trip = loaded and state_checksum() == before
+
+    # A bad save must be rejected without touching the world - move away from
+    # the saved state first so a partial load would show
+    with open(path, 'rb') as f:
+        data = f.read()
+    bullets.clear()
+    player.x += TILE_SIZE
+    current = state_checksum()
+    first_car = SAVE_HEADER.size + SAVE_WORLD.size + SAVE_RNG.size + len(npcs) * SAVE_NPC.size
+    corrupt = data[:first_car] + b'\xff' + data[first_car + 1:]  # Unknown car type after all the NPCs
+    rejected = []
+    for bad in (data[:-40], corrupt):
+        with open(path, 'wb') as f:
+            f.write(bad)
+        rejected.append(not load_game(path) and state_checksum() == current)
+    os.remove(path)
+
+    print(f"[bench] snapshot of {count} entities ({size / 1024:.0f} KiB)")
+    print(f"  save          : {capture_time * 1000:7.2f} ms on the main thread, {write_time * 1000:7.2f} ms until written")
+    print(f"  load          : {load_time * 1000:7.2f} ms, round trip {'ok' if round_trip else 'MISMATCH'}")
+    print(f"  bad saves     : truncated {'rejected, world unchanged' if rejected[0] else 'CHANGED THE WORLD'}, "
+          f"corrupt {'rejected, world unchanged' if rejected[1] else 'CHANGED THE WORLD'}")
+
+def benchmark_streaming(frames=300, speed=32):
+    """Fly the camera out of the city at `speed` px per 60 Hz frame, with and without prefetching"""
+    import time
+
+    view_width = WIDTH / CAMERA_ZOOM
+    view_height = HEIGHT / CAMERA_ZOOM
+    saved_position = (player.x, player.y)
+    known_sizes = len(object_sizes)
+    start = time.perf_counter()
+    for cx in range(20):
+        generate_chunk(100 + cx, 100)
+    generate_time = (time.perf_counter() - start) / 20
+    print(f"[bench] streaming {frames} frames at {speed} px/frame ({WORLD_TILES_WIDTH}x{WORLD_TILES_HEIGHT} tiles, "
+          f"{CHUNK_SIZE}-tile chunks, {generate_time * 1000:.2f} ms per generated chunk)")
+
+    for prefetch in (WORLD_CONFIG['prefetch_chunks'], -1):
+        while chunk_requested:
+            collect_ready_chunks()
+            time.sleep(0.001)
+        chunk_cache.clear()
+        chunk_stats.update(hits=0, sync_loads=0, prefetched=0, evicted=0)
+        streaming['last_x'] = None
+        player.x, player.y = MAP_WIDTH / 2, MAP_HEIGHT / 2
+        timings = []
+        for _ in range(frames):
+            frame_start = time.perf_counter()
+            player.x += speed
+            player.y += speed / 2
+            view_x = player.x - view_width / 2
+            view_y = player.y - view_height / 2
+            if prefetch >= 0:
+                update_streaming(view_x, view_y, view_width, view_height)
+            columns, rows = chunk_range(view_x, view_y, view_width, view_height, margin=1)
+            for cy in rows:
+                for cx in columns:
+                    get_chunk(cx, cy)
+            elapsed = time.perf_counter() - frame_start
+            timings.append(elapsed)
+            time.sleep(max(0.0, 1 / 60 - elapsed))  # Leave the worker the rest of the frame
+        timings.sort()
+        label = 'prefetch' if prefetch >= 0 else 'on demand'
+        print(f"  {label:<14}: p95 {timings[int(frames * 0.95)] * 1000:6.2f} ms, max {timings[-1] * 1000:6.2f} ms, "
+              f"{chunk_stats['sync_loads']} sync loads, {chunk_stats['prefetched']} prefetched, "
+              f"{len(chunk_cache)} chunks cached, {chunk_stats['evicted']} evicted")
+    # Chunks must not resolve sprite sizes themselves - the worker would write shared dicts
+    print(f"  object sizes  : {known_sizes} resolved up front, {len(object_sizes) - known_sizes} added while streaming")
+
+    player.x, player.y = saved_position
+    streaming['last_x'] = None
+
+def benchmark_surface_cache(budgets=(8 * 1024 * 1024, SURFACE_CACHE_CONFIG['budget_bytes'])):
+    """Look up every visible tile/object sprite while zooming in and out, cached vs loading per frame"""
+    import time
+
+    def frame_assets(zoom):
+        view_width = WIDTH / zoom
+        view_height = HEIGHT / zoom
+        left = MAP_WIDTH / 2 - view_width / 2
+        top = MAP_HEIGHT / 2 - view_height / 2
+        assets = set()
+        for tile_y in range(int(top // TILE_SIZE), int((top + view_height) // TILE_SIZE) + 2):
+            for tile_x in range(int(left // TILE_SIZE), int((left + view_width) // TILE_SIZE) + 2):
+                name, _, rotation = get_tile(tile_x, tile_y).partition('|rot')
+                assets.add((name, int(rotation or 0)))
+        for obj in visible_objects(left, top, view_width, view_height):
+            assets.add((obj['name'], 0))
+        return assets
+
+    sweep = list(range(len(ZOOM_LEVELS))) + list(range(len(ZOOM_LEVELS) - 1, -1, -1))
+    frames = [(ZOOM_LEVELS[level], frame_assets(ZOOM_LEVELS[level])) for level in sweep * 2]
+    lookups = sum(len(assets) for _, assets in frames)
+
+    print(f"[bench] surface cache, {len(frames)} frames sweeping {ZOOM_LEVELS[0]}x-{ZOOM_LEVELS[-1]}x, {lookups} lookups")
+    saved_budget = SURFACE_CACHE_CONFIG['budget_bytes']
+    for budget in budgets:
+        SURFACE_CACHE_CONFIG['budget_bytes'] = budget
+        surface_cache.clear()
+        surface_cache_stats.update(hits=0, misses=0, evictions=0, failures=0, bytes=0)
+        peak = 0
+        start = time.perf_counter()
+        for zoom, assets in frames:
+            for name, rotation in assets:
+                get_surface(name, rotation, zoom)
+            peak = max(peak, surface_cache_stats['bytes'])
+        cached_time = time.perf_counter() - start
+        stats = surface_cache_stats
+        print(f"  {budget >> 20:3d} MiB cache : {cached_time / len(frames) * 1000:7.3f} ms/frame, "
+              f"{stats['hits'] / max(1, stats['hits'] + stats['misses']):.1%} hits, {stats['evictions']} evictions, "
+              f"peak {peak / 1048576:.1f} MiB")
+    SURFACE_CACHE_CONFIG['budget_bytes'] = saved_budget
+    surface_cache.clear()
+    surface_cache_stats.update(hits=0, misses=0, evictions=0, failures=0, bytes=0)
+
+    start = time.perf_counter()
+    for zoom, assets in frames[:10]:
+        for name, rotation in assets:
+            try:
+                image = pygame.transform.rotate(pygame.image.load(f'images/{name}.png'), rotation)
+                pygame.transform.scale(image, (int(image.get_width() * zoom), int(image.get_height() * zoom)))
+            except (pygame.error, FileNotFoundError):
+                pass
+    uncached_time = (time.perf_counter() - start) * len(frames) / 10
+
+    print(f"  load per frame: {uncached_time / len(frames) * 1000:7.3f} ms/frame")
+
+    # A slow build on a bake thread must not hold up lookups, and racing builds share one result
+    def slow_build(seconds):
+        time.sleep(seconds)
+        return pygame.Surface((4, 4), pygame.SRCALPHA)
+
+    cached_surface(('bench_hit', 0, 1.0), lambda: slow_build(0))
+    builder = threading.Thread(target=cached_surface, args=(('bench_slow', 0, 1.0), lambda: slow_build(0.05)))
+    builder.start()
+    time.sleep(0.005)
+    worst = 0.0
+    while builder.is_alive():
+        start = time.perf_counter()
+        cached_surface(('bench_hit', 0, 1.0), None)
+        worst = max(worst, time.perf_counter() - start)
+    builder.join()
+    results = []
+    racers = [threading.Thread(target=lambda: results.append(cached_surface(('bench_race', 0, 1.0),
+                                                                           lambda: slow_build(0.01))))
+              for _ in range(8)]
+    for racer in racers:
+        racer.start()
+    for racer in racers:
+        racer.join()
+    print(f"  during a 50 ms build: {worst * 1000:7.3f} ms worst lookup | "
+          f"{len(racers)} racing builds -> {len({id(surface) for surface in results})} surface kept")
+    surface_cache.clear()
+    surface_cache_stats.update(hits=0, misses=0, evictions=0, failures=0, bytes=0)
+
+def benchmark_car_sprites(cars=80, frames=100, zoom=CAMERA_ZOOM):
+    """Car sprite per visible car per frame: heading table lookup vs rotating on the fly"""
+    import time
+
+    angles = [(CAR_TYPES[i % len(CAR_TYPES)], (i * 37.0) % 360) for i in range(cars)]
+    get_surface(CAR_TYPES[0])
+    start = time.perf_counter()
+    for _ in range(frames):
+        for name, angle in angles:
+            get_car_sprite(name, angle, zoom)
+    lookup_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(frames // 10):
+        for name, angle in angles:
+            image = get_surface(name)
+            if image:
+                scaled = pygame.transform.scale(image, (int(image.get_width() * zoom), int(image.get_height() * zoom)))
+                pygame.transform.rotate(scaled, angle)
+    rotate_time = (time.perf_counter() - start) * 10
+
+    print(f"[bench] {cars} car sprites x {frames} frames ({CAR_HEADINGS} headings)")
+    print(f"  heading table : {lookup_time / frames * 1000:7.3f} ms/frame")
+    print(f"  rotate        : {rotate_time / frames * 1000:7.3f} ms/frame")
+
+def benchmark_hud(frames=600):
+    """HUD with the player walking and the death screen up, cached slots vs pgzero text every frame"""
+    import time
+    import pgzero.ptext
+
+    target = pygame.Surface((WIDTH, HEIGHT))
+    saved = (player.x, player.y, game_state['alive'])
+    game_state['alive'] = False
+    hud_slots.clear()
+    hud_stats.update(renders=0, blits=0)
+    start = time.perf_counter()
+    for frame in range(frames):
+        player.x = 500 + frame // 4
+        draw_hud(target)
+    cached_time = time.perf_counter() - start
+    renders = hud_stats['renders']
+
+    start = time.perf_counter()
+    for frame in range(frames // 10):
+        for text, color, size, position in ((f"Position: ({500 + frame}, 500)", "white", 24, (10, 10)),
+                                            ("Tile: (27, 27)", "white", 24, (10, 35)),
+                                            ("Traffic: 40/80", "cyan", 20, (10, 60)),
+                                            ("NPCs: 200/200", "green", 20, (10, 85)),
+                                            ("BULLETS: 0", "yellow", 24, (10, 110)),
+                                            ("WEAPON: gun", "orange", 24, (10, 135)),
+                                            ("Press 3 = GUN | CLICK = SHOOT", "yellow", 20, (10, HEIGHT - 30)),
+                                            ("YOU DIED!", "white", 80, (WIDTH // 2, HEIGHT // 2 - 50)),
+                                            ("Hit by a car!", "white", 40, (WIDTH // 2, HEIGHT // 2 + 20)),
+                                            ("Restarting...", "yellow", 30, (WIDTH // 2, HEIGHT // 2 + 80))):
+            pgzero.ptext.draw(text, position, surf=target, color=color, fontsize=size)
+        overlay = pygame.Surface((WIDTH, HEIGHT))
+        overlay.set_alpha(128)
+        overlay.fill((255, 0, 0))
+        target.blit(overlay, (0, 0))
+    uncached_time = (time.perf_counter() - start) * 10
+    player.x, player.y, game_state['alive'] = saved
+
+    print(f"[bench] HUD, {frames} frames")
+    print(f"  cached slots  : {cached_time / frames * 1000:7.3f} ms/frame, {renders} text renders")
+    print(f"  text per frame: {uncached_time / frames * 1000:7.3f} ms/frame")
+
+def benchmark_events(ticks=1000, per_tick=100):
+    """Queue and batch-dispatch events vs calling the handler directly"""
+    import time
+
+    received = []
+    def handler(batch):
+        received.append(len(batch))
+    def direct(kind, x, y):
+        received.append(1)
+
+    saved_subscribers = event_subscribers[EVENT_DESPAWN]
+    event_subscribers[EVENT_DESPAWN] = [handler]
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for i in range(per_tick):
+            post_event(EVENT_DESPAWN, 'bullet', float(i), 0.0)
+        dispatch_events()
+    bus_time = time.perf_counter() - start
+    event_subscribers[EVENT_DESPAWN] = saved_subscribers
+
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for i in range(per_tick):
+            direct('bullet', float(i), 0.0)
+    direct_time = time.perf_counter() - start
+
+    print(f"[bench] events, {ticks} ticks x {per_tick} events")
+    print(f"  event bus     : {bus_time / ticks * 1000:7.3f} ms/tick ({bus_time / (ticks * per_tick) * 1e9:.0f} ns/event)")
+    print(f"  direct calls  : {direct_time / ticks * 1000:7.3f} ms/tick")
+
+def benchmark_timers(populations=(1000, 10000, 50000), ticks=600):
+    """Per-tick cost of NPC decision timers: timer wheel vs a countdown stepped on every entity"""
+    import time
+    rng = random.Random(0)
+    interval = NPC_CONFIG['decision_interval']
+    saved_handler = timer_handlers[TIMER_DECIDE]
+    saved_now = timers['now']
+    saved_slots = [slot[:] for slot in timer_slots]
+    print(f"[bench] timers, {ticks} ticks, a decision every ~{interval} ticks per entity")
+    for population in populations:
+        fired = 0
+        def decide(npc):
+            nonlocal fired
+            fired += 1
+            schedule_timer(npc, TIMER_DECIDE, rng.randint(interval // 2, interval * 3 // 2))
+        timer_handlers[TIMER_DECIDE] = decide
+        reset_timers()
+        pool = EntityPool(NPC)
+        for _ in range(population):
+            schedule_timer(pool.spawn('npc1', 0.0, 0.0, DIR_DOWN), TIMER_DECIDE, rng.randrange(1, interval))
+        start = time.perf_counter()
+        for _ in range(ticks):
+            advance_timers()
+        wheel_time = time.perf_counter() - start
+
+        countdowns = [rng.randrange(1, interval) for _ in range(population)]
+        counted = 0
+        start = time.perf_counter()
+        for _ in range(ticks):
+            for i in range(population):
+                countdowns[i] -= 1
+                if countdowns[i] <= 0:
+                    counted += 1
+                    countdowns[i] = rng.randint(interval // 2, interval * 3 // 2)
+        countdown_time = time.perf_counter() - start
+
+        print(f"  {population:6d} NPCs  : wheel {wheel_time / ticks * 1000:7.3f} ms/tick ({fired} fired) | "
+              f"countdowns {countdown_time / ticks * 1000:7.3f} ms/tick ({counted} fired)")
+    timer_handlers[TIMER_DECIDE] = saved_handler
+    reset_timers(saved_now)
+    for slot, entries in zip(timer_slots, saved_slots):
+        slot.extend(entries)
+
+def benchmark_animation(population=10000, visible=200, ticks=600):
+    """Animation cost per tick: frame counters stepped on every NPC vs frames from the clock at draw time"""
+    import time
+    walkers = [NPC('npc1', 0.0, 0.0, DIR_DOWN) for _ in range(population)]
+    for i, npc in enumerate(walkers):
+        npc.state = i % 4
+    speed = NPC_CONFIG['animation_speed']
+
+    counters = [[0, 0] for _ in walkers]  # frame_delay, current_frame
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for npc, counter in zip(walkers, counters):
+            if npc.state != NPC_STATE_SITTING:
+                counter[0] += 1
+                if counter[0] >= speed:
+                    counter[0] = 0
+                    counter[1] += 1
+                    if counter[1] >= NPC_FRAME_COUNTS[NPC_STATE_NAMES[npc.state]]:
+                        counter[1] = 0
+    counter_time = time.perf_counter() - start
+
+    on_screen = walkers[:visible]
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for npc in on_screen:
+            npc_frame(npc, tick)
+    clock_time = time.perf_counter() - start
+
+    print(f"[bench] animation, {population} NPCs, {visible} on screen, {ticks} ticks")
+    print(f"  counters      : {counter_time / ticks * 1000:7.3f} ms/tick, every NPC in update")
+    print(f"  clock frames  : {clock_time / ticks * 1000:7.3f} ms/tick, on-screen NPCs in draw")
+
+def benchmark_enemies(populations=(100, 500), ticks=240, spread=800):
+    """Enemy AI per tick, and one perception pass for every enemy: batched kNN queries vs naive scans"""
+    import time
+    saved_position = (player.x, player.y)
+    saved_rng = rng.getstate()
+    rng.seed(0)
+    # Middle of the industrial zone
+    player.x, player.y = (MAP_ZONES[1][1] + 45) * TILE_SIZE, MAP_HEIGHT / 2
+
+    def perceive_naive(thinkers):
+        living = [enemy for enemy in enemies.items if enemy.alive]
+        sight = ENEMY_CONFIG['sight_radius']
+        for enemy in thinkers:
+            distance = math.hypot(player.x - enemy.x, player.y - enemy.y)
+            enemy.player_distance = distance if distance <= sight else math.inf
+            best = ENEMY_CONFIG['cover_radius'] ** 2
+            enemy.cover = None
+            for left, top, right, bottom in cover_footprints:
+                dx = (left + right) / 2 - enemy.x
+                dy = (top + bottom) / 2 - enemy.y
+                if dx * dx + dy * dy <= best:
+                    best = dx * dx + dy * dy
+                    enemy.cover = (left, top, right, bottom)
+            radius_sq = ENEMY_CONFIG['ally_radius'] ** 2
+            enemy.allies = sum(1 for other in living if other is not enemy and
+                               (other.x - enemy.x) ** 2 + (other.y - enemy.y) ** 2 <= radius_sq)
+
+    print(f"[bench] enemies, {ticks} ticks, a think every {ENEMY_CONFIG['think_interval']} ticks per enemy")
+    for population in populations:
+        enemies.clear()
+        enemy_ai['thinking'] = []
+        for _ in range(population):
+            x = player.x + rng.uniform(-spread, spread)
+            y = player.y + rng.uniform(-spread, spread)
+            enemy = enemies.spawn(rng.choice(ENEMY_TYPE_NAMES), x, y, DIR_DOWN)
+            schedule_timer(enemy, TIMER_THINK, rng.randint(1, ENEMY_CONFIG['think_interval']))
+            enemy.attack_ready = math.inf  # Nobody lands a hit in the benchmark
+        start = time.perf_counter()
+        for _ in range(ticks):
+            advance_timers()
+            update_enemies()
+        ai_time = time.perf_counter() - start
+
+        index_enemies()
+        thinkers = list(enemies.items)
+        start = time.perf_counter()
+        perceive(thinkers)
+        batched_time = time.perf_counter() - start
+        batched = [(enemy.player_distance, enemy.cover, enemy.allies) for enemy in thinkers]
+        start = time.perf_counter()
+        perceive_naive(thinkers)
+        naive_time = time.perf_counter() - start
+        same = all(math.isclose(distance, enemy.player_distance) and cover == enemy.cover and allies == enemy.allies
+                   for (distance, cover, allies), enemy in zip(batched, thinkers))
+
+        print(f"  {population:4d} enemies : AI {ai_time / ticks * 1000:6.3f} ms/tick | perceive all: "
+              f"batched {batched_time * 1000:7.2f} ms, naive {naive_time * 1000:7.2f} ms "
+              f"({'same' if same else 'DIFFERENT'} results)")
+    player.x, player.y = saved_position
+    rng.setstate(saved_rng)
+    for queue in event_queues:
+        queue.clear()
+    initialize_enemies()
+    for queue in event_queues:
+        queue.clear()
+
+def benchmark_governor(machines=(('slow', 2.0), ('even', 1.0), ('fast', 0.4)), ticks=7200, seed=11):
+    """Governor on a synthetic load - frame time follows the caps with noise - with and without hysteresis"""
+    import time
+    saved_config = dict(GOVERNOR_CONFIG)
+    saved_state = dict(governor)
+    saved_tick = game_state['tick']
+    saved_stats = dict(governor_stats)
+    GOVERNOR_CONFIG['log'] = False
+    # Threshold-only controller: decide every tick, no band between dropping and rising
+    bare = {'raise_below': 1.0, 'patience': 1, 'recover': 1, 'cooldown': 0}
+    
+    print(f"[bench] governor, {ticks} ticks, {GOVERNOR_CONFIG['target_ms']:g} ms budget")
+    for name, cost in machines:
+        for label, overrides in (('hysteresis', {}), ('bare', bare)):
+            GOVERNOR_CONFIG.update(saved_config, log=False, enabled=True, **overrides)
+            noise = random.Random(seed)
+            set_governor_level(GOVERNOR_DEFAULT_LEVEL)
+            governor.update(sim_ms=0.0, frame_ms=0.0, draw_seconds=0.0, over=0, under=0,
+                            hold_until=GOVERNOR_CONFIG['cooldown'])
+            governor_stats.update(drops=0, raises=0)
+            population = float(NPC_CONFIG['max_population'] + TRAFFIC_CONFIG['max_cars'])
+            over = 0
+            start = time.perf_counter()
+            for tick in range(ticks):
+                game_state['tick'] = tick
+                # The population drifts toward the caps, and frames cost time per entity
+                population += (NPC_CONFIG['max_population'] + TRAFFIC_CONFIG['max_cars'] - population) * 0.02
+                frame_ms = (2.0 + population * 0.035) * cost + noise.gauss(0, 1.5)
+                over += frame_ms > GOVERNOR_CONFIG['target_ms']
+                governor_sample(max(frame_ms, 0.0) / 1000)
+            elapsed = time.perf_counter() - start
+            print(f"  {name:4} machine, {label:10}: {GOVERNOR_LEVELS[governor['level']]:4g}x, "
+                  f"{governor_stats['drops'] + governor_stats['raises']:4} changes, "
+                  f"{over / ticks * 100:5.1f}% frames over budget, {elapsed / ticks * 1e6:.2f} us/tick")
+    
+    GOVERNOR_CONFIG.update(saved_config, log=False)
+    set_governor_level(saved_state['level'])
+    GOVERNOR_CONFIG['log'] = saved_config['log']
+    governor.update(saved_state)
+    governor_stats.update(saved_stats)
+    game_state['tick'] = saved_tick
+
+def benchmark_telemetry(frames=TELEMETRY_CONFIG['frames'], spans_per_frame=20):
+    """Cost of recording a frame of spans and counters, and of encoding a full ring"""
+    import time
+    start = time.perf_counter()
+    for _ in range(frames):
+        begin_frame(time.perf_counter_ns())
+        t = time.perf_counter_ns()
+        for _ in range(spans_per_frame):
+            t = span('bench', t)
+        count('bench', 1)
+    record_time = time.perf_counter() - start
+    
+    recorded = recorded_frames()
+    start = time.perf_counter()
+    trace = chrome_trace(recorded)
+    trace_time = time.perf_counter() - start
+    start = time.perf_counter()
+    lines = jsonl_frames(recorded)
+    jsonl_time = time.perf_counter() - start
+    events = len(json.loads(trace)['traceEvents'])
+    
+    print(f"[bench] telemetry, {len(recorded)} frames of {spans_per_frame} spans and "
+          f"{len(telemetry_gauges) + len(telemetry_totals) + 1} counters")
+    print(f"  record        : {record_time / frames * 1e6:7.2f} us/frame")
+    print(f"  chrome trace  : {trace_time * 1000:7.1f} ms, {events} events, {len(trace) / 1024:.0f} KiB")
+    print(f"  jsonl         : {jsonl_time * 1000:7.1f} ms, {len(lines) / 1024:.0f} KiB")
+
+def benchmark_hitches(frames=60, rounds=3, work_ms=4, idle_ms=12, stall_ms=80):
+    """Watchdog cost on normal frames, and the report of a frame with a deliberate stall"""
+    import time
+    def busy(ms):
+        until = time.perf_counter() + ms / 1000
+        total = 0
+        while time.perf_counter() < until:
+            for i in range(1000):
+                total += i
+        return total
+    
+    def stall():
+        busy(stall_ms)
+    
+    def run_frames():
+        """Work time of frames that leave idle time for the flip, like the game loop"""
+        done = 0
+        for _ in range(frames):
+            begin_frame(time.perf_counter_ns())
+            hitch_wakeup.set()
+            done += busy(work_ms)
+            hitch['drawn'] = telemetry['frames']
+            time.sleep(idle_ms / 1000)
+        return done
+    
+    # Rounds alternate so clock drift hits both - best round of each
+    saved_threshold = HITCH_CONFIG['threshold_ms']
+    HITCH_CONFIG['threshold_ms'] = saved_threshold or 50.0
+    sampled_before = len(hitch_samples)
+    plain_work = watched_work = 0
+    for _ in range(rounds):
+        stop_hitch_sampler()
+        plain_work = max(plain_work, run_frames())
+        start_hitch_sampler()
+        watched_work = max(watched_work, run_frames())
+    normal_samples = len(hitch_samples) - sampled_before
+    
+    # One frame with a stall inside its update span
+    begin_frame(time.perf_counter_ns())
+    hitch_wakeup.set()
+    update_start = time.perf_counter_ns()
+    t = span('input', update_start)
+    stall()
+    span('stall', t)
+    span('update', update_start)
+    frame = begin_frame(time.perf_counter_ns())
+    start = time.perf_counter()
+    report = capture_hitch(frame, *frame_work_ns(frame[2]))
+    capture_time = time.perf_counter() - start
+    stop_hitch_sampler()
+    HITCH_CONFIG['threshold_ms'] = saved_threshold
+    
+    hot = report['hot_lines'][0]['line'] if report['hot_lines'] else '-'
+    in_stall = sum(int(line.rsplit(' ', 1)[1]) for line in report['profile'] if 'stall (' in line)
+    print(f"[bench] hitch detector, armed after {HITCH_CONFIG['arm_ms']:g} ms, "
+          f"sampling every {HITCH_CONFIG['sample_ms']:g} ms")
+    print(f"  normal frames : {work_ms} ms of work each, {watched_work / plain_work * 100 - 100:+.1f}% "
+          f"work done with the watchdog, {normal_samples} samples in {frames * rounds} frames")
+    print(f"  {stall_ms} ms stall   : {report['frame_ms']:7.1f} ms frame, {report['samples']} samples, "
+          f"{in_stall} in stall(), hottest {hot}")
+    print(f"  capture       : {capture_time * 1000:7.2f} ms")
+
+def benchmark_traffic(car_limits=(40, 80, 160), ticks=3600, seed=7):
+    """Cars through intersection zones per simulated minute, gridlock despawns and tick cost"""
+    import time
+
+    saved_config = dict(TRAFFIC_CONFIG)
+    saved_position = (player.x, player.y)
+    saved_rng = rng.getstate()
+    player.x, player.y = 1000.0, 900.0  # Middle of the residential grid
+    print(f"[bench] traffic, {ticks} ticks ({ticks / 3600:.1f} simulated minutes at 60 fps)")
+    for limit in car_limits:
+        rng.seed(seed)
+        TRAFFIC_CONFIG['max_cars'] = limit
+        TRAFFIC_CONFIG['spawn_interval'] = 1  # Saturate - the population is held at the limit
+        traffic_vehicles.clear()
+        build_intersection_controllers()
+        reset_timers()
+        before = dict(traffic_stats)
+        elapsed = 0.0
+        population = 0
+        for _ in range(ticks):
+            start = time.perf_counter()
+            advance_timers()
+            update_traffic()
+            elapsed += time.perf_counter() - start
+            dispatch_events()
+            population += len(traffic_vehicles)
+        minutes = ticks / 3600
+        passes = traffic_stats['passes'] - before['passes']
+        stuck = traffic_stats['stuck'] - before['stuck']
+        switches = traffic_stats['switches'] - before['switches']
+        print(f"  max {limit:3d} cars : {passes / minutes:6.0f} passes/min | {stuck / minutes:4.0f} stuck/min | "
+              f"{switches / minutes:4.0f} phase switches/min | {population / ticks:5.1f} cars avg | "
+              f"{elapsed / ticks * 1000:6.3f} ms/tick")
+    TRAFFIC_CONFIG.update(saved_config)
+    player.x, player.y = saved_position
+    rng.setstate(saved_rng)
+    traffic_vehicles.clear()
+    build_intersection_controllers()
+
+def benchmark_routing(ticks=6000, follow_ticks=3000, seed=7):
+    """Routing decisions per heading in busy traffic, and lone up/left cars following their routes"""
+    saved_config = dict(TRAFFIC_CONFIG)
+    saved_position = (player.x, player.y)
+    saved_rng = rng.getstate()
+    player.x, player.y = 1000.0, 900.0  # Middle of the residential grid
+    
+    def run(ticks, decided):
+        """Advance traffic, reporting every car that reaches a new intersection - returns
+        how many routed cars left the road"""
+        off_road = 0
+        for _ in range(ticks):
+            advance_timers()
+            before = {id(car): (car, car.direction, car.last_intersection, car.route, car.route_step)
+                      for car in traffic_vehicles}
+            update_traffic()
+            dispatch_events()
+            for car in traffic_vehicles:
+                _, direction, last, route, step = before.pop(id(car), (None, None, None, None, 0))
+                if car.last_intersection is not None and car.last_intersection is not last:
+                    decided(car, direction, route, step)
+            # Whatever else is gone ran off the road or out of despawn range
+            for car, _, _, route, _ in before.values():
+                distance = ((car.x - player.x) ** 2 + (car.y - player.y) ** 2) ** 0.5
+                off_road += route is not None and distance <= TRAFFIC_CONFIG['despawn_distance']
+        return off_road
+    
+    # Busy traffic - every heading has to reach choose_route_direction
+    rng.seed(seed)
+    TRAFFIC_CONFIG['max_cars'] = 80
+    traffic_vehicles.clear()
+    build_intersection_controllers()
+    reset_timers()
+    by_heading = [0, 0, 0, 0]
+    
+    def count(car, direction, route, step):
+        by_heading[direction] += 1
+    
+    off_road = run(ticks, count)
+    print(f"[bench] routing, {ticks} ticks with up to {TRAFFIC_CONFIG['max_cars']} cars")
+    print("  decisions     : " + ", ".join(f"{DIRECTION_NAMES[d]} {by_heading[d]}" for d in range(4)) +
+          f" | {off_road} routed cars left the road")
+    
+    # One car at a time on every up and left lane, four tiles before an intersection and
+    # given a route of at least two steps - its next two decisions must follow that route
+    TRAFFIC_CONFIG['spawn_interval'] = float('inf')  # Keeps the spawner from adding traffic
+    TRAFFIC_CONFIG['despawn_distance'] = float('inf')  # Routes run past the middle of the map
+    cars = followed = 0
+    for intersection in INTERSECTIONS:
+        index = intersection['id']
+        for heading in (DIR_UP, DIR_LEFT):
+            step_x, step_y = DIRECTION_STEPS[heading]
+            corner_x, corner_y = intersection_corner(intersection, heading)
+            x = corner_x - step_x * 4 * TILE_SIZE
+            y = corner_y - step_y * 4 * TILE_SIZE
+            if not is_on_road(x, y):
+                continue
+            route = None
+            for destination in lane_graph['destinations']:
+                candidate = find_route(index, heading, destination)
+                if candidate and len(candidate) >= 2:
+                    route = candidate
+                    break
+            if route is None:
+                continue
+            rng.seed(seed)
+            traffic_vehicles.clear()
+            build_intersection_controllers()
+            reset_timers()
+            car = traffic_vehicles.spawn(CAR_TYPES[0], float(x), float(y), heading)
+            car.destination, car.route, car.route_step = destination, route, 0
+            taken = []
+            
+            def check(car, direction, route, step):
+                taken.append((car.last_intersection['id'], car.direction))
+            
+            run(follow_ticks, check)
+            cars += 1
+            followed += taken[:2] == list(route[:2])
+    print(f"  up/left cars  : {followed} of {cars} followed their route through two intersections")
+    
+    TRAFFIC_CONFIG.update(saved_config)
+    player.x, player.y = saved_position
+    rng.setstate(saved_rng)
+    traffic_vehicles.clear()
+    build_intersection_controllers()
+
+def benchmark_car_collision(cars=200, ticks=2000):
+    """Both player-car checks per tick: AABB array query vs a hitbox dict per car per check"""
+    import time
+
+    saved_cars = [(c.name, c.x, c.y, c.direction) for c in traffic_vehicles]
+    saved_position = (player.x, player.y)
+    traffic_vehicles.clear()
+    for i in range(cars):
+        traffic_vehicles.spawn(CAR_TYPES[i % len(CAR_TYPES)], player.x + (i % 20) * 60 - 600,
+                               player.y + (i // 20) * 60 - 300, i % 4)
+
+    def dict_hitbox(car):
+        width, height = CAR_HITBOX_SIZES[car.name]
+        if car.direction in (DIR_LEFT, DIR_RIGHT):
+            width, height = height, width
+        return {'left': car.x - width / 2, 'right': car.x + width / 2,
+                'top': car.y - height / 2, 'bottom': car.y + height / 2}
+
+    def dict_hit(x, y, hitbox, padding):
+        size = PLAYER_HIT_SIZE + padding
+        return (x + size > hitbox['left'] and x - size < hitbox['right'] and
+                y + size > hitbox['top'] and y - size < hitbox['bottom'])
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        update_car_boxes()
+        check_collision_with_cars()
+        check_player_car_collision(player.x + 1, player.y)
+    array_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for tick in range(ticks):
+        for car in traffic_vehicles:
+            dict_hit(player.x, player.y, dict_hitbox(car), 0)
+        for car in traffic_vehicles:
+            dict_hit(player.x + 1, player.y, dict_hitbox(car), PLAYER_BLOCK_PADDING)
+    dict_time = time.perf_counter() - start
+
+    traffic_vehicles.clear()
+    for record in saved_cars:
+        traffic_vehicles.spawn(*record)
+    player.x, player.y = saved_position
+    update_car_boxes()
+
+    print(f"[bench] player-car collision, {cars} cars x {ticks} ticks")
+    print(f"  AABB array    : {array_time / ticks * 1000:7.3f} ms/tick (incl. rebuild)")
+    print(f"  hitbox dicts  : {dict_time / ticks * 1000:7.3f} ms/tick ({cars * 2} dicts)")
+
+def benchmark_render(frames=200):
+    """Whole-frame draw(): native backbuffer + one upscale vs per-sprite scaled blits"""
+    import time
+    import pgzero.screen
+    global screen
+
+    if 'screen' not in globals():
+        # Benchmarks run before pgzrun opens the window
+        screen = pgzero.screen.Screen(pygame.display.set_mode((WIDTH, HEIGHT)))
+    saved = dict(RENDER_CONFIG)
+    print(f"[bench] draw(), {frames} frames at {camera_zoom}x zoom, {WIDTH}x{HEIGHT}")
+    for mode, upscale in (('scaled', 'nearest'), ('native', 'nearest'), ('native', 'scale2x')):
+        RENDER_CONFIG['mode'] = mode
+        RENDER_CONFIG['upscale'] = upscale
+        draw()  # Warm the surface cache for this scale
+        start = time.perf_counter()
+        for _ in range(frames):
+            draw()
+        elapsed = time.perf_counter() - start
+        label = mode if mode == 'scaled' else f"{mode} + {upscale}"
+        print(f"  {label:<17}: {elapsed / frames * 1000:7.2f} ms/frame")
+    RENDER_CONFIG.update(saved)
+
+def benchmark_baking(frames=600, speeds=(2, 8), warmup=10):
+    """Native draw() while crossing the map at walking/running and vehicle speed, with and without chunk baking"""
+    import time
+    import pgzero.screen
+    global screen
+
+    if 'screen' not in globals():
+        screen = pgzero.screen.Screen(pygame.display.set_mode((WIDTH, HEIGHT)))
+    saved_mode = RENDER_CONFIG['mode']
+    saved_enabled = BAKE_CONFIG['enabled']
+    saved_position = (player.x, player.y)
+    RENDER_CONFIG['mode'] = 'native'
+    print(f"[bench] chunk baking, {frames} frames at {camera_zoom}x zoom, {BAKE_CONFIG['workers']} bake threads")
+    for speed in speeds:
+        for enabled in (True, False):
+            while chunk_requested or bake_pending:
+                collect_ready_chunks()
+                collect_baked_chunks()
+                time.sleep(0.001)
+            chunk_cache.clear()
+            baked_chunks.clear()
+            bake_stats.update(baked=0, evicted=0, fallback_frames=0)
+            BAKE_CONFIG['enabled'] = enabled
+            streaming['last_x'] = None
+            player.x, player.y = MAP_WIDTH / 4, MAP_HEIGHT / 4
+            timings = []
+            for _ in range(frames):
+                player.x += speed
+                player.y += speed / 2
+                frame_start = time.perf_counter()
+                draw()
+                elapsed = time.perf_counter() - frame_start
+                timings.append(elapsed)
+                time.sleep(max(0.0, 1 / 60 - elapsed))  # Leave the workers the rest of the frame
+            # The first frames after the jump generate their chunks on the spot either way
+            first = max(timings[:warmup])
+            timings = sorted(timings[warmup:])
+            mean = sum(timings) / len(timings)
+            label = f"{speed} px/tick, {'baked' if enabled else 'tiles'}"
+            print(f"  {label:<20}: mean {mean * 1000:6.2f} ms, p99 {timings[int(len(timings) * 0.99)] * 1000:6.2f} ms, "
+                  f"max {timings[-1] * 1000:6.2f} ms (warm-up max {first * 1000:6.2f} ms), "
+                  f"{bake_stats['baked']} chunks baked, {bake_stats['fallback_frames']} fallback frames")
+    RENDER_CONFIG['mode'] = saved_mode
+    BAKE_CONFIG['enabled'] = saved_enabled
+    player.x, player.y = saved_position
+    streaming['last_x'] = None
+
+def benchmark_sprites(populations=((0, 0, 0), (200, 40, 50), (1000, 160, 500)), frames=1000):
+    """Native draw() with NPCs, cars and bullets crowded around the view"""
+    import time
+    import pgzero.screen
+    global screen
+
+    if 'screen' not in globals():
+        screen = pgzero.screen.Screen(pygame.display.set_mode((WIDTH, HEIGHT)))
+    saved_mode = RENDER_CONFIG['mode']
+    saved_position = (player.x, player.y)
+    RENDER_CONFIG['mode'] = 'native'
+    player.x, player.y = MAP_WIDTH / 2, MAP_HEIGHT / 2
+    bench_rng = random.Random(11)
+    print(f"[bench] dynamic sprites, {frames} frames at {camera_zoom}x zoom")
+    for npc_count, car_count, bullet_count in populations:
+        npcs.clear()
+        traffic_vehicles.clear()
+        bullets.clear()
+        # Spread over twice the view so about half of them are culled
+        spread_x, spread_y = WIDTH / camera_zoom, HEIGHT / camera_zoom
+        def place():
+            return (player.x + bench_rng.uniform(-spread_x, spread_x),
+                    player.y + bench_rng.uniform(-spread_y, spread_y))
+        for i in range(npc_count):
+            npcs.spawn(f'npc{bench_rng.randint(1, 9)}', *place(), bench_rng.randrange(4))
+        for i in range(car_count):
+            traffic_vehicles.spawn(CAR_TYPES[i % len(CAR_TYPES)], *place(), i % 4)
+        for i in range(bullet_count):
+            bullets.spawn(*place(), 0, 0, 0, BULLET_CONFIG['lifetime'])
+        for _ in range(100):
+            draw()  # Warm the sprite and chunk caches
+            if not bake_pending:
+                break
+            time.sleep(0.01)
+        elapsed = float('inf')
+        for _ in range(5):  # Best of five - the frame is short enough for scheduler noise to matter
+            start = time.perf_counter()
+            for _ in range(frames // 5):
+                draw()
+            elapsed = min(elapsed, (time.perf_counter() - start) / (frames // 5))
+        print(f"  {npc_count:>5} NPCs, {car_count:>4} cars, {bullet_count:>4} bullets: {elapsed * 1000:6.2f} ms/frame")
+    traffic_vehicles.clear()
+    bullets.clear()
+    initialize_npcs()
+    RENDER_CONFIG['mode'] = saved_mode
+    player.x, player.y = saved_position
+
+def segment_solid_reference(x0, y0, x1, y1):
+    """segment_solid() by brute force - the cell at the middle of every piece between border crossings"""
+    cuts = {0.0, 1.0}
+    for p0, p1 in ((x0, x1), (y0, y1)):
+        if p0 != p1:
+            for border in range(int(min(p0, p1) // COLLISION_CELL), int(max(p0, p1) // COLLISION_CELL) + 1):
+                t = (border * COLLISION_CELL - p0) / (p1 - p0)
+                if 0.0 < t < 1.0:
+                    cuts.add(t)
+    cuts = sorted(cuts)
+    points = [(x0 + (x1 - x0) * (a + b) / 2, y0 + (y1 - y0) * (a + b) / 2) for a, b in zip(cuts, cuts[1:])]
+    points.append((x1, y1))
+    return any(solid_cell(int(x // COLLISION_CELL), int(y // COLLISION_CELL)) for x, y in points)
+
+def benchmark_collision(queries=20000, extra_buildings=(0, 3000)):
+    """Point, swept-box and segment queries on the collision bitmap vs scanning every footprint"""
+    import time
+    global authored_solid
+
+    bench_rng = random.Random(5)
+    points = [(bench_rng.uniform(0, MAP_WIDTH), bench_rng.uniform(0, MAP_HEIGHT)) for _ in range(queries)]
+    moves = [(bench_rng.uniform(-8, 8), bench_rng.uniform(-8, 8)) for _ in range(queries)]
+    saved = authored_solid
+    print(f"[bench] collision, {queries} queries of each kind, {COLLISION_CELL}px cells")
+    for extra in extra_buildings:
+        objects = list(map_objects)
+        for _ in range(extra):
+            objects.append({'name': 'building1', 'x': bench_rng.uniform(0, MAP_WIDTH),
+                            'y': bench_rng.uniform(0, MAP_HEIGHT)})
+        footprints = [footprint for footprint in map(object_footprint, objects) if footprint is not None]
+        start = time.perf_counter()
+        authored_solid = SolidGrid(MAP_WIDTH // COLLISION_CELL, MAP_HEIGHT // COLLISION_CELL)
+        rasterize_objects(authored_solid, objects, 0, 0)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for x, y in points:
+            is_solid(x, y)
+        point_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for (x, y), (dx, dy) in zip(points, moves):
+            swept_box_solid(x, y, PLAYER_HIT_SIZE, PLAYER_HIT_SIZE, dx, dy)
+        box_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for (x, y), (dx, dy) in zip(points, moves):
+            segment_solid(x, y, x + dx, y + dy)
+        segment_time = time.perf_counter() - start
+        scanned = queries // 20
+        start = time.perf_counter()
+        for x, y in points[:scanned]:
+            any(left <= x < right and top <= y < bottom for left, top, right, bottom in footprints)
+        scan_time = (time.perf_counter() - start) / scanned * queries
+
+        print(f"  {len(footprints):>5} solid objects (build {build_time * 1000:6.1f} ms): "
+              f"point {point_time / queries * 1e6:5.2f} us | swept box {box_time / queries * 1e6:5.2f} us | "
+              f"segment {segment_time / queries * 1e6:5.2f} us | footprint scan {scan_time / queries * 1e6:7.2f} us")
+    
+    # Segments from cell corners, diagonals included, are where the walk can slip past its end cell
+    segments = []
+    for _ in range(queries):
+        x = bench_rng.randrange(MAP_WIDTH // COLLISION_CELL) * COLLISION_CELL
+        y = bench_rng.randrange(MAP_HEIGHT // COLLISION_CELL) * COLLISION_CELL
+        length = bench_rng.randint(1, 6) * COLLISION_CELL
+        dx, dy = bench_rng.choice(((length, length), (length, -length), (-length, length), (-length, -length),
+                                   (bench_rng.uniform(-48, 48), bench_rng.uniform(-48, 48))))
+        segments.append((x, y, x + dx, y + dy))
+    wrong = sum(segment_solid(*segment) != segment_solid_reference(*segment) for segment in segments)
+    print(f"  {queries} segments from cell corners: {wrong} differ from the brute-force reference")
+    authored_solid = saved
+
+def run_benchmarks():
+    """Run every benchmark and print the results"""
+    benchmark_entities()
+    benchmark_pools()
+    benchmark_spawning()
+    benchmark_pathfinding()
+    benchmark_snapshots()
+    benchmark_streaming()
+    benchmark_surface_cache()
+    benchmark_car_sprites()
+    benchmark_hud()
+    benchmark_events()
+    benchmark_timers()
+    benchmark_animation()
+    benchmark_enemies()
+    benchmark_governor()
+    benchmark_telemetry()
+    benchmark_hitches()
+    benchmark_traffic()
+    benchmark_routing()
+    benchmark_car_collision()
+    benchmark_render()
+    benchmark_baking()
+    benchmark_sprites()
+    benchmark_collision()
+
+if os.environ.get('GAME_BENCHMARK'):
+    run_benchmarks()
+    raise SystemExit(0)
+
+start_hitch_sampler()
+
+if replay['mode'] == 'replay' and replay['headless']:
+    run_headless_replay()
+    print(f"State checksum {state_checksum():08x}")
+    raise SystemExit(0)
 
 
 pgzrun.go()
\ No newline at end of file